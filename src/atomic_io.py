@@ -0,0 +1,81 @@
+import json
+import os
+import stat
+import tempfile
+
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB: few large writes for big datasets
+DEFAULT_FILE_MODE = 0o644
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """
+    Write ``data`` as JSON to ``path`` so that a crash leaves either the old
+    file or the complete new one, never a truncated mix.
+
+    Parameters:
+        path (str): Destination file.
+        data: JSON-serializable object.
+        **dump_kwargs: Passed on to json.dump (indent, ensure_ascii, ...).
+    """
+    atomic_write(path, lambda f: json.dump(data, f, **dump_kwargs))
+
+
+def atomic_write(path, write, binary=False):
+    """
+    Atomically replace ``path`` with whatever ``write(f)`` writes to ``f``.
+
+    The content is streamed into a temp file in the same directory through
+    a large buffer, fsynced, and then renamed over ``path`` with os.replace
+    (atomic on POSIX and Windows). No second copy of the file is made.
+
+    Parameters:
+        path (str): Destination file.
+        write (callable): Called with the open temp file.
+        binary (bool): Open the temp file in binary mode.
+    """
+    path = os.fspath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    os.close(fd)
+    try:
+        if binary:
+            f = open(tmp_path, "wb", buffering=WRITE_BUFFER_SIZE)
+        else:
+            f = open(
+                tmp_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE
+            )
+        with f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        _copy_mode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+
+def _copy_mode(path, tmp_path):
+    """mkstemp creates 0600 files; keep the permissions users expect."""
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = DEFAULT_FILE_MODE
+    os.chmod(tmp_path, mode)
+
+
+def _fsync_directory(directory):
+    """Persist the rename itself. Not supported (or needed) on Windows."""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
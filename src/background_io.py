@@ -0,0 +1,87 @@
+from PyQt5.QtCore import (
+    QCoreApplication,
+    QObject,
+    QRunnable,
+    QThreadPool,
+    pyqtSignal,
+)
+from logger import setup_logger
+
+logger = setup_logger("background_io")
+
+
+class _WriteTask(QRunnable):
+    def __init__(self, writer, name, func, args, context):
+        super().__init__()
+        self._writer = writer
+        self._name = name
+        self._func = func
+        self._args = args
+        self._context = context
+
+    def run(self):
+        error = None
+        try:
+            self._func(*self._args)
+        except Exception as e:
+            logger.warning(f"Background {self._name} failed: {e}")
+            error = e
+        # Queued back to the GUI thread, where the writer lives
+        self._writer.finished.emit(self._name, self._context, error)
+
+
+class BackgroundWriter(QObject):
+    """
+    Runs file writes (saves, backups) on a single worker thread.
+
+    Jobs are named; a job is not queued again while one with the same name
+    is still running. Writes share one thread so they never race on disk.
+
+    Signals:
+        finished(str, object, object): Job name, the caller's context
+            object, and the exception raised (None on success).
+    """
+
+    finished = pyqtSignal(str, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._pending = set()
+        self.finished.connect(self._job_done)
+
+    def submit(self, name, func, args=(), context=None, blocking=False):
+        """
+        Run ``func(*args)`` in the background.
+
+        Parameters:
+            blocking (bool): Run on the calling thread instead, still
+                reporting through ``finished`` (used on shutdown).
+
+        Returns:
+            bool: False if a job with this name is already running.
+        """
+        if name in self._pending:
+            return False
+        self._pending.add(name)
+        task = _WriteTask(self, name, func, args, context)
+        if blocking:
+            task.run()
+        else:
+            self._pool.start(task)
+        return True
+
+    def is_busy(self, name=None):
+        return name in self._pending if name else bool(self._pending)
+
+    def wait(self):
+        """
+        Block until queued jobs have finished writing, then deliver their
+        completion signals.
+        """
+        self._pool.waitForDone()
+        QCoreApplication.processEvents()
+
+    def _job_done(self, name, context, error):
+        self._pending.discard(name)
@@ -0,0 +1,230 @@
+"""
+Deduplicated backup storage.
+
+A backup is a manifest listing content-addressed chunks::
+
+    backups/
+        chunks/ab/ab12...ef     zlib-compressed chunk, named by its SHA-256
+        manifests/data.json.20250101-120000.json
+
+Records are serialized one per line and cut into chunks at content-defined
+boundaries: a chunk ends after a record whose line hashes to a cut value
+(once the chunk is past a minimum size) or when it reaches a maximum size.
+Because boundaries depend only on nearby content, editing, inserting or
+deleting rows only changes the chunks around them; every other chunk has
+the same hash as in the previous backup and is stored only once.
+"""
+
+import hashlib
+import json
+import os
+import time
+import zlib
+from zlib import crc32
+from atomic_io import atomic_write, atomic_write_json
+from logger import setup_logger
+
+logger = setup_logger("backup_store")
+
+MIN_CHUNK_BYTES = 16 * 1024
+MAX_CHUNK_BYTES = 256 * 1024
+CUT_MASK = 0x3F  # on average, cut after every 64th record past the minimum
+COMPRESSION_LEVEL = 6
+MANIFEST_SUFFIX = ".json"
+
+
+class BackupStore:
+    """
+    Content-addressed chunk store with one manifest per backup.
+
+    Attributes:
+        root (str): Directory holding the ``chunks`` and ``manifests``
+            subdirectories.
+    """
+
+    def __init__(self, root="backups"):
+        self.root = root
+        self.chunk_dir = os.path.join(root, "chunks")
+        self.manifest_dir = os.path.join(root, "manifests")
+
+    def save(self, records, name, keep=None):
+        """
+        Store a backup of ``records`` and return its id.
+
+        Only chunks that are not already in the store are written; the
+        manifest is written last, so an interrupted backup leaves at most
+        some unreferenced chunks for the next garbage collection.
+
+        Parameters:
+            records (iterable): The rows (dicts) to back up.
+            name (str): Source name the backup belongs to (e.g. data.json).
+            keep (int): If given, prune to this many backups of ``name``.
+
+        Returns:
+            str: The backup id.
+        """
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+
+        chunks = []
+        row_count = 0
+        new_bytes = 0
+        for chunk, rows in _split_chunks(records):
+            digest = hashlib.sha256(chunk).hexdigest()
+            path = self._chunk_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                data = zlib.compress(chunk, COMPRESSION_LEVEL)
+                atomic_write(path, lambda f: f.write(data), binary=True)
+                new_bytes += len(data)
+            chunks.append(digest)
+            row_count += rows
+
+        backup_id = self._new_backup_id(name)
+        manifest = {
+            "source": name,
+            "created": time.time(),
+            "rows": row_count,
+            "chunks": chunks,
+        }
+        atomic_write_json(self._manifest_path(backup_id), manifest)
+        logger.info(
+            f"Backup {backup_id}: {len(chunks)} chunks, "
+            f"{new_bytes} new bytes stored"
+        )
+
+        if keep is not None:
+            self.prune(name, keep)
+        return backup_id
+
+    def list_backups(self, name=None):
+        """Return backup ids (oldest first), optionally for one source."""
+        try:
+            files = os.listdir(self.manifest_dir)
+        except FileNotFoundError:
+            return []
+        ids = [
+            f[: -len(MANIFEST_SUFFIX)]
+            for f in files
+            if f.endswith(MANIFEST_SUFFIX)
+        ]
+        if name is not None:
+            ids = [i for i in ids if i.startswith(name + ".")]
+        return sorted(ids)
+
+    def read_manifest(self, backup_id):
+        with open(self._manifest_path(backup_id), "r") as f:
+            return json.load(f)
+
+    def iter_records(self, backup_id):
+        """
+        Stream a backup's records, decompressing one chunk at a time.
+
+        Raises:
+            FileNotFoundError: If the backup or one of its chunks is missing.
+        """
+        for digest in self.read_manifest(backup_id)["chunks"]:
+            with open(self._chunk_path(digest), "rb") as f:
+                chunk = zlib.decompress(f.read())
+            for line in chunk.splitlines():
+                yield json.loads(line)
+
+    def restore(self, backup_id, path):
+        """
+        Atomically write a backup to ``path`` in the data.json layout,
+        streaming records so the whole backup is never held in memory.
+        """
+
+        def write(f):
+            # Same output as json.dump(records, f, indent=2)
+            separator = "[\n  "
+            for record in self.iter_records(backup_id):
+                text = json.dumps(record, ensure_ascii=False, indent=2)
+                f.write(separator)
+                f.write(text.replace("\n", "\n  "))
+                separator = ",\n  "
+            f.write("[]" if separator.startswith("[") else "\n]")
+
+        atomic_write(path, write)
+
+    def prune(self, name, keep):
+        """
+        Delete the oldest backups of ``name`` beyond ``keep`` and garbage
+        collect chunks no remaining manifest refers to.
+        """
+        backups = self.list_backups(name)
+        while len(backups) > keep:
+            backup_id = backups.pop(0)
+            try:
+                os.remove(self._manifest_path(backup_id))
+                logger.info(f"Old backup removed: {backup_id}")
+            except OSError as e:
+                logger.warning(f"Failed to remove old backup: {e}")
+        self.collect_garbage()
+
+    def collect_garbage(self):
+        """
+        Remove chunks that are not referenced by any manifest.
+
+        Returns:
+            int: Number of chunks removed.
+        """
+        referenced = set()
+        for backup_id in self.list_backups():
+            try:
+                referenced.update(self.read_manifest(backup_id)["chunks"])
+            except (OSError, ValueError, KeyError) as e:
+                # Never delete chunks based on a manifest we cannot read
+                logger.warning(f"Skipping garbage collection: {e}")
+                return 0
+
+        removed = 0
+        for dirpath, _, files in os.walk(self.chunk_dir):
+            for digest in files:
+                if digest in referenced:
+                    continue
+                try:
+                    os.remove(os.path.join(dirpath, digest))
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Failed to remove chunk {digest}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} unreferenced backup chunks")
+        return removed
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def _manifest_path(self, backup_id):
+        return os.path.join(self.manifest_dir, backup_id + MANIFEST_SUFFIX)
+
+    def _new_backup_id(self, name):
+        backup_id = f"{name}.{time.strftime('%Y%m%d-%H%M%S')}"
+        candidate = backup_id
+        suffix = 1
+        while os.path.exists(self._manifest_path(candidate)):
+            candidate = f"{backup_id}-{suffix}"
+            suffix += 1
+        return candidate
+
+
+def _split_chunks(records):
+    """
+    Yield (chunk bytes, row count) pairs with content-defined boundaries.
+    """
+    lines = []
+    size = 0
+    for record in records:
+        line = json.dumps(
+            record, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+        lines.append(line)
+        size += len(line) + 1
+        if size >= MAX_CHUNK_BYTES or (
+            size >= MIN_CHUNK_BYTES and crc32(line) & CUT_MASK == 0
+        ):
+            yield b"\n".join(lines) + b"\n", len(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield b"\n".join(lines) + b"\n", len(lines)
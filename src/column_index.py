@@ -0,0 +1,587 @@
+"""
+Row indexes over single columns, answering filter predicates without a
+scan.
+
+Results are row bitmaps: Python ints with bit ``row`` set for each
+matching row, so combining predicates with and/or/not is a single integer
+operation however many rows there are.
+
+- MembershipIndex: item → rows whose list holds it (``'admin' in tags``).
+- EqualityIndex: value → rows holding it, for columns with few distinct
+  values (``status == 'active'``).
+- SortedIndex: the rows in value order, for ranges (``age >= 50``),
+  equality on columns with many values, and string prefixes
+  (``name.startswith('A')``).
+
+ColumnIndexes builds them per column on first use and keeps them in step
+with edits; IndexLookup answers predicates from them for one query. A
+lookup can also be told not to build: the indexes it wanted are then
+queued and built a chunk of rows at a time (IndexBuild), e.g. between
+event-loop turns.
+"""
+
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import chain, islice
+
+BITMAP_BUDGET_BYTES = 64 * 1024 * 1024  # per bitmap index, all items
+BITMAP_MAX_ITEMS = 4096  # distinct items/values a bitmap index holds
+SORTED_MAX_FRACTION = 0.25  # larger sorted-index results scan instead
+SORTED_MAX_APPEND = 1024  # larger appends rebuild a sorted index
+
+# The eight mask entries, and the set bit positions, of each byte value
+_BYTE_MASKS = [tuple(bool(b >> i & 1) for i in range(8)) for b in range(256)]
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+
+def all_rows(count):
+    """Bitmap with every one of ``count`` rows set."""
+    return (1 << count) - 1
+
+
+def bitmap_to_mask(bits, count):
+    """Expand a row bitmap into a list of ``count`` bools."""
+    data = bits.to_bytes((count + 7) // 8, "little")
+    mask = list(chain.from_iterable(map(_BYTE_MASKS.__getitem__, data)))
+    del mask[count:]
+    return mask
+
+
+def bitmap_rows(bits):
+    """The rows set in a bitmap, in order."""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    return [
+        base + bit
+        for base, byte in zip(range(0, len(data) * 8, 8), data)
+        if byte
+        for bit in _BYTE_BITS[byte]
+    ]
+
+
+def bitmap_from_rows(rows, count):
+    """Bitmap of the given rows."""
+    data = bytearray((count + 7) // 8)
+    for row in rows:
+        data[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(data, "little")
+
+
+def fold_case(value):
+    """Key of a value in a case-insensitive index."""
+    return value.lower() if isinstance(value, str) else value
+
+
+class BitmapIndex:
+    """
+    Rows holding each item, one bitmap per item.
+
+    Each item has a mutable bitmap (a bytearray, one bit per row) that
+    edits update in place; the int form used for queries is made on demand
+    and kept until the item's rows change. An index holds at most
+    BITMAP_MAX_ITEMS items and BITMAP_BUDGET_BYTES of bitmaps; a column
+    needing more cannot be indexed.
+
+    Subclasses define ``items(value)``: the items of one cell, or None if
+    the value cannot be indexed.
+
+    Attributes:
+        count (int): Rows indexed.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._bits = {}  # item → bytearray bitmap
+        self._ints = {}  # item → its bitmap as an int, while unchanged
+
+    @classmethod
+    def build(cls, values, *args):
+        """Index a column; None if it cannot be indexed."""
+        index = cls(*args)
+        return index if index.extend(values) else None
+
+    def _max_items(self):
+        size = max((self.count + 7) >> 3, 1)
+        return min(BITMAP_MAX_ITEMS, BITMAP_BUDGET_BYTES // size)
+
+    def extend(self, values):
+        """
+        Index appended rows. Returns False if they cannot be indexed (the
+        index is then unusable).
+        """
+        values = list(values)
+        first = self.count
+        self.count += len(values)
+        if len(self._bits) > self._max_items():
+            return False
+        size = (self.count + 7) >> 3
+        for bits in self._bits.values():
+            bits.extend(bytes(size - len(bits)))
+        self._ints.clear()
+        for row, value in enumerate(values, first):
+            items = self.items(value)
+            if items is None:
+                return False
+            for item in items:
+                if not self._set(item, row, True):
+                    return False
+        return True
+
+    def update(self, row, old_value, new_value):
+        """
+        Follow one cell changing. Returns False if the new value cannot be
+        indexed (the index is then unusable).
+        """
+        old_items = self.items(old_value)
+        new_items = self.items(new_value)
+        if old_items is None or new_items is None:
+            return False
+        try:
+            removed = set(old_items).difference(new_items)
+        except TypeError:
+            return False
+        for item in removed:
+            self._set(item, row, False)
+        for item in new_items:
+            if not self._set(item, row, True):
+                return False
+        return True
+
+    def _set(self, item, row, present):
+        try:
+            bits = self._bits.get(item)
+        except TypeError:
+            return False  # unhashable item
+        if bits is None:
+            if not present:
+                return True
+            if len(self._bits) >= self._max_items():
+                return False
+            bits = self._bits[item] = bytearray((self.count + 7) >> 3)
+        if present:
+            bits[row >> 3] |= 1 << (row & 7)
+        else:
+            bits[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+        self._ints.pop(item, None)
+        return True
+
+    def rows_with(self, item):
+        """
+        Bitmap of the rows holding ``item``, or None if ``item`` is
+        unhashable.
+        """
+        try:
+            bits = self._ints.get(item)
+        except TypeError:
+            return None
+        if bits is None:
+            data = self._bits.get(item)
+            bits = int.from_bytes(data, "little") if data is not None else 0
+            self._ints[item] = bits
+        return bits
+
+
+class MembershipIndex(BitmapIndex):
+    """
+    Rows containing each item of a list column such as ``tags``. Only
+    columns holding a list in every row can be indexed.
+    """
+
+    def items(self, value):
+        return value if type(value) is list else None
+
+
+class EqualityIndex(BitmapIndex):
+    """
+    Rows holding each value of a column with few distinct values.
+
+    Attributes:
+        fold (bool): Whether strings are indexed lower-cased.
+    """
+
+    def __init__(self, fold=False):
+        super().__init__()
+        self.fold = fold
+
+    def items(self, value):
+        return (fold_case(value) if self.fold else value,)
+
+
+class SortedIndex:
+    """
+    A column's rows in value order: ``keys`` sorted, ``rows[i]`` the row
+    holding ``keys[i]``. Only columns whose values all compare with each
+    other (all numbers, or all strings; no None or NaN) can be indexed.
+
+    Attributes:
+        fold (bool): Whether strings are indexed lower-cased.
+        numeric (bool): Whether the keys are numbers (else strings).
+    """
+
+    def __init__(self, keys, rows, numeric, fold=False):
+        self.keys = keys
+        self.rows = rows
+        self.numeric = numeric
+        self.fold = fold
+
+    @classmethod
+    def build(cls, values, fold=False):
+        """Index a column; None if it cannot be indexed."""
+        keys = list(map(fold_case, values)) if fold else list(values)
+        types = set(map(type, keys))
+        numeric = types <= {int, float, bool}
+        if not numeric and types != {str}:
+            return None
+        if float in types and any(map(math.isnan, keys)):
+            return None
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        return cls(
+            list(map(keys.__getitem__, order)),
+            array("q", order),
+            numeric,
+            fold,
+        )
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    def _key(self, value):
+        """``value`` as a key of this index, or None if it cannot be one."""
+        if self.fold:
+            value = fold_case(value)
+        if self.numeric:
+            if type(value) not in (int, float, bool):
+                return None
+            if type(value) is float and math.isnan(value):
+                return None
+        elif type(value) is not str:
+            return None
+        return value
+
+    def _insert(self, key, row):
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.rows.insert(i, row)
+
+    def update(self, row, old_value, new_value):
+        """Follow one cell changing. Returns False if it cannot."""
+        old_key, new_key = self._key(old_value), self._key(new_value)
+        if old_key is None or new_key is None:
+            return False
+        low = bisect_left(self.keys, old_key)
+        high = bisect_right(self.keys, old_key)
+        try:
+            i = low + self.rows[low:high].index(row)
+        except ValueError:
+            return False
+        del self.keys[i]
+        del self.rows[i]
+        self._insert(new_key, row)
+        return True
+
+    def extend(self, values):
+        """Index appended rows. Returns False if they should be rebuilt."""
+        values = list(values)
+        if len(values) > SORTED_MAX_APPEND:
+            return False
+        keys = list(map(self._key, values))
+        if any(key is None for key in keys):
+            return False
+        for row, key in enumerate(keys, self.count):
+            self._insert(key, row)
+        return True
+
+    def ranges(self, op, value):
+        """
+        Positions in ``rows`` of the rows where ``cell op value`` holds.
+
+        Parameters:
+            op (str): "==", "!=", "<", "<=", ">" or ">=".
+
+        Returns:
+            list: (start, stop) position ranges, or None if ``value`` does
+            not compare with the keys.
+        """
+        key = self._key(value)
+        if key is None:
+            return None
+        keys = self.keys
+        low, high = bisect_left(keys, key), bisect_right(keys, key)
+        return {
+            "==": [(low, high)],
+            "!=": [(0, low), (high, len(keys))],
+            "<": [(0, low)],
+            "<=": [(0, high)],
+            ">": [(high, len(keys))],
+            ">=": [(low, len(keys))],
+        }.get(op)
+
+    def prefix_range(self, prefix):
+        """Position range of the strings starting with ``prefix``."""
+        if self.numeric or type(prefix) is not str:
+            return None
+        if self.fold:
+            prefix = prefix.lower()
+        keys = self.keys
+        low = bisect_left(keys, prefix)
+        if not prefix:
+            return [(low, len(keys))]
+        last = ord(prefix[-1])
+        if last == 0x10FFFF:
+            return None
+        end = prefix[:-1] + chr(last + 1)
+        return [(low, bisect_left(keys, end))]
+
+    def rows_in(self, ranges):
+        """The rows at the given position ranges."""
+        rows = self.rows
+        return chain.from_iterable(rows[start:stop] for start, stop in ranges)
+
+
+class IndexBuild:
+    """
+    An index being built a chunk of rows at a time.
+
+    Bitmap indexes grow chunk by chunk. A sorted index sorts each chunk as
+    it comes and merges the sorted runs at the end (one pass, as Python's
+    sort finds the runs).
+
+    Attributes:
+        key (tuple): (kind, column, fold) of the index.
+        index: The finished index, or False if the column cannot have one
+            (set once ``step`` returns True).
+    """
+
+    def __init__(self, key, values, index_type):
+        self.key = key
+        self.index = None
+        kind, _, fold = key
+        self._values = iter(values)
+        self._fold = fold
+        if kind == "sorted":
+            self._keys = []
+            self._order = array("q")
+            self._types = set()
+            self._bitmap = None
+        else:
+            args = () if kind == "membership" else (fold,)
+            self._bitmap = index_type(*args)
+
+    def step(self, rows):
+        """Index up to ``rows`` more rows. Returns True when finished."""
+        chunk = list(islice(self._values, rows))
+        if self._bitmap is not None:
+            if not self._bitmap.extend(chunk):
+                self.index = False
+            elif len(chunk) < rows:
+                self.index = self._bitmap
+        elif chunk:
+            self._add_sorted(chunk)
+        else:
+            self._finish_sorted()
+        return self.index is not None
+
+    def _add_sorted(self, chunk):
+        keys = list(map(fold_case, chunk)) if self._fold else chunk
+        types = set(map(type, keys))
+        self._types |= types
+        numeric = self._types <= {int, float, bool}
+        if (not numeric and self._types != {str}) or (
+            float in types and any(map(math.isnan, keys))
+        ):
+            self.index = False
+            return
+        first = len(self._keys)
+        self._keys.extend(keys)
+        self._order.extend(
+            sorted(range(first, len(self._keys)), key=self._keys.__getitem__)
+        )
+
+    def _finish_sorted(self):
+        keys = self._keys
+        order = sorted(self._order, key=keys.__getitem__)
+        self.index = SortedIndex(
+            list(map(keys.__getitem__, order)),
+            array("q", order),
+            self._types <= {int, float, bool},
+            self._fold,
+        )
+
+
+class ColumnIndexes:
+    """
+    The indexes of one table, built per column on first use and kept in
+    step with its cells.
+
+    Parameters:
+        column (callable): Column number → sequence of its values.
+    """
+
+    INDEX_TYPES = {
+        "membership": MembershipIndex,
+        "equality": EqualityIndex,
+        "sorted": SortedIndex,
+    }
+
+    def __init__(self, column):
+        self._column = column
+        # (kind, col, fold) → index, or False when the column has none
+        self._indexes = {}
+        self._wanted = []  # keys asked for without building, oldest first
+        self._build = None  # IndexBuild in progress
+
+    def get(self, kind, col, fold=False, build=True):
+        """
+        The index of a kind ("membership", "equality" or "sorted") on a
+        column; None if the column cannot have one. With ``build`` False a
+        missing index is not built but queued for ``build_step``.
+        """
+        key = (kind, col, fold)
+        index = self._indexes.get(key)
+        if index is None and not build:
+            if key not in self._wanted:
+                self._wanted.append(key)
+            return None
+        if index is None:
+            index_type = self.INDEX_TYPES[kind]
+            args = () if kind == "membership" else (fold,)
+            index = index_type.build(self._column(col), *args) or False
+            self._indexes[key] = index
+        return index or None
+
+    def known(self, kind, col, fold=False):
+        """True if the index is built or known to be impossible."""
+        return (kind, col, fold) in self._indexes
+
+    @property
+    def building(self):
+        """True while queued indexes remain to be built."""
+        return bool(self._wanted) or self._build is not None
+
+    def build_step(self, rows):
+        """
+        Build queued indexes by up to ``rows`` rows.
+
+        Returns:
+            bool: True while more remain to be built.
+        """
+        while self._build is None:
+            if not self._wanted:
+                return False
+            key = self._wanted.pop(0)
+            if key not in self._indexes:
+                kind, col, _ = key
+                self._build = IndexBuild(
+                    key, self._column(col), self.INDEX_TYPES[kind]
+                )
+        if self._build.step(rows):
+            key = self._build.key
+            self._indexes[key] = self._build.index
+            self._build = None
+            if key[0] == "equality" and self._indexes[key] is False:
+                # Too many values: comparisons fall back to a sorted index
+                self._wanted.append(("sorted",) + key[1:])
+        return self.building
+
+    def _for_column(self, col):
+        if self._build is not None and self._build.key[1] == col:
+            # The column changed under the build; start it again later
+            self._wanted.insert(0, self._build.key)
+            self._build = None
+        return [key for key in self._indexes if key[1] == col]
+
+    def update(self, row, col, old_value, new_value):
+        """Follow one cell changing."""
+        for key in self._for_column(col):
+            index = self._indexes[key]
+            # A column that cannot be indexed stays marked so (False)
+            if index and not index.update(row, old_value, new_value):
+                del self._indexes[key]
+
+    def extend(self, col, values):
+        """Follow rows being appended."""
+        for key in self._for_column(col):
+            index = self._indexes[key]
+            if index and not index.extend(values):
+                del self._indexes[key]
+
+    def drop(self, col):
+        """Forget a column's indexes, e.g. after it was replaced."""
+        for key in self._for_column(col):
+            del self._indexes[key]
+
+    def clear(self):
+        self._indexes.clear()
+        self._wanted.clear()
+        self._build = None
+
+
+class IndexLookup:
+    """
+    Row bitmaps for filter predicates, answered from a table's indexes.
+    Each method returns None when the predicate needs a scan instead.
+
+    Parameters:
+        indexes (ColumnIndexes): The table's indexes.
+        headers (list): Column names.
+        count (int): Rows in the table.
+        fold (bool): Whether string comparisons ignore case (the filter
+            compares lower-cased strings).
+        build (bool): Build missing indexes now; if False they are only
+            queued (see ColumnIndexes.build_step) and the predicate scans.
+    """
+
+    def __init__(self, indexes, headers, count, fold=False, build=True):
+        self.indexes = indexes
+        self.headers = headers
+        self.count = count
+        self.fold = fold
+        self.build = build
+
+    def _index(self, kind, name, fold=False):
+        index = self.indexes.get(
+            kind, self.headers.index(name), fold, self.build
+        )
+        if index is None or index.count != self.count:
+            return None
+        return index
+
+    def membership(self, name, item):
+        """Rows where ``item in name``."""
+        index = self._index("membership", name)
+        return index.rows_with(item) if index is not None else None
+
+    def compare(self, name, op, value):
+        """Rows where ``name op value`` (op: ==, !=, <, <=, > or >=)."""
+        if op in ("==", "!="):
+            index = self._index("equality", name, self.fold)
+            if index is not None:
+                bits = index.rows_with(
+                    fold_case(value) if self.fold else value
+                )
+                if bits is None or op == "==":
+                    return bits
+                return all_rows(self.count) & ~bits
+            col = self.headers.index(name)
+            if not self.indexes.known("equality", col, self.fold):
+                return None  # queued; the sorted index only if it fails
+        index = self._index("sorted", name, self.fold)
+        if index is None:
+            return None
+        return self._sorted_rows(index, index.ranges(op, value))
+
+    def prefix(self, name, prefix):
+        """Rows where ``name.startswith(prefix)``."""
+        index = self._index("sorted", name, self.fold)
+        if index is None:
+            return None
+        return self._sorted_rows(index, index.prefix_range(prefix))
+
+    def _sorted_rows(self, index, ranges):
+        if ranges is None:
+            return None
+        matches = sum(stop - start for start, stop in ranges)
+        if matches > self.count * SORTED_MAX_FRACTION:
+            return None  # not selective: scanning is cheaper
+        return bitmap_from_rows(index.rows_in(ranges), self.count)
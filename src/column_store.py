@@ -0,0 +1,295 @@
+import sys
+from array import array
+
+# Column kinds
+INT = "int"
+FLOAT = "float"
+BOOL = "bool"
+STR = "str"
+OBJECT = "object"
+
+TYPECODES = {INT: "q", FLOAT: "d", BOOL: "b"}
+KIND_BY_TYPE = {int: INT, float: FLOAT, bool: BOOL, str: STR}
+
+
+def infer_kind(values):
+    """
+    Pick the most compact storage kind that holds every value exactly.
+    Mixed or nullable columns, and containers such as ``tags``, stay as
+    plain object columns.
+    """
+    types = {type(v) for v in values}
+    if len(types) != 1:
+        return OBJECT
+    return KIND_BY_TYPE.get(types.pop(), OBJECT)
+
+
+def build_column(kind, values):
+    """Return ``(kind, storage)`` for ``values``, demoting if needed."""
+    if kind in TYPECODES:
+        try:
+            return kind, array(TYPECODES[kind], values)
+        except (OverflowError, TypeError):
+            return OBJECT, list(values)
+    if kind == STR:
+        return STR, list(map(sys.intern, values))
+    return OBJECT, list(values)
+
+
+def nested_value(parent, key, default=""):
+    """Value of ``key`` in a dict cell, or ``default`` for anything else."""
+    if isinstance(parent, dict):
+        return parent.get(key, default)
+    return default
+
+
+class _RowView:
+    """Row-shaped window onto a ColumnStore, so ``store[row][col]`` works."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, col):
+        return self._store.get(self._row, col)
+
+    def __setitem__(self, col, value):
+        self._store.set(self._row, col, value)
+
+    def __len__(self):
+        return len(self._store.headers)
+
+    def __iter__(self):
+        return (
+            self._store.get(self._row, col)
+            for col in range(len(self._store.headers))
+        )
+
+
+class ColumnStore:
+    """
+    Column-oriented storage for table data.
+
+    Each column is held once, in the most compact form that round-trips its
+    values: ``array`` buffers for int/float/bool columns, interned string
+    lists for text, and plain lists for everything else (lists like
+    ``tags``, nested dicts, nullable or mixed columns). A column is demoted
+    to object storage the first time a value of another type is written
+    into it.
+
+    Attributes:
+        headers (list): Column names, in display order.
+        kinds (list): Storage kind for each column.
+        nested (dict): Header of each nested-field column (e.g.
+            "preferences.theme") → (parent header, key). Their values are
+            copies of the parent dicts' entries, not saved on their own.
+        block_rows (int): Rows per ``block_values`` block.
+    """
+
+    block_rows = 65536
+
+    def __init__(self, headers=None, columns=None, kinds=None, nested=None):
+        self.headers = list(headers or [])
+        self._columns = list(columns or [[] for _ in self.headers])
+        self.kinds = list(kinds or [OBJECT] * len(self.headers))
+        self.nested = dict(nested or {})
+        self._row_count = len(self._columns[0]) if self._columns else 0
+
+    @classmethod
+    def from_records(cls, records, headers):
+        """Build a store from a list of dicts, keeping only ``headers``."""
+        store = cls()
+        for header in headers:
+            values = [item.get(header, "") for item in records]
+            store.add_column(header, values)
+        store._row_count = len(records)
+        return store
+
+    def __len__(self):
+        return self._row_count
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self._row_count
+        if not 0 <= row < self._row_count:
+            raise IndexError("row index out of range")
+        return _RowView(self, row)
+
+    def __iter__(self):
+        return (_RowView(self, row) for row in range(self._row_count))
+
+    def add_column(self, header, values):
+        kind, storage = build_column(infer_kind(values), values)
+        self.headers.append(header)
+        self.kinds.append(kind)
+        self._columns.append(storage)
+        self._row_count = len(storage)
+
+    def add_blank_column(self, header, value=""):
+        """Add a column holding ``value`` in every row."""
+        self.add_column(header, [value] * self._row_count)
+
+    def add_nested_column(self, header, parent_col, key):
+        """
+        Add a column of one key of a column of dicts, e.g.
+        "preferences.theme" from "preferences".
+        """
+        parent = self.headers[parent_col]
+        values = [nested_value(v, key) for v in self.column(parent_col)]
+        self.add_column(header, values)
+        self.nested[header] = (parent, key)
+
+    def drop_columns(self, headers):
+        """Remove the named columns (e.g. from a snapshot before saving)."""
+        keep = [
+            col
+            for col, header in enumerate(self.headers)
+            if header not in headers
+        ]
+        self.headers = [self.headers[col] for col in keep]
+        self.kinds = [self.kinds[col] for col in keep]
+        self._columns = [self._columns[col] for col in keep]
+        for header in headers:
+            self.nested.pop(header, None)
+
+    def record_value(self, record, header):
+        """A column's value for a row given as a dict."""
+        if header in self.nested:
+            parent, key = self.nested[header]
+            return nested_value(record.get(parent, ""), key)
+        return record.get(header, "")
+
+    def append_records(self, records):
+        """Append rows from a list of dicts, keeping column storage typed."""
+        for col, header in enumerate(self.headers):
+            values = [self.record_value(item, header) for item in records]
+            self.extend_column(col, values)
+        self._row_count += len(records)
+
+    @property
+    def lazy(self):
+        """True while some column is still read from a file mapping."""
+        return not all(isinstance(c, (array, list)) for c in self._columns)
+
+    def _writable(self, col):
+        """
+        Return the column's storage, first copying it into memory if it is
+        a read-only view (e.g. a memory-mapped columnar file).
+        """
+        storage = self._columns[col]
+        if not isinstance(storage, (array, list)):
+            kind = self.kinds[col]
+            if kind in TYPECODES:
+                storage = array(TYPECODES[kind], storage)
+            else:
+                storage = list(storage)
+            self._columns[col] = storage
+        return storage
+
+    def extend_column(self, col, values):
+        if not len(self._columns[col]):
+            self.kinds[col], self._columns[col] = build_column(
+                infer_kind(values), values
+            )
+            return
+        kind = self.kinds[col]
+        if kind != OBJECT and infer_kind(values) != kind and values:
+            self._demote(col)
+            kind = OBJECT
+        if kind == STR:
+            self._writable(col).extend(map(sys.intern, values))
+            return
+        storage = self._writable(col)
+        count = len(storage)
+        try:
+            storage.extend(values)
+        except OverflowError:
+            # array.extend keeps the items before the one that overflowed
+            del storage[count:]
+            self._demote(col)
+            self._columns[col].extend(values)
+
+    def get(self, row, col):
+        value = self._columns[col][row]
+        if self.kinds[col] == BOOL:
+            return bool(value)
+        return value
+
+    def set(self, row, col, value):
+        kind = self.kinds[col]
+        if KIND_BY_TYPE.get(type(value), OBJECT) != kind or kind == OBJECT:
+            if kind != OBJECT:
+                self._demote(col)
+            self._writable(col)[row] = value
+            return
+        if kind == STR:
+            value = sys.intern(value)
+        try:
+            self._writable(col)[row] = value
+        except OverflowError:
+            self._demote(col)
+            self._columns[col][row] = value
+
+    def _demote(self, col):
+        self._columns[col] = self.column_values(col)
+        self.kinds[col] = OBJECT
+
+    def column(self, col):
+        """
+        The column's backing sequence, without copying. Bool columns are
+        stored as bytes, so they are returned as a list of bools instead.
+        Callers must treat the result as read-only.
+        """
+        if self.kinds[col] == BOOL:
+            return list(map(bool, self._columns[col]))
+        return self._columns[col]
+
+    def block_values(self, col, start):
+        """Values of one column for the block starting at row ``start``."""
+        stop = min(start + self.block_rows, len(self))
+        return self.column_values(col, range(start, stop))
+
+    def column_values(self, col, rows=None):
+        """Return a list copy of one column, optionally for some rows."""
+        if rows is None:
+            return list(self.column(col))
+        storage = self._columns[col]
+        values = [storage[row] for row in rows]
+        if self.kinds[col] == BOOL:
+            return list(map(bool, values))
+        return values
+
+    def set_column_values(self, col, values):
+        """Replace a whole column, re-inferring its storage kind."""
+        kind, storage = build_column(infer_kind(values), values)
+        self.kinds[col] = kind
+        self._columns[col] = storage
+
+    def snapshot(self):
+        """
+        Cheap point-in-time copy for background readers. Column buffers are
+        copied (a flat memory copy), cell objects such as ``tags`` lists are
+        shared, which is safe because edits replace values, never mutate
+        them. Read-only mapped columns are shared as they are.
+        """
+        columns = [
+            (
+                array(c.typecode, c)
+                if isinstance(c, array)
+                else list(c) if isinstance(c, list) else c
+            )
+            for c in self._columns
+        ]
+        return ColumnStore(self.headers, columns, self.kinds, self.nested)
+
+    def iter_records(self):
+        """Yield the rows as dicts, one at a time."""
+        headers = self.headers
+        columns = [self.column(col) for col in range(len(headers))]
+        return (dict(zip(headers, row)) for row in zip(*columns))
+
+    def to_records(self):
+        """Materialize the rows as a list of dicts."""
+        return list(self.iter_records())
@@ -0,0 +1,273 @@
+"""
+Binary columnar storage format (``.idwc``), an alternative to data.json.
+
+Layout::
+
+    MAGIC (8 bytes) | format version (uint32) | 4 bytes padding
+    column buffers, each starting on an 8-byte boundary
+    directory (JSON) | directory length (uint64) | MAGIC
+
+int/float/bool columns are stored as raw int64/float64/int8 buffers. Text
+columns are an offsets buffer (uint64, rows + 1 entries) into a UTF-8
+heap; object columns (lists, dicts, mixed values) use the same layout with
+each value JSON-encoded.
+
+Files are opened with mmap: typed columns become zero-copy memoryviews and
+text/object cells are decoded only when read, so opening is near-instant
+and only the pages the view scrolls over are touched. A column is copied
+into memory the first time it is edited.
+"""
+
+import json
+import mmap
+import sys
+from array import array
+from atomic_io import atomic_write, atomic_write_json
+from column_store import ColumnStore, TYPECODES, STR
+
+MAGIC = b"IDWCOL01"
+FORMAT_VERSION = 1
+EXTENSION = ".idwc"
+ALIGN = 8
+_TRAILER = 8 + len(MAGIC)
+
+
+class HeapColumn:
+    """Read-only column of variable-length cells decoded on access."""
+
+    __slots__ = ("_view", "_base", "_offsets", "_decode", "_decode_many")
+
+    def __init__(self, view, base, offsets, decode, decode_many):
+        self._view = view
+        self._base = base
+        self._offsets = offsets
+        self._decode = decode
+        self._decode_many = decode_many
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            start, stop, step = row.indices(len(self))
+            if step == 1:
+                return self._decode_range(start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        if row < 0:
+            row += len(self)
+        start = self._base + self._offsets[row]
+        end = self._base + self._offsets[row + 1]
+        return self._decode(self._view[start:end])
+
+    def __iter__(self):
+        view = self._view
+        base = self._base
+        decode = self._decode
+        offsets = self._offsets
+        for row in range(len(offsets) - 1):
+            start = base + offsets[row]
+            end = base + offsets[row + 1]
+            yield decode(view[start:end])
+
+    def _decode_range(self, start, stop):
+        """Decode rows start..stop-1 from one copy of their heap bytes."""
+        if start >= stop:
+            return []
+        end_row = stop + 1
+        bounds = self._offsets[start:end_row].tolist()
+        first = bounds[0]
+        heap_start = self._base + first
+        heap_end = self._base + bounds[-1]
+        heap = bytes(self._view[heap_start:heap_end])
+        return self._decode_many(heap, [bound - first for bound in bounds])
+
+
+def _decode_str(buffer):
+    return sys.intern(str(buffer, "utf-8"))
+
+
+def _decode_object(buffer):
+    return json.loads(bytes(buffer))
+
+
+def _decode_str_many(heap, bounds):
+    pairs = zip(bounds, bounds[1:])
+    if heap.isascii():
+        # Byte offsets are character offsets; decode the heap once
+        text = heap.decode("ascii")
+        return [sys.intern(text[start:end]) for start, end in pairs]
+    return [sys.intern(str(heap[start:end], "utf-8")) for start, end in pairs]
+
+
+def _decode_object_many(heap, bounds):
+    # Parse the cells as one JSON array instead of one document each
+    cells = [heap[start:end] for start, end in zip(bounds, bounds[1:])]
+    return json.loads(b"[" + b",".join(cells) + b"]")
+
+
+def is_columnar_file(path):
+    """Detect the format by extension, or by magic bytes for other names."""
+    if str(path).endswith(EXTENSION):
+        return True
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def encode_column(kind, values):
+    """
+    Encode one column as stored in the format: ``[data]`` for typed kinds,
+    ``[offsets, heap]`` for text and object columns.
+    """
+    if kind in TYPECODES:
+        return [array(TYPECODES[kind], values).tobytes()]
+    if kind == STR:
+        encoded = [value.encode("utf-8") for value in values]
+    else:
+        encoded = [
+            json.dumps(
+                value, ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            for value in values
+        ]
+    offsets = array("Q", [0])
+    total = 0
+    for item in encoded:
+        total += len(item)
+        offsets.append(total)
+    return [offsets.tobytes(), b"".join(encoded)]
+
+
+def map_column(view, entry, rows, swap=False):
+    """
+    Column reading straight from ``view`` (a mapped file or shared memory),
+    laid out as described by its directory ``entry``.
+    """
+    kind = entry["kind"]
+    if kind in TYPECODES:
+        start = entry["offset"]
+        end = start + entry["size"]
+        column = view[start:end].cast(TYPECODES[kind])
+        if swap:
+            column = array(TYPECODES[kind], column)
+            column.byteswap()
+        return column
+    start = entry["offsets"]
+    end = start + (rows + 1) * 8
+    offsets = view[start:end].cast("Q")
+    if swap:
+        offsets = array("Q", offsets)
+        offsets.byteswap()
+    if kind == STR:
+        return HeapColumn(
+            view, entry["heap"], offsets, _decode_str, _decode_str_many
+        )
+    return HeapColumn(
+        view, entry["heap"], offsets, _decode_object, _decode_object_many
+    )
+
+
+def write_columnar(path, store):
+    """Atomically write a ColumnStore to ``path``."""
+    atomic_write(path, lambda f: _write_store(f, store), binary=True)
+
+
+def _write_store(f, store):
+    f.write(MAGIC)
+    f.write(FORMAT_VERSION.to_bytes(4, "little"))
+    f.write(b"\0" * 4)
+    position = len(MAGIC) + 8
+
+    def write_aligned(data):
+        nonlocal position
+        padding = -position % ALIGN
+        f.write(b"\0" * padding)
+        position += padding
+        start = position
+        f.write(data)
+        position += len(data)
+        return start, len(data)
+
+    directory = {
+        "rows": len(store),
+        "byteorder": sys.byteorder,
+        "columns": [],
+    }
+    for col, header in enumerate(store.headers):
+        kind = store.kinds[col]
+        entry = {"name": header, "kind": kind}
+        buffers = encode_column(kind, store.column(col))
+        if kind in TYPECODES:
+            entry["offset"], entry["size"] = write_aligned(buffers[0])
+        else:
+            entry["offsets"], _ = write_aligned(buffers[0])
+            entry["heap"], entry["size"] = write_aligned(buffers[1])
+        directory["columns"].append(entry)
+
+    footer = json.dumps(directory).encode("utf-8")
+    f.write(footer)
+    f.write(len(footer).to_bytes(8, "little"))
+    f.write(MAGIC)
+
+
+def open_columnar(path):
+    """
+    Memory-map a columnar file and return it as a ColumnStore whose
+    columns read straight from the mapping.
+
+    Raises:
+        ValueError: If the file is not a valid columnar file.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    size = len(mapped)
+    magic_size = len(MAGIC)
+    magic_end = size - magic_size
+    footer_end = size - _TRAILER
+    if (
+        size < magic_size + _TRAILER
+        or mapped[:magic_size] != MAGIC
+        or mapped[magic_end:] != MAGIC
+    ):
+        raise ValueError(f"{path} is not a columnar data file")
+
+    footer_size = int.from_bytes(mapped[footer_end:magic_end], "little")
+    footer_start = footer_end - footer_size
+    directory = json.loads(mapped[footer_start:footer_end])
+    rows = directory["rows"]
+    swap = directory["byteorder"] != sys.byteorder
+    view = memoryview(mapped)
+
+    headers, columns, kinds = [], [], []
+    for entry in directory["columns"]:
+        headers.append(entry["name"])
+        columns.append(map_column(view, entry, rows, swap))
+        kinds.append(entry["kind"])
+
+    store = ColumnStore(headers, columns, kinds)
+    store._row_count = rows
+    return store
+
+
+def json_to_columnar(json_path, columnar_path):
+    """Convert a data.json file (streamed) into a columnar file."""
+    from data_manager import DataManager
+
+    chunks = DataManager(json_path).iter_data_chunks()
+    store = None
+    for records, _ in chunks:
+        if store is None:
+            store = ColumnStore.from_records(records, list(records[0].keys()))
+        else:
+            store.append_records(records)
+    write_columnar(columnar_path, store or ColumnStore())
+
+
+def columnar_to_json(columnar_path, json_path):
+    """Convert a columnar file back into the data.json layout."""
+    store = open_columnar(columnar_path)
+    atomic_write_json(
+        json_path, store.to_records(), ensure_ascii=False, indent=2
+    )
@@ -1,6 +1,7 @@
 import json
 import os
 from logger import setup_logger
+from atomic_io import atomic_write_json
 
 logger = setup_logger("config")
 
@@ -49,5 +50,4 @@ def save_config(config, profilename="default"):
     """Saves the user's config settings."""
     config_path = get_config_path(profilename)
 
-    with open(config_path, "w") as file:
-        json.dump(config, file, indent=4)
+    atomic_write_json(config_path, config, indent=4)
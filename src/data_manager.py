@@ -3,21 +3,51 @@ import os
 import json
 import time
 from logger import setup_logger
+from atomic_io import atomic_write, atomic_write_json
+from backup_store import BackupStore
+from column_store import ColumnStore
+from columnar_format import is_columnar_file, open_columnar, write_columnar
+from schema import TableSchema
+from virtual_store import VirtualStore, iter_json_array
 
 logger = setup_logger("data_manager")
 MAX_BACKUPS = 10  # set your cap here
+BACKUP_DIR = "backups"
+STREAM_CHUNK_ROWS = 5000  # rows handed to the model per chunk
+JOURNAL_SUFFIX = ".journal"
+SCHEMA_SUFFIX = ".schema"
+JOURNAL_MAX_BYTES = 8 * 1024 * 1024  # compact once the journal is this big
+JOURNAL_MAX_AGE = 24 * 60 * 60  # ...or the base file is this old (seconds)
 
 
 class DataManager:
     """
     Manages loading, saving, and backing up user data.
 
+    In journaled mode, autosaves append changed cells to a small log next
+    to the data file instead of rewriting it; the base file is only
+    rewritten (compacted) when the log grows past a size or age threshold.
+    Loading always replays base file plus journal.
+
+    The data file is either data.json or a binary columnar file (detected
+    by its ``.idwc`` extension or magic bytes), which is memory-mapped
+    instead of parsed. A data.json too large to load can be opened as a
+    VirtualStore instead, which reads rows from disk on demand.
+
     Attributes:
         file_path (str): The path to the data file.
+        journaled (bool): Whether autosaves may append to the journal.
+        journal_path (str): The path to the change journal.
+        schema_path (str): The path to the saved column schema.
+        columnar (bool): Whether the data file is in the columnar format.
     """
 
-    def __init__(self, file_path="data.json"):
+    def __init__(self, file_path="data.json", journaled=False):
         self.file_path = file_path
+        self.journaled = journaled
+        self.journal_path = file_path + JOURNAL_SUFFIX
+        self.schema_path = file_path + SCHEMA_SUFFIX
+        self.columnar = is_columnar_file(file_path)
 
     def load_data(self):
         """
@@ -26,10 +56,16 @@ class DataManager:
         Returns:
             dict: The data loaded from the file.
         """
+        if self.columnar:
+            store = self.load_columns()
+            return store.to_records() if store is not None else []
         try:
             with open(self.file_path, "r") as f:
                 data = json.load(f)
                 if isinstance(data, list) and isinstance(data[0], dict):
+                    for row, changes in self.read_journal().items():
+                        if row < len(data):
+                            data[row].update(changes)
                     return data
                 else:
                     # Fallback or error handling
@@ -38,58 +74,272 @@ class DataManager:
         except FileNotFoundError:
             return []
 
+    def iter_data_chunks(self, chunk_size=STREAM_CHUNK_ROWS, first_chunk=200):
+        """
+        Stream records from the data file without parsing it all up front.
+
+        The top-level JSON array is decoded one element at a time from a
+        rolling read buffer, so memory stays proportional to one chunk and
+        the first rows are available almost immediately.
+
+        Parameters:
+            chunk_size (int): Rows per yielded chunk.
+            first_chunk (int): Size of the first chunk, kept small so the
+                first screen of rows shows up quickly.
+
+        Yields:
+            tuple: (list of dicts, percent of the file consumed)
+        """
+        if self.columnar:
+            store = self.load_columns()
+            records = store.to_records() if store is not None else []
+            for start in range(0, len(records), chunk_size):
+                end = start + chunk_size
+                percent = min(100, end * 100 // len(records))
+                yield records[start:end], percent
+            return
+
+        journal = self.read_journal()
+        row_count = 0
+        try:
+            total = os.path.getsize(self.file_path) or 1
+            f = open(self.file_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+
+        with f:
+            batch = []
+            limit = first_chunk
+            for record, _, end in iter_json_array(f):
+                if not isinstance(record, dict):
+                    raise ValueError("Unexpected data format")
+                if row_count in journal:
+                    record.update(journal[row_count])
+                row_count += 1
+                batch.append(record)
+                if len(batch) >= limit:
+                    yield batch, min(100, end * 100 // total)
+                    batch = []
+                    limit = chunk_size
+            if batch:
+                yield batch, 100
+
+    def open_virtual(self, **kwargs):
+        """
+        Open the JSON data file as a VirtualStore: rows are read from disk
+        as they are needed instead of all up front (see virtual_store). The
+        journal is applied on top.
+
+        Returns:
+            VirtualStore: The table, or None if the file does not exist or
+            holds no records.
+        """
+        try:
+            store = VirtualStore.open(self.file_path, **kwargs)
+        except FileNotFoundError:
+            return None
+        if store is None:
+            return None
+        headers = store.headers
+        for row, changes in self.read_journal().items():
+            for header, value in changes.items():
+                if row < len(store) and header in headers:
+                    store.set(row, headers.index(header), value)
+        return store
+
+    def load_columns(self):
+        """
+        Open a columnar data file as a memory-mapped ColumnStore, with the
+        journal applied on top.
+
+        Returns:
+            ColumnStore: The table, or None if the file does not exist.
+        """
+        try:
+            store = open_columnar(self.file_path)
+        except FileNotFoundError:
+            return None
+        headers = store.headers
+        for row, changes in self.read_journal().items():
+            for header, value in changes.items():
+                if row < len(store) and header in headers:
+                    store.set(row, headers.index(header), value)
+        return store
+
+    def save_store(self, store):
+        """
+        Save a ColumnStore (e.g. a model snapshot) in this file's format,
+        without building per-row dicts for columnar files.
+        """
+        if self.columnar or isinstance(store, VirtualStore):
+            self.save_data(store)
+        else:
+            self.save_data(store.to_records())
+
+    def _schema_stamp(self):
+        """Size and mtime of the data file and journal the schema is for."""
+        stamp = []
+        for path in (self.file_path, self.journal_path):
+            try:
+                stat = os.stat(path)
+                stamp.append([stat.st_size, stat.st_mtime_ns])
+            except FileNotFoundError:
+                stamp.append(None)
+        return stamp
+
+    def load_schema(self):
+        """
+        Read the saved column schema.
+
+        Returns:
+            TableSchema: The schema, or None if there is none or it was
+            saved for a different version of the data file.
+        """
+        try:
+            with open(self.schema_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry.get("stamp") != self._schema_stamp():
+            return None
+        return TableSchema.from_dict(entry)
+
+    def save_schema(self, schema):
+        """Save a column schema for the data file as it is now."""
+        entry = dict(schema.to_dict(), stamp=self._schema_stamp())
+        try:
+            atomic_write_json(self.schema_path, entry, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Failed to save schema: {e}")
+
+    def read_journal(self):
+        """
+        Read the change journal.
+
+        Returns:
+            dict: row index → {column name: value}, later entries winning.
+                A torn final line (from a crash mid-append) is ignored.
+        """
+        changes = {}
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning("Ignoring torn journal entry")
+                        break
+                    changes.setdefault(entry["row"], {})[entry["column"]] = (
+                        entry["value"]
+                    )
+        except FileNotFoundError:
+            pass
+        return changes
+
+    def append_journal(self, entries):
+        """
+        Append changed cells to the journal.
+
+        Parameter:
+            entries (list): dicts with "row", "column" (header name) and
+                "value" keys.
+        """
+        lines = "".join(
+            json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for entry in entries
+        )
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        logger.info(f"Journaled {len(entries)} changed cells.")
+
+    def needs_compaction(self):
+        """
+        True when the next save should rewrite the base file: journaling is
+        off, the journal is too large, or the base file is too old.
+        """
+        if not self.journaled or not os.path.exists(self.file_path):
+            return True
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return False
+        if journal_size >= JOURNAL_MAX_BYTES:
+            return True
+        base_age = time.time() - os.path.getmtime(self.file_path)
+        return base_age >= JOURNAL_MAX_AGE
+
     def save_data(self, data):
         """
-        Save data to the specified file.
+        Save data to the specified file. This rewrites the whole base file,
+        which folds in (compacts) any journal, so the journal is removed.
 
         Parameter:
-            data (dict): The data to save.
+            data (list): The records to save (or a ColumnStore, for
+                columnar files, or a VirtualStore).
         """
-        # Retry logic
+        # Retry with backoff. Autosaves run on a worker thread, so waiting
+        # here does not block the GUI.
         max_attempts = 3
         delay_seconds = 0.5
 
         for attempt in range(1, max_attempts + 1):
             try:
-                with open(self.file_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                if self.columnar:
+                    if isinstance(data, list):
+                        headers = list(data[0].keys()) if data else []
+                        data = ColumnStore.from_records(data, headers)
+                    write_columnar(self.file_path, data)
+                elif isinstance(data, VirtualStore):
+                    atomic_write(self.file_path, data.write_json, binary=True)
+                else:
+                    atomic_write_json(
+                        self.file_path, data, ensure_ascii=False, indent=2
+                    )
                 logger.info(f"Data saved successfully on attempt {attempt}.")
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
                 return  # success!
             except IOError as e:
                 logger.warning(f"Save attempt {attempt} failed: {e}")
-                time.sleep(delay_seconds)
+                if attempt < max_attempts:
+                    time.sleep(delay_seconds)
+                    delay_seconds *= 2
 
         logger.error("All save attempts failed.")
         raise IOError("Failed to save data after multiple attempts.")
 
     def save_backup(self, data):
-        backup_dir = "backups"
-        os.makedirs(backup_dir, exist_ok=True)
+        """
+        Store a deduplicated, compressed backup and keep the newest
+        MAX_BACKUPS of this file; chunks shared with other backups are
+        stored once and removed when no backup uses them anymore.
 
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        Parameter:
+            data (iterable): The records to back up.
+        """
+        store = BackupStore(BACKUP_DIR)
         filename = os.path.basename(self.file_path)
-        backup_path = os.path.join(backup_dir, f"{filename}.{timestamp}.bak")
-
         try:
-            with open(backup_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logger.info(f"Backup saved to {backup_path}")
+            backup_id = store.save(data, filename, keep=MAX_BACKUPS)
+            logger.info(f"Backup saved as {backup_id}")
         except Exception as e:
             logger.warning(f"Failed to save backup: {e}")
 
-        # 🔁 Delete old backups if over cap
-        backups = sorted(
-            [
-                os.path.join(backup_dir, f)
-                for f in os.listdir(backup_dir)
-                if f.startswith(filename) and f.endswith(".bak")
-            ]
+    def list_backups(self):
+        """Return this file's backup ids, oldest first."""
+        return BackupStore(BACKUP_DIR).list_backups(
+            os.path.basename(self.file_path)
         )
 
-        while len(backups) > MAX_BACKUPS:
-            to_delete = backups.pop(0)
-            try:
-                os.remove(to_delete)
-                logger.info(f"Old backup removed: {to_delete}")
-            except Exception as e:
-                logger.warning(f"Failed to remove old backup: {e}")
+    def restore_backup(self, backup_id):
+        """Replace the data file with the contents of a backup."""
+        store = BackupStore(BACKUP_DIR)
+        if self.columnar:
+            self.save_data(list(store.iter_records(backup_id)))
+        else:
+            store.restore(backup_id, self.file_path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        logger.info(f"Restored backup {backup_id}")
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+
+DISPLAY_CACHE_SIZE = 50000  # cells whose display text is kept
+
+
+class DisplayCache:
+    """
+    Display text of table cells, computed once per cell.
+
+    Plain text (``str(value)``) is kept per cell until that cell changes.
+    Search-highlight HTML is only made for cells that ask for it (the ones
+    being painted) and is kept while the highlight settings (search term,
+    case sensitivity, theme) stay the same; new settings drop all of it.
+    Both caches are bounded LRUs keyed by (row, column).
+    """
+
+    def __init__(self, size=DISPLAY_CACHE_SIZE):
+        self.size = size
+        self._text = OrderedDict()
+        self._html = OrderedDict()  # "" for cells without a match
+        self._settings = None  # highlight settings _html was made for
+
+    def text(self, key):
+        """Cached plain text of a cell, or None."""
+        text = self._text.get(key)
+        if text is not None:
+            self._text.move_to_end(key)
+        return text
+
+    def put_text(self, key, text):
+        self._text[key] = text
+        if len(self._text) > self.size:
+            self._text.popitem(last=False)
+        return text
+
+    def highlight(self, key, settings):
+        """Cached highlight HTML of a cell for ``settings``, or None."""
+        if settings != self._settings:
+            self._html.clear()
+            self._settings = settings
+            return None
+        html = self._html.get(key)
+        if html is not None:
+            self._html.move_to_end(key)
+        return html
+
+    def put_highlight(self, key, html):
+        self._html[key] = html
+        if len(self._html) > self.size:
+            self._html.popitem(last=False)
+        return html
+
+    def invalidate(self, row, col):
+        """Forget one cell, e.g. after an edit."""
+        self._text.pop((row, col), None)
+        self._html.pop((row, col), None)
+
+    def invalidate_column(self, col):
+        for cache in (self._text, self._html):
+            for key in [key for key in cache if key[1] == col]:
+                del cache[key]
+
+    def clear(self):
+        self._text.clear()
+        self._html.clear()
@@ -0,0 +1,665 @@
+import ast
+import gc
+import itertools
+import operator
+from asteval import Interpreter
+
+
+class _EvalError:
+    """
+    Marker stored in a result column when evaluating a row raised an
+    exception. Any attempt to compare or test it raises again, so a failed
+    row can never slip through a filter by accident.
+    """
+
+    def _fail(self, *args):
+        raise TypeError("expression failed for this row")
+
+    __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = _fail
+    __bool__ = __len__ = __iter__ = __contains__ = _fail
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return "<EVAL_ERROR>"
+
+
+EVAL_ERROR = _EvalError()
+
+BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+UNARY_OPS = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+def _is(a, b):
+    if a is EVAL_ERROR or b is EVAL_ERROR:
+        raise TypeError("expression failed for this row")
+    return a is b
+
+
+def _is_not(a, b):
+    return not _is(a, b)
+
+
+COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: _is,
+    ast.IsNot: _is_not,
+}
+NEVER_RAISING_OPS = (ast.Eq, ast.NotEq, ast.Is, ast.IsNot)
+# Comparisons column indexes can answer, and each with its sides swapped
+COMPARE_NAMES = {
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+}
+FLIPPED = {"==": "==", "!=": "!=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+# Methods that can be applied column-wise. Anything else (and in particular
+# anything that mutates a value) is left to asteval.
+SAFE_METHODS = {
+    "capitalize",
+    "casefold",
+    "count",
+    "endswith",
+    "find",
+    "get",
+    "index",
+    "isalnum",
+    "isalpha",
+    "isdigit",
+    "islower",
+    "isnumeric",
+    "isspace",
+    "isupper",
+    "items",
+    "keys",
+    "lower",
+    "lstrip",
+    "replace",
+    "rfind",
+    "rsplit",
+    "rstrip",
+    "split",
+    "startswith",
+    "strip",
+    "title",
+    "upper",
+    "values",
+}
+
+
+class UnsupportedExpression(Exception):
+    """Raised internally when a node cannot be evaluated column-wise."""
+
+
+class _Const:
+    """A compiled node whose value is the same for every row."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class _Pipeline:
+    """
+    A column passed through a chain of one-argument functions (e.g.
+    ``email.split('@')[-1]``). The steps run as chained C-level ``map``
+    iterators, so no intermediate list is built per step.
+    """
+
+    __slots__ = ("name", "steps")
+
+    def __init__(self, name, steps=()):
+        self.name = name
+        self.steps = tuple(steps)
+
+    def then(self, step):
+        return _Pipeline(self.name, self.steps + (step,))
+
+    def __call__(self, columns, count):
+        values = columns[self.name]
+        if not self.steps:
+            return values
+        result = values
+        for step in self.steps:
+            result = map(step, result)
+        try:
+            return list(result)
+        except Exception:
+            pass
+
+        result = []
+        for value in values:
+            try:
+                for step in self.steps:
+                    value = step(value)
+            except Exception:
+                value = EVAL_ERROR
+            result.append(value)
+        return result
+
+
+def _map(func, operands, count, checked=False):
+    """
+    Apply ``func`` element-wise across operands, which are either result
+    columns or ``_Const`` scalars. The common case runs as a single C-level
+    ``map``; only when some row raises do we redo the work row by row.
+    With ``checked`` (some row is expected to raise, e.g. a column holding
+    None) the work is done row by row straight away.
+    """
+    if not checked:
+        vectors = [
+            itertools.repeat(op.value, count) if isinstance(op, _Const) else op
+            for op in operands
+        ]
+        try:
+            return list(map(func, *vectors))
+        except Exception:
+            pass
+
+    vectors = [
+        itertools.repeat(op.value, count) if isinstance(op, _Const) else op
+        for op in operands
+    ]
+    result = []
+    for args in zip(*vectors):
+        if any(arg is EVAL_ERROR for arg in args):
+            result.append(EVAL_ERROR)
+            continue
+        try:
+            result.append(func(*args))
+        except Exception:
+            result.append(EVAL_ERROR)
+    return result
+
+
+def _dotted_name(node):
+    """ "a.b.c" for an attribute chain on a plain name, else None."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+class _NestedColumns(ast.NodeTransformer):
+    """
+    Turn attribute chains naming a nested-field column (``preferences.theme``)
+    into a plain name of that column, so they read the column directly.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def visit_Attribute(self, node):
+        name = _dotted_name(node)
+        if name in self.columns:
+            return ast.copy_location(ast.Name(id=name, ctx=node.ctx), node)
+        return self.generic_visit(node)
+
+
+def _and(left, right):
+    if left is EVAL_ERROR:
+        return EVAL_ERROR
+    return right if left else left
+
+
+def _or(left, right):
+    if left is EVAL_ERROR:
+        return EVAL_ERROR
+    return left if left else right
+
+
+class CompiledExpression:
+    """
+    A filter or sort expression parsed once and turned into column-wise
+    kernels.
+
+    ``evaluate`` takes a mapping of column name to a sequence of values and
+    returns one result per row. Sub-expressions the compiler understands
+    (comparisons, boolean logic, arithmetic, ``in``, the whitelisted
+    built-ins and string methods, subscripts) run across whole columns at
+    once. Anything else falls back to asteval for that sub-expression only,
+    reusing the already-parsed AST for every row.
+
+    Attributes:
+        text (str): The expression source.
+        names (set): Column names referenced by the expression.
+        normalized (str): Dump of the parsed tree; equal for expressions
+            that differ only in spacing or redundant parentheses.
+        vectorized (bool): True when no part of the expression needed the
+            per-row fallback.
+        schema (TableSchema): Column types the kernels were picked for.
+        checked_names (set): Referenced columns the schema says hold None
+            or incomparable types; operations on them that can raise run
+            row by row instead of trying the whole column first.
+    """
+
+    def __init__(self, text, columns, symbols=None, schema=None):
+        self.text = text
+        self._columns = set(columns)
+        self.tree = ast.parse(text, mode="eval")
+        if any("." in name for name in self._columns):
+            self.tree = _NestedColumns(self._columns).visit(self.tree)
+        self.normalized = ast.dump(self.tree)
+        self.symbols = dict(symbols or {})
+        self.schema = schema
+        self._interpreter = None
+        self.vectorized = True
+        self.names = {
+            node.id
+            for node in ast.walk(self.tree)
+            if isinstance(node, ast.Name) and node.id in self._columns
+        }
+        self.checked_names = set()
+        if schema is not None:
+            for name in self.names:
+                column = schema.get(name)
+                if column is not None and not column.uniform:
+                    self.checked_names.add(name)
+        self._kernel = self._compile(self.tree.body)
+
+    def evaluate(self, columns, count):
+        """
+        Evaluate the expression for ``count`` rows.
+
+        Parameters:
+            columns (dict): Column name → sequence of ``count`` values. Only
+                the names in ``self.names`` are read.
+            count (int): Number of rows.
+
+        Returns:
+            list: One value per row; ``EVAL_ERROR`` where the row failed.
+        """
+        if isinstance(self._kernel, _Const):
+            return [self._kernel.value] * count
+        # Kernels allocate one intermediate object per row (split lists,
+        # tuples...) but never reference cycles; with the cyclic GC running
+        # those allocations trigger repeated full-heap collections.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._kernel(columns, count)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def mask(self, columns, count):
+        """Evaluate the expression and reduce each result to a bool."""
+        values = self.evaluate(columns, count)
+        try:
+            return [bool(v) for v in values]
+        except Exception:
+            result = []
+            for v in values:
+                try:
+                    result.append(v is not EVAL_ERROR and bool(v))
+                except Exception:
+                    result.append(False)
+            return result
+
+    def index_bitmap(self, node, lookup, everything):
+        """
+        Bitmap of the rows where a part of this expression holds, answered
+        from column indexes: and/or/not combinations of membership tests,
+        comparisons with a constant and ``startswith`` on indexed columns.
+
+        Parameters:
+            node (ast.AST): A node of this expression's tree.
+            lookup (IndexLookup): Bitmaps of single predicates, or None
+                where a column has no suitable index.
+            everything (int): Bitmap of all rows (for ``not``).
+
+        Returns:
+            int: The bitmap, or None if some test has no index.
+        """
+        return self._bitmap(node, lookup, everything)
+
+    def subexpression(self, nodes):
+        """Compile the ``and`` of some parts of this expression."""
+        if len(nodes) == 1:
+            node = nodes[0]
+        else:
+            node = ast.BoolOp(op=ast.And(), values=list(nodes))
+        return CompiledExpression(
+            ast.unparse(node), self._columns, self.symbols, self.schema
+        )
+
+    def _bitmap(self, node, lookup, everything):
+        """Bitmap of the rows where ``node`` holds, or None."""
+        if isinstance(node, ast.BoolOp):
+            result = None
+            for value in node.values:
+                bits = self._bitmap(value, lookup, everything)
+                if bits is None:
+                    return None
+                if result is None:
+                    result = bits
+                elif isinstance(node.op, ast.And):
+                    result &= bits
+                else:
+                    result |= bits
+            return result
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            bits = self._bitmap(node.operand, lookup, everything)
+            return None if bits is None else everything & ~bits
+
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            left, op, right = node.left, node.ops[0], node.comparators[0]
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not (
+                    isinstance(left, ast.Constant) and self._is_column(right)
+                ):
+                    return None
+                bits = lookup.membership(right.id, left.value)
+                if bits is None or isinstance(op, ast.In):
+                    return bits
+                return everything & ~bits
+            op = COMPARE_NAMES.get(type(op))
+            if op is None:
+                return None
+            if self._is_column(left) and isinstance(right, ast.Constant):
+                return lookup.compare(left.id, op, right.value)
+            if self._is_column(right) and isinstance(left, ast.Constant):
+                return lookup.compare(right.id, FLIPPED[op], left.value)
+            return None
+
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "startswith"
+            and self._is_column(node.func.value)
+            and len(node.args) == 1
+            and not node.keywords
+            and isinstance(node.args[0], ast.Constant)
+        ):
+            return lookup.prefix(node.func.value.id, node.args[0].value)
+
+        return None
+
+    def _is_column(self, node):
+        return isinstance(node, ast.Name) and node.id in self.names
+
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+
+    def _compile(self, node):
+        try:
+            return self._compile_node(node)
+        except UnsupportedExpression:
+            self.vectorized = False
+            return self._fallback(node)
+
+    def _may_fail(self, node):
+        """True if ``node`` reads a column in ``checked_names``."""
+        return bool(self.checked_names) and any(
+            isinstance(n, ast.Name) and n.id in self.checked_names
+            for n in ast.walk(node)
+        )
+
+    def _compile_node(self, node):
+        if isinstance(node, ast.Constant):
+            return _Const(node.value)
+
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            items = [self._compile_node(elt) for elt in node.elts]
+            if not all(isinstance(item, _Const) for item in items):
+                raise UnsupportedExpression(node)
+            values = [item.value for item in items]
+            if isinstance(node, ast.Tuple):
+                return _Const(tuple(values))
+            if isinstance(node, ast.Set):
+                return _Const(frozenset(values))
+            return _Const(values)
+
+        if isinstance(node, ast.Name):
+            if node.id in self._columns:
+                return _Pipeline(node.id)
+            if node.id in self.symbols:
+                raise UnsupportedExpression(node)
+            # Unknown names fail on every row, exactly as asteval would
+            return _Const(EVAL_ERROR)
+
+        if isinstance(node, ast.BoolOp):
+            combine = _and if isinstance(node.op, ast.And) else _or
+            parts = [self._compile(value) for value in node.values]
+            return self._combine(combine, parts)
+
+        if isinstance(node, ast.UnaryOp):
+            func = UNARY_OPS.get(type(node.op))
+            if func is None:
+                raise UnsupportedExpression(node)
+            return self._elementwise(
+                func, [self._compile(node.operand)], self._may_fail(node)
+            )
+
+        if isinstance(node, ast.BinOp):
+            func = BIN_OPS.get(type(node.op))
+            if func is None:
+                raise UnsupportedExpression(node)
+            return self._elementwise(
+                func,
+                [self._compile(node.left), self._compile(node.right)],
+                self._may_fail(node),
+            )
+
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node)
+
+        if isinstance(node, ast.Call):
+            return self._compile_call(node)
+
+        if isinstance(node, ast.Subscript):
+            return self._compile_subscript(node)
+
+        raise UnsupportedExpression(node)
+
+    def _compile_compare(self, node):
+        operands = [self._compile(node.left)] + [
+            self._compile(comp) for comp in node.comparators
+        ]
+        may_fail = self._may_fail(node)
+        parts = []
+        for i, op in enumerate(node.ops):
+            func = COMPARE_OPS.get(type(op))
+            if func is None:
+                raise UnsupportedExpression(node)
+            # Equality and identity tests never raise, whatever the types
+            checked = may_fail and not isinstance(op, NEVER_RAISING_OPS)
+            parts.append(
+                self._elementwise(
+                    func, [operands[i], operands[i + 1]], checked
+                )
+            )
+        if len(parts) == 1:
+            return parts[0]
+        return self._combine(_and, parts)
+
+    def _compile_call(self, node):
+        if node.keywords:
+            raise UnsupportedExpression(node)
+        args = [self._compile(arg) for arg in node.args]
+        checked = self._may_fail(node)
+
+        if isinstance(node.func, ast.Name):
+            func = self.symbols.get(node.func.id)
+            if func is None or node.func.id in self._columns:
+                raise UnsupportedExpression(node)
+            return self._elementwise(func, args, checked)
+
+        if isinstance(node.func, ast.Attribute):
+            method = node.func.attr
+            if method not in SAFE_METHODS:
+                raise UnsupportedExpression(node)
+            target = self._compile(node.func.value)
+            if all(isinstance(arg, _Const) for arg in args):
+                caller = operator.methodcaller(
+                    method, *[arg.value for arg in args]
+                )
+                return self._elementwise(caller, [target], checked)
+            return self._elementwise(
+                lambda obj, *a: getattr(obj, method)(*a),
+                [target] + args,
+                checked,
+            )
+
+        raise UnsupportedExpression(node)
+
+    def _compile_subscript(self, node):
+        target = self._compile(node.value)
+        index = node.slice
+        if isinstance(index, ast.Slice):
+            bounds = [
+                self._compile_node(part) if part is not None else _Const(None)
+                for part in (index.lower, index.upper, index.step)
+            ]
+            if not all(isinstance(b, _Const) for b in bounds):
+                raise UnsupportedExpression(node)
+            key = _Const(slice(*[b.value for b in bounds]))
+        else:
+            key = self._compile(index)
+        return self._elementwise(
+            operator.getitem, [target, key], self._may_fail(node)
+        )
+
+    def _elementwise(self, func, operands, checked=False):
+        if all(isinstance(op, _Const) for op in operands):
+            try:
+                return _Const(func(*[op.value for op in operands]))
+            except Exception:
+                return _Const(EVAL_ERROR)
+
+        step = None if checked else _unary_step(func, operands)
+        if step is not None:
+            return operands[0].then(step)
+
+        def kernel(columns, count):
+            values = [
+                op if isinstance(op, _Const) else op(columns, count)
+                for op in operands
+            ]
+            return _map(func, values, count, checked)
+
+        return kernel
+
+    def _combine(self, combine, parts):
+        def kernel(columns, count):
+            result = None
+            for part in parts:
+                values = (
+                    part if isinstance(part, _Const) else part(columns, count)
+                )
+                if result is None:
+                    result = (
+                        [values.value] * count
+                        if isinstance(values, _Const)
+                        else values
+                    )
+                else:
+                    result = _map(combine, [result, values], count)
+            return result
+
+        return kernel
+
+    def _fallback(self, node):
+        """Evaluate ``node`` with asteval row by row, parsed only once."""
+        if self._interpreter is None:
+            self._interpreter = Interpreter()
+        interpreter = self._interpreter
+        symbols = self.symbols
+        names = sorted(
+            {
+                n.id
+                for n in ast.walk(node)
+                if isinstance(n, ast.Name) and n.id in self._columns
+            }
+        )
+
+        def kernel(columns, count):
+            symtable = interpreter.symtable
+            if names:
+                rows = zip(*[columns[name] for name in names])
+            else:
+                rows = itertools.repeat((), count)
+            result = []
+            for values in rows:
+                symtable.clear()
+                symtable.update(symbols)
+                symtable.update(zip(names, values))
+                interpreter.error = []
+                try:
+                    value = interpreter.run(node, with_raise=True)
+                    if interpreter.error:
+                        value = EVAL_ERROR
+                except Exception:
+                    value = EVAL_ERROR
+                result.append(value)
+            return result
+
+        return kernel
+
+
+def _unary_step(func, operands):
+    """
+    If ``func`` applied to ``operands`` is a one-argument step on a column
+    pipeline, return that step (constants bound in); otherwise None.
+    """
+    if not isinstance(operands[0], _Pipeline):
+        return None
+    if len(operands) == 1:
+        return func
+    if (
+        func is operator.getitem
+        and len(operands) == 2
+        and isinstance(operands[1], _Const)
+    ):
+        return operator.itemgetter(operands[1].value)
+    return None
+
+
+def replace_errors(values, default):
+    """
+    Return ``values`` as a new list with ``EVAL_ERROR`` replaced by
+    ``default``. The check for failed rows is a single C-level pass.
+    """
+    if not any(map(operator.is_, values, itertools.repeat(EVAL_ERROR))):
+        return list(values)
+    return [default if value is EVAL_ERROR else value for value in values]
+
+
+def compile_expression(text, columns, symbols=None, schema=None):
+    """
+    Parse ``text`` once and compile it against the given column names,
+    using the table's schema (if any) to pick kernels per column.
+
+    Raises:
+        SyntaxError: If the expression cannot be parsed.
+    """
+    return CompiledExpression(text, columns, symbols, schema)
@@ -1,5 +1,18 @@
-from PyQt5.QtCore import QSortFilterProxyModel, Qt
-from asteval import Interpreter
+from array import array
+from bisect import bisect_left
+from PyQt5.QtCore import (
+    QAbstractProxyModel,
+    QModelIndex,
+    Qt,
+    QTimer,
+    pyqtSignal,
+)
+from column_index import IndexLookup
+from filter_engine import compile_expression, replace_errors
+from parallel_filter import PARALLEL_MIN_ROWS, ParallelFilter
+from query_planner import build_plan
+from result_cache import ResultCache
+from sort_engine import RankedColumn
 import operator
 
 OPS = {
@@ -11,20 +24,56 @@ OPS = {
     "<=": operator.le,
 }
 
+# Above this many changed rows, dataChanged is forwarded as one range
+DATA_CHANGED_RANGE_ROWS = 64
+INDEX_BUILD_ROWS = 50000  # rows of queued indexes built per event-loop turn
 
-class TableFilterProxyModel(QSortFilterProxyModel):
+
+class TableFilterProxyModel(QAbstractProxyModel):
+    """
+    Filtering and sorting proxy for the data table.
+
+    Filters and sort keys are evaluated column-wise over the whole table
+    (see filter_engine and sort_engine) instead of per row and per
+    comparison. The proxy keeps its own proxy-row → source-row list, so a
+    new sort order or filter result is applied in one pass.
+    """
 
     RAW_VALUE_ROLE = Qt.UserRole + 1
+    # Source rows whose custom sort key value was re-evaluated
+    sort_keys_changed = pyqtSignal(object)
 
     def __init__(self):
         super().__init__()
-        self.asteval_engine = Interpreter()
         self.search_text = ""
         self.case_sensitive = False
         self.custom_expr = ""
         self.structured_filter = {"field": "", "operator": "", "value": ""}
         self.custom_sort_key = ""
-        self.sort_key_cache = {}  # stores sort key results per row
+        self.sort_key_cache = []  # custom sort key value per source row
+        self.sort_spec = []  # [(column name or expression, ascending)]
+        self._compiled_filter = None  # custom_expr parsed once
+        self._compiled_keys = {}  # sort expression → CompiledExpression
+        self._ranked = {}  # sort key → RankedColumn, kept across edits
+        self._filter_mask = None  # accepted flag per source row
+        self._search_rows = None  # source rows matching search_text
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._sorted_rows = None  # every source row, in sort order
+        # Row maps are arrays of ints: 8 bytes per row, not a list of ints
+        self._proxy_to_source = array("q")
+        self._source_to_proxy = array("q")  # -1 for filtered-out rows
+        self._pending_layout = None
+        # Masks, key values, ranks and orders by expression and the
+        # versions of the columns they read; see result_cache
+        self.result_cache = ResultCache()
+        self.parallel_filter = None  # see set_filter_workers
+        self.last_plan = None  # QueryPlan of the last planned filter pass
+        # Builds the indexes filter passes queued, between event-loop turns
+        self._index_timer = QTimer(self)
+        self._index_timer.setSingleShot(True)
+        self._index_timer.setInterval(0)
+        self._index_timer.timeout.connect(self._build_index_chunk)
 
         self.base_symbols = {
             "len": len,
@@ -38,73 +87,180 @@ class TableFilterProxyModel(QSortFilterProxyModel):
             "round": round,
         }
 
+    # ------------------------------------------------------------------
+    # QAbstractProxyModel interface
+    # ------------------------------------------------------------------
+
+    def index(self, row, column, parent=QModelIndex()):
+        if (
+            parent.isValid()
+            or not 0 <= row < len(self._proxy_to_source)
+            or not 0 <= column < self.columnCount()
+        ):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()  # QObject parent
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._proxy_to_source)
+
+    def columnCount(self, parent=QModelIndex()):
+        model = self.sourceModel()
+        if parent.isValid() or model is None:
+            return 0
+        return model.columnCount()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """
+        Column headers come straight from the source, so they stay right
+        when no row passes the filter; row headers follow the mapping.
+        """
+        model = self.sourceModel()
+        if model is None:
+            return None
+        if orientation == Qt.Horizontal:
+            return model.headerData(section, orientation, role)
+        if not 0 <= section < len(self._proxy_to_source):
+            return None
+        return model.headerData(
+            self._proxy_to_source[section], orientation, role
+        )
+
+    def mapToSource(self, proxy_index):
+        model = self.sourceModel()
+        if model is None or not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row()
+        if row >= len(self._proxy_to_source):
+            return QModelIndex()
+        return model.index(self._proxy_to_source[row], proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row()
+        if row >= len(self._source_to_proxy):
+            return QModelIndex()
+        proxy_row = self._source_to_proxy[row]
+        if proxy_row < 0:
+            return QModelIndex()
+        return self.index(proxy_row, source_index.column())
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Sort by one header column (or by the custom sort key, when one is
+        set). Replaces any multi-key sort specification.
+        """
+        model = self.sourceModel()
+        self._sort_column = column
+        self._sort_order = order
+        ascending = order == Qt.AscendingOrder
+        if model is None or not 0 <= column < model.columnCount():
+            self.set_sort_spec([])
+        elif self.custom_sort_key:
+            self.set_sort_spec([(self.custom_sort_key, ascending)])
+        else:
+            self.set_sort_spec([(model._headers[column], ascending)])
+
+    def set_sort_spec(self, spec):
+        """
+        Sort by several keys at once, the first being the most significant.
+
+        Parameters:
+            spec (list): ``(key, ascending)`` pairs, or dicts with "key" and
+                "ascending" (as stored in saved views). A key is a column
+                name or a sort expression such as ``len(email)``.
+        """
+        normalized = []
+        for entry in spec:
+            if isinstance(entry, dict):
+                key, ascending = entry.get("key", ""), entry.get(
+                    "ascending", True
+                )
+            else:
+                key, ascending = entry
+            key = str(key).strip()
+            if key:
+                normalized.append((key, bool(ascending)))
+        self.sort_spec = normalized
+        self._sorted_rows = None
+        self._relayout()
+
+    def sort_spec_config(self):
+        """The sort specification in its saved-view (JSON) form."""
+        return [
+            {"key": key, "ascending": ascending}
+            for key, ascending in self.sort_spec
+        ]
+
+    def sortColumn(self):
+        return self._sort_column
+
+    def sortOrder(self):
+        return self._sort_order
+
+    def setSourceModel(self, model):
+        old_model = self.sourceModel()
+        if old_model is not None:
+            for signal, slot in self._source_connections(old_model):
+                try:
+                    signal.disconnect(slot)
+                except TypeError:
+                    pass
+
+        self.beginResetModel()
+        super().setSourceModel(model)
+        if model is not None:
+            for signal, slot in self._source_connections(model):
+                signal.connect(slot)
+        self._compile_custom_filter()
+        self._compiled_keys = {}
+        self.result_cache.clear()
+        self._reset_caches()
+        self._rebuild_mapping()
+        self.endResetModel()
+
+    def _source_connections(self, model):
+        return (
+            (model.dataChanged, self._source_data_changed),
+            (model.rowsInserted, self._source_rows_inserted),
+            (model.headerDataChanged, self.headerDataChanged),
+            (model.modelAboutToBeReset, self.beginResetModel),
+            (model.modelReset, self._source_reset),
+            (model.rowsAboutToBeRemoved, self._source_about_to_reset),
+            (model.rowsRemoved, self._source_reset),
+            (model.rowsAboutToBeMoved, self._source_about_to_reset),
+            (model.rowsMoved, self._source_reset),
+            (model.layoutAboutToBeChanged, self._source_about_to_relayout),
+            (model.layoutChanged, self._source_relayout),
+        )
+
+    # ------------------------------------------------------------------
+    # Filter and sort settings
+    # ------------------------------------------------------------------
+
     def set_search_text(self, text):
         self.search_text = text
+        self._search_rows = None
         self.invalidateFilter()
-        self.layoutChanged.emit()
 
     def set_case_sensitive(self, enabled):
         self.case_sensitive = enabled
+        self._search_rows = None
+        self._compile_custom_filter()
         self.invalidateFilter()
-        self.layoutChanged.emit()
 
     def set_custom_sort_key(self, expr):
+        self._ranked.pop(self.custom_sort_key, None)
         self.custom_sort_key = expr.strip()
-        # self.invalidate()
-
-    def filterAcceptsRow(self, source_row, source_parent):
-        model = self.sourceModel()
-
-        # Simple text search handling
-        if self.search_text and not self.custom_expr:
-            column_count = model.columnCount()
-            match_found = False
-            for col in range(column_count):
-                index = model.index(source_row, col)
-                data = model.data(index, Qt.DisplayRole)
-                if data is None:
-                    continue
-                text = str(data)
-                if self.case_sensitive:
-                    if self.search_text in text:
-                        match_found = True
-                        break
-                else:
-                    if self.search_text.lower() in text.lower():
-                        match_found = True
-                        break
-            if not match_found:
-                return False
-
-        # Step 2: custom expression
-        if self.custom_expr:
-            try:
-                row_dict = {}
-                headers = model._headers
-                for col_index, header in enumerate(headers):
-                    index = model.index(source_row, col_index)
-                    value = model.data(index, self.RAW_VALUE_ROLE)
-                    row_dict[header] = value
-
-                expr = self.custom_expr
-                if not self.case_sensitive:
-                    # Lowercase everything for comparison if case-insensitive
-                    row_dict = {
-                        k: v.lower() if isinstance(v, str) else v
-                        for k, v in row_dict.items()
-                    }
-                    expr = expr.lower()
-
-                self.asteval_engine.symtable.clear()
-                self.asteval_engine.symtable.update(row_dict)
-                result = self.asteval_engine(expr)
-
-                if not result:
-                    return False
-
-            except Exception:
-                return False
-        return True
+        self.sort_key_cache = []
+        self._sorted_rows = None
 
     def set_structured_filter(self, field, operator_, value):
         if field and operator_ and value:
@@ -116,67 +272,887 @@ class TableFilterProxyModel(QSortFilterProxyModel):
         else:
             self.structured_filter = None
         self.invalidateFilter()
-        self.layoutChanged.emit()
+
+    def set_filter_workers(self, workers, min_rows=PARALLEL_MIN_ROWS):
+        """
+        Evaluate custom filters over tables of ``min_rows`` rows or more in
+        a pool of ``workers`` processes; 1 or less keeps them in-process.
+        """
+        if self.parallel_filter is not None:
+            self.parallel_filter.close()
+        self.parallel_filter = (
+            ParallelFilter(workers, min_rows) if workers > 1 else None
+        )
 
     def set_custom_filter_expression(self, expr):
         self.custom_expr = expr.strip()
+        self._compile_custom_filter()
+        self.invalidateFilter()
+
+    def set_filter_state(self, search_text, expr, compiled=None, mask=None):
+        """
+        Replace the search text and custom expression together, with a
+        single relayout.
+
+        Parameters:
+            compiled (CompiledExpression, optional): ``expr`` already parsed.
+            mask (list, optional): Its per-row result, computed ahead (see
+                FilterScheduler).
+        """
+        self.search_text = search_text
+        self._search_rows = None
+        self.custom_expr = expr.strip()
+        if compiled is None:
+            self._compile_custom_filter()
+        else:
+            self._compiled_filter = compiled
+            self._filter_mask = mask
+            if mask is not None:
+                self.result_cache.put(self._mask_cache_key(compiled), mask)
         self.invalidateFilter()
+
+    def invalidateFilter(self):
+        """Re-apply the filters, keeping the current sort order."""
+        self._relayout()
+
+    def invalidate(self):
+        """Re-evaluate filters and sort keys from scratch."""
+        self._reset_caches()
+        self._relayout()
+
+    def filterAcceptsRow(self, source_row, source_parent=QModelIndex()):
+        model = self.sourceModel()
+
+        # Simple text search handling
+        if self.search_text and not self.custom_expr:
+            if self._search_rows is None:
+                self._search_rows = model.search_rows(
+                    self.search_text, self.case_sensitive
+                )
+            if source_row not in self._search_rows:
+                return False
+
+        # Step 2: custom expression
+        if self.custom_expr:
+            if self._filter_mask is None:
+                self._filter_mask = self._full_filter_mask()
+            if not self._filter_mask[source_row]:
+                return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Row mapping
+    # ------------------------------------------------------------------
+
+    def _accepted_rows(self, rows):
+        """Return the rows in ``rows`` that pass the filters, in order."""
+        model = self.sourceModel()
+        if self.custom_expr:
+            if self._filter_mask is None:
+                self._filter_mask = self._full_filter_mask()
+            mask = self._filter_mask
+            return [row for row in rows if mask[row]]
+        if self.search_text:
+            if self._search_rows is None:
+                self._search_rows = model.search_rows(
+                    self.search_text, self.case_sensitive
+                )
+            matches = self._search_rows
+            if isinstance(rows, range):
+                return sorted(matches)
+            return [row for row in rows if row in matches]
+        return list(rows)
+
+    def _rebuild_mapping(self):
+        model = self.sourceModel()
+        count = model.rowCount() if model is not None else 0
+        rows = self._sort_rows()
+        if rows is None:
+            rows = range(count)
+        self._proxy_to_source = array("q", self._accepted_rows(rows))
+        source_to_proxy = array("q", [-1]) * count
+        for proxy_row, source_row in enumerate(self._proxy_to_source):
+            source_to_proxy[source_row] = proxy_row
+        self._source_to_proxy = source_to_proxy
+
+    def _relayout(self):
+        """
+        Rebuild the mapping as a layout change, so selections and the
+        current index follow their rows.
+        """
+        self._begin_relayout()
+        self._rebuild_mapping()
+        self._end_relayout()
+
+    def _begin_relayout(self):
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        self._pending_layout = (
+            persistent,
+            [
+                (self._proxy_to_source[index.row()], index.column())
+                for index in persistent
+            ],
+        )
+
+    def _end_relayout(self):
+        persistent, sources = self._pending_layout
+        self._pending_layout = None
+        source_to_proxy = self._source_to_proxy
+        updated = []
+        for source_row, column in sources:
+            proxy_row = (
+                source_to_proxy[source_row]
+                if source_row < len(source_to_proxy)
+                else -1
+            )
+            updated.append(
+                self.index(proxy_row, column)
+                if proxy_row >= 0
+                else QModelIndex()
+            )
+        self.changePersistentIndexList(persistent, updated)
         self.layoutChanged.emit()
 
-    def lessThan(self, left, right):
+    # ------------------------------------------------------------------
+    # Sorting
+    # ------------------------------------------------------------------
+
+    def _sort_rows(self):
+        """
+        Every source row in the current sort order (None: unsorted).
+
+        Multi-key sorts run as one stable sort pass per key, from the least
+        to the most significant, each over that key's cached rank array.
+        """
+        if self._sorted_rows is None:
+            model = self.sourceModel()
+            if model is None or not self.sort_spec:
+                return None
+            ranked = [
+                (self._ranked_key(key), ascending)
+                for key, ascending in self.sort_spec
+            ]
+            cache_key = (
+                "order",
+                tuple((self._key_id(key), asc) for key, asc in self.sort_spec),
+                self._versions(
+                    set().union(
+                        *(self._key_names(k) for k, _ in self.sort_spec)
+                    )
+                ),
+            )
+            self._sorted_rows = self.result_cache.get_or_compute(
+                cache_key, lambda: self._lexsort(ranked)
+            )
+        return self._sorted_rows
+
+    def _lexsort(self, ranked):
+        rows = list(range(self.sourceModel().rowCount()))
+        for column, ascending in reversed(ranked):
+            if column is not None:
+                rows.sort(key=column.ranks.__getitem__, reverse=not ascending)
+        return rows
+
+    def _row_sort_key(self):
+        """
+        Key function placing a source row in the current sort order: the
+        signed rank of each sort key, then the row itself, which is how the
+        stable sort passes break ties. Lets a single row be located and
+        re-inserted by binary search.
+        """
+        columns = [
+            (self._ranked[key].ranks, ascending)
+            for key, ascending in self.sort_spec
+            if key in self._ranked
+        ]
+
+        def sort_key(row):
+            return tuple(
+                ranks[row] if ascending else -ranks[row]
+                for ranks, ascending in columns
+            ) + (row,)
+
+        return sort_key
+
+    def _ranked_key(self, key):
+        """The cached RankedColumn for a sort key, built on first use."""
+        ranked = self._ranked.get(key)
+        if ranked is None:
+            cache_key = (
+                "ranks",
+                self._key_id(key),
+                self._versions(self._key_names(key)),
+            )
+            ranked = self.result_cache.get(cache_key)
+            if ranked is None:
+                values = self._key_values(key)
+                if values is None:
+                    return None
+                ranked = RankedColumn(values, typed=self._mixed_key(key))
+                self.result_cache.put(cache_key, ranked)
+            self._ranked[key] = ranked
+        return ranked
+
+    def _mixed_key(self, key):
+        """
+        True when the schema says a column sort key mixes types that do not
+        compare, so ranking goes straight to the mixed-type order.
+        """
+        schema = self.sourceModel().schema
+        column = schema.get(key) if schema is not None else None
+        return column is not None and column.mixed
+
+    def _key_values(self, key, rows=None):
+        """
+        Per-row values of a sort key (all rows, or just ``rows``); rows
+        whose expression fails get "". None if the key is invalid.
+        """
         model = self.sourceModel()
-        left_val = model.data(left, model.RAW_VALUE_ROLE)
-        right_val = model.data(right, model.RAW_VALUE_ROLE)
+        headers = model._headers
+        if key in headers:
+            col = headers.index(key)
+            if rows is None:
+                return model.column(col)
+            return model.column_values(col, rows)
+        if key == self.custom_sort_key and rows is None:
+            if len(self.sort_key_cache) != model.rowCount():
+                self.rebuild_sort_key_cache()
+            if len(self.sort_key_cache) != model.rowCount():
+                return None  # the expression does not parse
+            return self.sort_key_cache
+        return self._evaluate_key(key, rows)
+
+    def _evaluate_key(self, key, rows=None):
+        """Evaluate a sort expression column-wise; failed rows get ""."""
+        compiled = self._compiled_key(key)
+        if compiled is None:
+            return None
+        if rows is not None:
+            return self._evaluate_compiled_key(compiled, rows)
+        cache_key = (
+            "values",
+            compiled.normalized,
+            self._versions(compiled.names),
+        )
+        return self.result_cache.get_or_compute(
+            cache_key, lambda: self._evaluate_compiled_key(compiled)
+        )
+
+    def _evaluate_compiled_key(self, compiled, rows=None):
+        count = self.sourceModel().rowCount() if rows is None else len(rows)
+        columns = self._expression_columns(compiled, rows)
+        return replace_errors(compiled.evaluate(columns, count), "")
 
-        if self.custom_sort_key:
-            val_left = self.sort_key_cache.get(left.row(), "")
-            val_right = self.sort_key_cache.get(right.row(), "")
+    def _compiled_key(self, key):
+        if key not in self._compiled_keys:
             try:
-                return val_left < val_right
+                model = self.sourceModel()
+                self._compiled_keys[key] = compile_expression(
+                    key, model._headers, self.base_symbols, model.schema
+                )
             except SyntaxError as e:
                 print(f"Custom filter syntax error: {e}")
-                print(f"Expression was: {self.custom_sort_key}")
-                return False
-            except Exception as e:
-                print(f"Custom filter evaluation error: {e}")
-                return False
+                print(f"Expression was: {key}")
+                self._compiled_keys[key] = None
+        return self._compiled_keys[key]
 
-        try:
-            return left_val < right_val
-        except Exception:
-            return False
+    def _key_id(self, key):
+        """A sort key as cached: column name, or normalized expression."""
+        if key in self.sourceModel()._headers:
+            return key
+        compiled = self._compiled_key(key)
+        return compiled.normalized if compiled is not None else key
+
+    def _versions(self, names):
+        """
+        Row count and versions of the named columns: the part of a result
+        cache key that says which data a result was computed from.
+        """
+        model = self.sourceModel()
+        headers = model._headers
+        return (model.rowCount(),) + tuple(
+            sorted(
+                (name, model.column_version(headers.index(name)))
+                for name in names
+            )
+        )
+
+    def _key_names(self, key):
+        """The column names a sort key reads."""
+        headers = self.sourceModel()._headers
+        if key in headers:
+            return {key}
+        compiled = self._compiled_key(key)
+        return compiled.names if compiled is not None else set()
 
     def rebuild_sort_key_cache(self):
-        self.sort_key_cache.clear()
+        """
+        Evaluate the custom sort key for every row, column-wise, and
+        invalidate the current sort order.
+        """
+        self._ranked.pop(self.custom_sort_key, None)
+        self._sorted_rows = None
+        self.sort_key_cache = []
+        if self.sourceModel() is None or not self.custom_sort_key:
+            return
+        self.sort_key_cache = self._evaluate_key(self.custom_sort_key) or []
+
+    # ------------------------------------------------------------------
+    # Filtering
+    # ------------------------------------------------------------------
+
+    def _compile_custom_filter(self):
+        """
+        Parse the custom filter expression once. The per-row mask is built
+        lazily on the next filter pass.
+        """
+        self._compiled_filter = None
+        self._filter_mask = None
         model = self.sourceModel()
-        if not model:
+        if not self.custom_expr or model is None:
             return
 
+        try:
+            self._compiled_filter = self.compile_filter(self.custom_expr)
+        except SyntaxError as e:
+            print(f"Custom filter syntax error: {e}")
+            print(f"Expression was: {self.custom_expr}")
+
+    def compile_filter(self, expr):
+        """
+        Parse a custom filter expression against the current columns.
+
+        Raises:
+            SyntaxError: If the expression cannot be parsed.
+        """
+        if not self.case_sensitive:
+            expr = expr.lower()
+        model = self.sourceModel()
+        return compile_expression(
+            expr, model._headers, self.base_symbols, model.schema
+        )
+
+    def source_rows(self):
+        """The source rows shown, in proxy order."""
+        return list(self._proxy_to_source)
+
+    def evaluate_expression(self, expr, rows=None):
+        """
+        Evaluate an expression (same names and helpers as custom filters)
+        for some source rows, e.g. to fill a column.
+
+        Returns:
+            list: One value per row; EVAL_ERROR where the row failed.
+
+        Raises:
+            SyntaxError: If the expression cannot be parsed.
+        """
+        model = self.sourceModel()
+        compiled = compile_expression(
+            expr, model._headers, self.base_symbols, model.schema
+        )
+        count = model.rowCount() if rows is None else len(rows)
+        return compiled.evaluate(
+            self._expression_columns(compiled, rows), count
+        )
+
+    def filter_mask_rows(self, compiled, rows):
+        """Evaluate a compiled filter for some source rows only."""
+        columns = self._expression_columns(
+            compiled, rows, lower=not self.case_sensitive
+        )
+        return compiled.mask(columns, len(rows))
+
+    def _expression_columns(self, compiled, rows=None, lower=False):
+        """
+        Collect the columns a compiled expression references, optionally
+        lower-casing strings.
+        """
+        model = self.sourceModel()
         headers = model._headers
-        for row in range(model.rowCount()):
-            row_dict = {}
-            for col_index, header in enumerate(headers):
-                index = model.index(row, col_index)
-                value = model.data(index, self.RAW_VALUE_ROLE)
-                row_dict[header] = value
-
-            if self.custom_sort_key:
-                try:
-                    self.asteval_engine.symtable.clear()
-                    # 🛠 First inject built-ins
-                    self.asteval_engine.symtable.update(self.base_symbols)
-                    # 🛠 Then inject row fields
-                    self.asteval_engine.symtable.update(row_dict)
-                    try:
-                        val = self.asteval_engine(self.custom_sort_key)
-                    except SyntaxError as e:
-                        print(f"Custom filter syntax error: {e}")
-                        print(f"Expression was: {self.custom_sort_key}")
-                        return False
-                    except Exception as e:
-                        print(f"Custom filter evaluation error: {e}")
-                        return False
-                    self.sort_key_cache[row] = val
-                except Exception as e:
-                    print(f"Sort key error at row {row}: {e}")
-                    self.sort_key_cache[row] = ""
+        columns = {}
+        for name in compiled.names:
+            col = headers.index(name)
+            if rows is None:
+                values = model.column(col)
+            else:
+                values = model.column_values(col, rows)
+            if lower:
+                values = [
+                    v.lower() if isinstance(v, str) else v for v in values
+                ]
+            columns[name] = values
+        return columns
+
+    def _filter_columns(self, rows=None):
+        """
+        Collect the columns the compiled filter references, lower-casing
+        strings when the search is case-insensitive.
+        """
+        return self._expression_columns(
+            self._compiled_filter, rows, lower=not self.case_sensitive
+        )
+
+    def _mask_cache_key(self, compiled):
+        return (
+            "mask",
+            compiled.normalized,
+            self.case_sensitive,
+            self._versions(compiled.names),
+        )
+
+    def cached_filter_mask(self, compiled):
+        """The full-table mask of a compiled filter if cached, else None."""
+        return self.result_cache.get(self._mask_cache_key(compiled))
+
+    def parallel_filter_applies(self, compiled):
+        """True if a full-table pass of ``compiled`` runs in the pool."""
+        return self.parallel_filter is not None and (
+            self.parallel_filter.applies(
+                compiled, self.sourceModel().rowCount()
+            )
+        )
+
+    def plan_filter(self, compiled, build=True):
+        """
+        Plan a compiled filter against the current table (see
+        query_planner): which parts column indexes answer, and in which
+        order the others are scanned.
+
+        Parameters:
+            compiled (CompiledExpression): The filter.
+            build (bool): Build missing indexes while planning; if False
+                only built ones are used and the rest are queued (see
+                ColumnIndexes.build_step).
+        """
+        model = self.sourceModel()
+        count = model.rowCount()
+        lookup = IndexLookup(
+            model.indexes,
+            model._headers,
+            count,
+            not self.case_sensitive,
+            build,
+        )
+        return build_plan(
+            compiled, lookup, count, self._evaluate_part, model.schema
+        )
+
+    def _evaluate_part(self, compiled, rows=None):
+        """Values of a filter part for some source rows (None: all)."""
+        columns = self._expression_columns(
+            compiled, rows, lower=not self.case_sensitive
+        )
+        count = self.sourceModel().rowCount() if rows is None else len(rows)
+        return compiled.evaluate(columns, count)
+
+    def run_plan(self, plan):
+        """Run a QueryPlan; it is kept as ``last_plan`` for explain."""
+        mask = plan.execute(self._evaluate_part)
+        self.last_plan = plan
+        return mask
+
+    def planned_filter_mask(self, compiled, max_seconds=None, build=True):
+        """
+        The full-table mask of ``compiled`` worked out through a query
+        plan: indexed parts narrow the rows down and the other parts run
+        cheapest and most selective first, each on the rows still left.
+
+        Parameters:
+            compiled (CompiledExpression): The filter.
+            max_seconds (float, optional): Give up (return None) when the
+                plan is estimated to take longer than this.
+            build (bool): Build missing indexes (see plan_filter).
+
+        Returns:
+            list: One bool per row, or None when the filter has a single
+            part and no index, so a plain evaluation does as well.
+        """
+        plan = self.plan_filter(compiled, build)
+        if not plan.useful:
+            return None
+        if max_seconds is not None and plan.estimated_seconds() > max_seconds:
+            return None
+        return self.run_plan(plan)
+
+    def explain_filter(self, expr):
+        """
+        Plan and run a filter expression without applying it.
+
+        Returns:
+            str: The chosen plan with per-part estimates and timings.
+
+        Raises:
+            SyntaxError: If the expression does not parse.
+        """
+        plan = self.plan_filter(self.compile_filter(expr))
+        self.run_plan(plan)
+        return plan.explain()
+
+    def _full_filter_mask(self):
+        compiled = self._compiled_filter
+        if compiled is None:
+            return self._evaluate_filter_mask()
+        return self.result_cache.get_or_compute(
+            self._mask_cache_key(compiled), self._evaluate_filter_mask
+        )
+
+    def _evaluate_filter_mask(self, rows=None):
+        model = self.sourceModel()
+        count = model.rowCount() if rows is None else len(rows)
+        if self._compiled_filter is None:
+            return [False] * count
+        compiled = self._compiled_filter
+        if rows is None:
+            # Only indexes already built are used; missing ones are queued
+            # and built in chunks afterwards
+            plan = self.plan_filter(compiled, build=False)
+            self.build_queued_indexes()
+            parallel = self.parallel_filter_applies(compiled)
+            # Indexes beat any scan; reordering beats a single-thread one
+            if plan.indexed or (plan.useful and not parallel):
+                return self.run_plan(plan)
+            if parallel:
+                mask = self.parallel_filter.mask(
+                    compiled, model, lower=not self.case_sensitive
+                )
+                if mask is not None:
+                    return mask
+        return self._compiled_filter.mask(self._filter_columns(rows), count)
+
+    def build_queued_indexes(self):
+        """
+        Build the indexes planning queued (see ColumnIndexes.build_step), a
+        chunk of rows per event-loop turn.
+        """
+        model = self.sourceModel()
+        if model is not None and model.indexes.building:
+            self._index_timer.start()
+
+    def _build_index_chunk(self):
+        model = self.sourceModel()
+        if model is not None and model.indexes.build_step(INDEX_BUILD_ROWS):
+            self._index_timer.start()
+
+    def _reset_caches(self):
+        self._filter_mask = None
+        self._search_rows = None
+        self.sort_key_cache = []
+        self._ranked = {}
+        self._sorted_rows = None
+
+    def _row_matches_search(self, row):
+        needle = self.search_text
+        if not self.case_sensitive:
+            needle = needle.lower()
+        for value in self.sourceModel().row_values(row):
+            text = str(value)
+            if needle in (text if self.case_sensitive else text.lower()):
+                return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Source model signals
+    # ------------------------------------------------------------------
+
+    def _source_reset(self, *args):
+        self._reset_caches()
+        self._rebuild_mapping()
+        self.endResetModel()
+
+    def _source_about_to_reset(self, *args):
+        self.beginResetModel()
+
+    def _source_about_to_relayout(self, *args):
+        self._begin_relayout()
+
+    def _source_relayout(self, *args):
+        if self._pending_layout is None:
+            # layoutChanged without layoutAboutToBeChanged (e.g. theme)
+            self._begin_relayout()
+        self._rebuild_mapping()
+        self._end_relayout()
+
+    def _source_rows_inserted(self, parent, first, last):
+        """
+        Extend the cached filter results and sort keys for appended rows
+        only; rows inserted in the middle shift every index, so start over
+        then.
+        """
+        rows = range(first, last + 1)
+        if first != len(self._source_to_proxy):
+            self._reset_caches()
+            self._relayout()
+            return
+
+        if self._search_rows is not None:
+            self._search_rows.update(
+                row for row in rows if self._row_matches_search(row)
+            )
+        if self._filter_mask is not None:
+            if self._compiled_filter is None:
+                self._filter_mask = None
+            else:
+                self._filter_mask.extend(self._evaluate_filter_mask(rows))
+
+        self._extend_sort_keys(rows)
+        if self.sort_spec:
+            self._relayout()
+            return
+
+        # Unsorted: accepted rows go to the end of the proxy
+        accepted = self._accepted_rows(rows)
+        self._source_to_proxy.extend([-1] * len(rows))
+        if not accepted:
+            return
+        start = len(self._proxy_to_source)
+        self.beginInsertRows(QModelIndex(), start, start + len(accepted) - 1)
+        for offset, row in enumerate(accepted):
+            self._source_to_proxy[row] = start + offset
+        self._proxy_to_source.extend(accepted)
+        self.endInsertRows()
+
+    def _extend_sort_keys(self, rows):
+        """
+        Rank appended rows against the cached keys. For a single-key sort
+        they are merged into the sorted order directly (timsort merges the
+        existing sorted run with the new tail in linear time).
+        """
+        self._update_ranked_keys(rows, appended=True)
+        if self._sorted_rows is None:
+            return
+        if (
+            len(self.sort_spec) != 1
+            or self.sort_spec[0][0] not in self._ranked
+        ):
+            self._sorted_rows = None
+            return
+        key, ascending = self.sort_spec[0]
+        self._sorted_rows.extend(rows)
+        self._sorted_rows.sort(
+            key=self._ranked[key].ranks.__getitem__, reverse=not ascending
+        )
+
+    def _update_ranked_keys(self, rows, columns=None, appended=False):
+        """
+        Targeted update of the cached rank arrays for changed or appended
+        rows; a key that cannot be updated in place is dropped and rebuilt
+        on next use.
+
+        Returns:
+            bool: True if a key of the current sort changed.
+        """
+        model = self.sourceModel()
+        changed = None
+        if columns is not None:
+            changed = {model._headers[c] for c in columns}
+        custom = self.custom_sort_key
+        if custom and self.sort_key_cache:
+            if appended and len(self.sort_key_cache) == rows.start:
+                self.sort_key_cache.extend(self._key_values(custom, rows))
+            elif not appended and changed & self._key_names(custom):
+                for row, value in zip(rows, self._key_values(custom, rows)):
+                    self.sort_key_cache[row] = value
+            elif appended:
+                self.sort_key_cache = []
+
+        affected = any(
+            changed is None or changed & self._key_names(key)
+            for key, _ in self.sort_spec
+        )
+        # Keys spelled differently but equal once normalized share one
+        # RankedColumn (from result_cache); update each object only once
+        updated_columns = {}
+        for key, ranked in list(self._ranked.items()):
+            if changed is not None and not changed & self._key_names(key):
+                continue
+            if len(rows) > DATA_CHANGED_RANGE_ROWS and not appended:
+                del self._ranked[key]
+                continue
+            if id(ranked) in updated_columns:
+                if not updated_columns[id(ranked)]:
+                    del self._ranked[key]
+                continue
+            if key == custom and self.sort_key_cache:
+                values = [self.sort_key_cache[row] for row in rows]
+            else:
+                values = self._key_values(key, rows)
+            if appended:
+                updated = values is not None and ranked.extend(values)
+            else:
+                updated = values is not None and all(
+                    ranked.set(row, value) for row, value in zip(rows, values)
+                )
+            updated_columns[id(ranked)] = updated
+            if not updated:
+                del self._ranked[key]
+        return affected
+
+    def _source_data_changed(self, top_left, bottom_right, roles=None):
+        rows = range(top_left.row(), bottom_right.row() + 1)
+        columns = range(top_left.column(), bottom_right.column() + 1)
+        custom_key_changed = self._custom_key_reads(columns)
+        if len(rows) == 1:
+            self._update_edited_row(rows.start, columns, roles)
+        else:
+            self._update_changed_rows(rows, columns, roles)
+        if custom_key_changed:
+            self.sort_keys_changed.emit(rows)
+
+    def _custom_key_reads(self, columns):
+        """True if the cached custom sort key depends on ``columns``."""
+        if not self.custom_sort_key or not self.sort_key_cache:
+            return False
+        headers = self.sourceModel()._headers
+        changed = {headers[c] for c in columns}
+        return bool(changed & self._key_names(self.custom_sort_key))
+
+    def _update_changed_rows(self, rows, columns, roles):
+        if len(rows) > DATA_CHANGED_RANGE_ROWS:
+            # Bulk change: recompute filters column-wise on the next pass
+            self._search_rows = None
+            self._filter_mask = None
+            membership_changed = bool(self.custom_expr or self.search_text)
+        else:
+            self._update_filter_rows(rows)
+            membership_changed = any(
+                (self._source_to_proxy[row] >= 0) != self.filterAcceptsRow(row)
+                for row in rows
+            )
+
+        resort = self._update_ranked_keys(rows, columns)
+        if resort:
+            self._sorted_rows = None
+
+        if resort or membership_changed:
+            self._relayout()
+            return
+        self._forward_data_changed(rows, columns, roles)
+
+    def _update_edited_row(self, row, columns, roles):
+        """
+        Apply an edit to one row without re-filtering or re-sorting: the
+        filter and sort keys are re-evaluated for that row only, and the row
+        is moved, inserted or removed at the position found by binary
+        search over the current order.
+        """
+        rows = range(row, row + 1)
+        self._update_filter_rows(rows)
+        accepted = self.filterAcceptsRow(row)
+
+        sort_key = self._row_sort_key()
+        sorted_rows = self._sorted_rows
+        ranked_keys = [key for key, _ in self.sort_spec if key in self._ranked]
+        if sorted_rows is not None:
+            # Locate the row by its old key, before the ranks are updated
+            position = bisect_left(sorted_rows, sort_key(row), key=sort_key)
+        resort = self._update_ranked_keys(rows, columns)
+        if resort:
+            if (
+                sorted_rows is None
+                or any(key not in self._ranked for key in ranked_keys)
+                or sorted_rows[position] != row
+            ):
+                # A rank array had to be dropped; sort from scratch
+                self._sorted_rows = None
+                self._relayout()
+                return
+            del sorted_rows[position]
+            sorted_rows.insert(
+                bisect_left(sorted_rows, sort_key(row), key=sort_key), row
+            )
+
+        proxy_rows = self._proxy_to_source
+        old = self._source_to_proxy[row]
+        new = self._proxy_position(row, old, sort_key)
+        if old >= 0 and accepted:
+            if new != old:
+                destination = new + 1 if new > old else new
+                self.beginMoveRows(
+                    QModelIndex(), old, old, QModelIndex(), destination
+                )
+                del proxy_rows[old]
+                proxy_rows.insert(new, row)
+                self._renumber(min(old, new), max(old, new) + 1)
+                self.endMoveRows()
+            self._forward_data_changed(rows, columns, roles)
+        elif old >= 0:
+            self.beginRemoveRows(QModelIndex(), old, old)
+            del proxy_rows[old]
+            self._source_to_proxy[row] = -1
+            self._renumber(old, len(proxy_rows))
+            self.endRemoveRows()
+        elif accepted:
+            self.beginInsertRows(QModelIndex(), new, new)
+            proxy_rows.insert(new, row)
+            self._renumber(new, len(proxy_rows))
+            self.endInsertRows()
+
+    def _proxy_position(self, row, old, sort_key):
+        """
+        Binary-search the proxy position of ``row`` from its current sort
+        key, counted as if the row were not in the proxy. ``old`` is its
+        present position (-1 if filtered out), which is left out of the
+        search since that entry may be out of order.
+        """
+        proxy_rows = self._proxy_to_source
+        key = sort_key(row)
+        if old < 0:
+            return bisect_left(proxy_rows, key, key=sort_key)
+        if old > 0 and sort_key(proxy_rows[old - 1]) > key:
+            return bisect_left(proxy_rows, key, 0, old, key=sort_key)
+        following = old + 1
+        if (
+            following < len(proxy_rows)
+            and sort_key(proxy_rows[following]) < key
+        ):
+            end = len(proxy_rows)
+            return (
+                bisect_left(proxy_rows, key, following, end, key=sort_key) - 1
+            )
+        return old
+
+    def _renumber(self, start, stop):
+        """Refresh the source → proxy map for proxy rows start..stop-1."""
+        source_to_proxy = self._source_to_proxy
+        proxy_rows = self._proxy_to_source
+        for proxy_row in range(start, stop):
+            source_to_proxy[proxy_rows[proxy_row]] = proxy_row
+
+    def _update_filter_rows(self, rows):
+        """Refresh the cached filter results for a few changed rows."""
+        if self._search_rows is not None:
+            for row in rows:
+                if self._row_matches_search(row):
+                    self._search_rows.add(row)
+                else:
+                    self._search_rows.discard(row)
+
+        if self._filter_mask is not None:
+            if self._compiled_filter is None:
+                self._filter_mask = None
+            else:
+                for row, accepted in zip(
+                    rows, self._evaluate_filter_mask(rows)
+                ):
+                    self._filter_mask[row] = accepted
+
+    def _forward_data_changed(self, rows, columns, roles):
+        roles = roles or []
+        if len(rows) > DATA_CHANGED_RANGE_ROWS:
+            if self._proxy_to_source:
+                self.dataChanged.emit(
+                    self.index(0, columns.start),
+                    self.index(len(self._proxy_to_source) - 1, columns[-1]),
+                    roles,
+                )
+            return
+        for row in rows:
+            proxy_row = self._source_to_proxy[row]
+            if proxy_row >= 0:
+                self.dataChanged.emit(
+                    self.index(proxy_row, columns.start),
+                    self.index(proxy_row, columns[-1]),
+                    roles,
+                )
@@ -0,0 +1,178 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from logger import setup_logger
+
+logger = setup_logger("filter_scheduler")
+
+DEBOUNCE_MS = 250  # quiet time after the last keystroke before filtering
+CHUNK_ROWS = 50000  # rows scanned per event-loop turn
+POLL_MS = 20  # interval for checking on worker-pool scans
+INLINE_PLAN_SECONDS = 0.05  # planned filters expected to be this fast run
+
+
+class FilterScheduler(QObject):
+    """
+    Applies live filter input to the proxy without stalling typing.
+
+    Input is debounced, and the expression is parsed once before any row is
+    scanned: input that does not parse (typically half-typed) is not applied
+    at all. The filter mask is then computed a chunk of rows per event-loop
+    turn, or by the proxy's worker pool for large tables (see
+    parallel_filter); newer input cancels the scan in progress. The
+    finished mask is handed to the proxy in one step, so the table changes
+    layout once. Column indexes the filter could use but that are not built
+    yet are built afterwards, also a chunk of rows per turn.
+
+    Plain words and numbers are applied as a text search, like before.
+
+    Signals:
+        applied(str): Filter input that is now in effect.
+        invalid(str): Syntax error of input that was not applied.
+    """
+
+    applied = pyqtSignal(str)
+    invalid = pyqtSignal(str)
+
+    def __init__(
+        self, proxy, parent=None, delay=DEBOUNCE_MS, chunk_rows=CHUNK_ROWS
+    ):
+        super().__init__(parent)
+        self._proxy = proxy
+        self._chunk_rows = chunk_rows
+        self._text = ""
+        self._generation = 0  # bumped to cancel the scan in progress
+        # (model, data_version, case, compiled, mask, worker futures)
+        self._scan = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._start)
+
+    @property
+    def running(self):
+        return self._timer.isActive() or self._scan is not None
+
+    def schedule(self, text):
+        """Apply ``text`` once input has been quiet for the debounce delay."""
+        self._text = text
+        self.cancel()
+        self._timer.start()
+
+    def apply(self, text):
+        """Apply ``text`` without waiting for the debounce delay."""
+        self.schedule(text)
+        self.flush()
+
+    def flush(self):
+        """Start applying pending input now instead of after the delay."""
+        if self._timer.isActive():
+            self._timer.stop()
+            self._start()
+
+    def cancel(self):
+        """Drop pending input and stop the scan in progress."""
+        self._timer.stop()
+        self._drop_scan()
+
+    def _drop_scan(self):
+        self._generation += 1
+        if self._scan is not None and self._scan[-1] is not None:
+            for future in self._scan[-1]:
+                future.cancel()
+        self._scan = None
+
+    def _start(self):
+        self._drop_scan()
+        proxy = self._proxy
+        text = self._text
+        if text and (text.isdigit() or text.isalpha()):
+            search_text, expr = text, ""
+        else:
+            search_text, expr = "", text.strip()
+
+        if proxy.search_text == search_text and proxy.custom_expr == expr:
+            self.applied.emit(text)  # already in effect
+            return
+        if not expr or proxy.sourceModel() is None:
+            # Search text is answered from the search index, no scan
+            proxy.set_filter_state(search_text, expr)
+            self.applied.emit(text)
+            return
+
+        try:
+            compiled = proxy.compile_filter(expr)
+        except SyntaxError as e:
+            logger.debug(f"Filter not applied, syntax error: {e}")
+            self.invalid.emit(str(e))
+            return
+
+        mask = proxy.cached_filter_mask(compiled)
+        if mask is None:
+            # Indexed or cheap once reordered: run the plan inline. Only
+            # indexes already built are used; missing ones are queued and
+            # built in chunks once the filter is applied.
+            mask = proxy.planned_filter_mask(
+                compiled, INLINE_PLAN_SECONDS, build=False
+            )
+        if mask is not None:
+            proxy.set_filter_state(search_text, expr, compiled, mask)
+            self.applied.emit(text)
+            proxy.build_queued_indexes()
+            return
+
+        model = proxy.sourceModel()
+        futures = None
+        if proxy.parallel_filter_applies(compiled):
+            # Large table: partitions run in the worker pool meanwhile
+            futures = proxy.parallel_filter.submit(
+                compiled, model, lower=not proxy.case_sensitive
+            )
+        self._scan = (
+            model,
+            model.data_version,
+            proxy.case_sensitive,
+            compiled,
+            [],
+            futures,
+        )
+        self._scan_chunk(self._generation)
+
+    def _scan_chunk(self, generation):
+        if generation != self._generation or self._scan is None:
+            return  # cancelled by newer input
+        proxy = self._proxy
+        model, version, case_sensitive, compiled, mask, futures = self._scan
+        if (
+            model is not proxy.sourceModel()
+            or version != model.data_version
+            or case_sensitive != proxy.case_sensitive
+        ):
+            # The data or settings changed under the scan; start over
+            self._start()
+            return
+
+        if futures is not None:
+            if not all(future.done() for future in futures):
+                QTimer.singleShot(
+                    POLL_MS, lambda: self._scan_chunk(generation)
+                )
+                return
+            result = proxy.parallel_filter.collect(futures)
+            if result is None:
+                # Pool failed; scan in-process instead
+                self._scan = self._scan[:-1] + (None,)
+                self._scan_chunk(generation)
+                return
+            mask.extend(result)
+        else:
+            start = len(mask)
+            end = min(start + self._chunk_rows, model.rowCount())
+            mask.extend(proxy.filter_mask_rows(compiled, range(start, end)))
+            if end < model.rowCount():
+                QTimer.singleShot(0, lambda: self._scan_chunk(generation))
+                return
+
+        self._scan = None
+        expr = self._text.strip()
+        proxy.set_filter_state("", expr, compiled, mask)
+        self.applied.emit(self._text)
+        proxy.build_queued_indexes()
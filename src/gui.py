@@ -1,4 +1,5 @@
 # gui.py
+import os
 import sys
 from config import load_config, save_config, get_profiles, DEFAULT_CONFIG
 from PyQt5.QtWidgets import (
@@ -19,12 +20,20 @@ from PyQt5.QtWidgets import (
     QMessageBox,
 )
 from PyQt5.QtCore import Qt, QDateTime, QTimer
-from PyQt5.QtGui import QPalette, QColor, QKeySequence
+from PyQt5.QtGui import QPalette, QColor, QFontDatabase, QKeySequence
 from logger import setup_logger
+from filter_engine import EVAL_ERROR
 from filter_proxy import TableFilterProxyModel
+from filter_scheduler import FilterScheduler
+from parallel_filter import PARALLEL_MIN_ROWS
 from table_model import DataTableModel
-from utils import get_save_time_label_text
+from undo_redo import UNDO_MAX_CELLS, UNDO_MAX_STEPS
+from utils import filter_literal, get_save_time_label_text, parse_cell_text
 from rich_text_delegate import RichTextDelegate
+from schema import SCAN_STEP_ROWS
+from stream_loader import StreamingLoader
+from virtual_store import VIRTUAL_MIN_BYTES
+from background_io import BackgroundWriter
 from view_config import (
     save_view_config,
     get_all_view_names,
@@ -50,6 +59,9 @@ class MainWindow(QMainWindow):
     view_selector = None
     field_selector = None
     model = None
+    table_delegate = None
+    loader = None
+    schema_scan = None  # (model, data_version, SchemaInference)
 
     def __init__(self, data_manager, version):
         """
@@ -64,9 +76,23 @@ class MainWindow(QMainWindow):
         """
         super().__init__()
         self.table_view = QTableView()
+        # Shift+click on a header adds it as a further sort key
+        self._sort_spec_before_click = None
+        header = self.table_view.horizontalHeader()
+        header.sectionPressed.connect(self.on_header_pressed)
+        header.sectionClicked.connect(self.on_header_clicked)
+        self.proxy_model.sort_keys_changed.connect(self.refresh_sort_results)
+        # Live filter input is applied off the keystroke path
+        self.filter_scheduler = FilterScheduler(self.proxy_model, self)
         self.data_manager = data_manager
         self.setWindowTitle("Data Manager App")
 
+        # Saves and backups are written on a worker thread
+        self.background_writer = BackgroundWriter(self)
+        self.background_writer.finished.connect(
+            self.on_background_write_finished
+        )
+
         # Auto-Save Logic
         self.auto_save_timer = QTimer()
         self.auto_save_timer.timeout.connect(self.check_dirty_and_save)
@@ -101,6 +127,7 @@ class MainWindow(QMainWindow):
 
         # Load user's settings
         self.config = load_config(self.current_profile)
+        self.configure_filter_workers()
         self.layout = QVBoxLayout()
 
         # Theme Selector
@@ -163,6 +190,14 @@ class MainWindow(QMainWindow):
         self.custom_expr_input.textChanged.connect(
             self.update_custom_filter_expr
         )
+        self.filter_scheduler.invalid.connect(
+            lambda error: self.custom_expr_input.setToolTip(
+                f"Not applied: {error}"
+            )
+        )
+        self.filter_scheduler.applied.connect(
+            lambda _: self.custom_expr_input.setToolTip("")
+        )
 
         self.clear_filter_button = QPushButton("Clear")
         self.clear_filter_button.setFixedWidth(50)
@@ -174,6 +209,13 @@ class MainWindow(QMainWindow):
             self.show_filter_expr_help
         )
 
+        self.explain_filter_button = QPushButton("Plan")
+        self.explain_filter_button.setFixedWidth(50)
+        self.explain_filter_button.setToolTip(
+            "Show how the filter is run and how long each part takes"
+        )
+        self.explain_filter_button.clicked.connect(self.show_filter_plan)
+
         # Custom sort
         self.custom_sort_input = QComboBox()
         self.custom_sort_input.setEditable(True)
@@ -214,10 +256,20 @@ class MainWindow(QMainWindow):
         self.undo_button.clicked.connect(self.model.undo)
         self.redo_button.clicked.connect(self.model.redo)
 
+        # Bulk edits, each one undo step
+        self.fill_column_button = QPushButton("Fill Column...")
+        self.fill_column_button.clicked.connect(
+            self.fill_column_with_expression
+        )
+        paste_shortcut = QShortcut(QKeySequence.Paste, self.table_view)
+        paste_shortcut.setContext(Qt.WidgetShortcut)
+        paste_shortcut.activated.connect(self.paste_cells)
+
         # Add to layout:
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.undo_button)
         button_layout.addWidget(self.redo_button)
+        button_layout.addWidget(self.fill_column_button)
 
         # Add shortcuts:
         undo_shortcut = QShortcut(QKeySequence("Ctrl+Z"), self)
@@ -261,6 +313,7 @@ class MainWindow(QMainWindow):
         search_layout.addWidget(self.custom_expr_label)
         search_layout.addWidget(self.custom_expr_input)
         search_layout.addWidget(self.case_checkbox)
+        search_layout.addWidget(self.explain_filter_button)
         search_layout.addWidget(self.custom_expr_help_button)
         self.layout.addLayout(search_layout)
         structured_layout = QHBoxLayout()
@@ -297,36 +350,82 @@ class MainWindow(QMainWindow):
         # Apply theme after loading profile
         self.apply_theme()
 
-    def check_dirty_and_save(self):
-        if self.model and self.model.is_dirty():
-            try:
-                data = self.model.get_current_data_as_dicts()
-                self.data_manager.save_data(data)
-                self.last_save_time = QDateTime.currentDateTime()
-                self.model.mark_clean()
+    def is_loading(self):
+        """True while the data file is still streaming into the model."""
+        return bool(self.loader and self.loader.running)
 
-                self.unsaved_action_stack.clear()
-                if self.undo_log_path.exists():
-                    self.undo_log_path.unlink()
+    def check_dirty_and_save(self, blocking=False):
+        """
+        Save the table if it changed. A snapshot is taken here, on the GUI
+        thread; serializing and writing it happens in the background unless
+        ``blocking`` is set (used on close).
+        """
+        # Never overwrite the file with a partially loaded table
+        if self.is_loading():
+            return
+        if self.model and self.model.is_dirty():
+            if self.data_manager.needs_compaction():
+                snapshot, version, saved_actions = self.model.snapshot()
+                write, payload = self.write_snapshot, snapshot
+            else:
+                # Only the changed cells are appended to the journal
+                entries, version, saved_actions = self.model.journal_snapshot()
+                write, payload = self.data_manager.append_journal, entries
+            self.background_writer.submit(
+                "save",
+                write,
+                (payload,),
+                (self.model, version, saved_actions),
+                blocking=blocking,
+            )
 
-                print("Auto-save complete.")
-            except Exception as e:
-                print("Auto-save failed:", e)
+    def write_snapshot(self, snapshot):
+        """Worker-thread half of an autosave."""
+        self.data_manager.save_store(snapshot)
+
+    def write_backup_snapshot(self, snapshot):
+        """Worker-thread half of an auto-backup."""
+        self.data_manager.save_backup(snapshot.iter_records())
+
+    def on_background_write_finished(self, name, context, error):
+        if name == "save":
+            if error:
+                print("Auto-save failed:", error)
+                return
+            model, version, saved_actions = context
+            self.last_save_time = QDateTime.currentDateTime()
+            self.update_save_label()
+            if model is self.model:
+                model.mark_saved(version, saved_actions)
+                if model.schema is not None:
+                    self.data_manager.save_schema(model.schema)
+            print("Auto-save complete.")
+        elif name == "backup":
+            if error:
+                print("Auto-backup failed:", error)
+                return
+            model, version = context
+            if model is self.model:
+                model.mark_backup_saved(version)
 
     def update_save_label(self):
         self.save_label.setText(get_save_time_label_text(self.last_save_time))
 
-    def auto_backup_if_needed(self):
+    def auto_backup_if_needed(self, blocking=False):
         """
         Auto-Backup every hour and on close
         """
+        if self.is_loading():
+            return
         if self.model and self.model.is_backup_dirty():
-            try:
-                data = self.model.get_current_data_as_dicts()
-                self.data_manager.save_backup(data)
-                self.model.mark_backup_clean()
-            except Exception as e:
-                print("Auto-backup failed:", e)
+            snapshot, version, _ = self.model.snapshot()
+            self.background_writer.submit(
+                "backup",
+                self.write_backup_snapshot,
+                (snapshot,),
+                (self.model, version),
+                blocking=blocking,
+            )
 
     def load_data(self):
         """
@@ -335,11 +434,40 @@ class MainWindow(QMainWindow):
         Returns:
             dict: The data loaded from  profile data file.
         """
-        # Load real data from DataManager
-        raw_data = self.data_manager.load_data()
+        if self.loader:
+            self.loader.cancel()
+
+        if self.data_manager.columnar:
+            # Columnar files are memory-mapped: no parsing, nothing to stream
+            chunks = iter(())
+            try:
+                raw_data = self.data_manager.load_columns() or []
+            except (ValueError, OSError) as e:
+                print("Unexpected data format:", e)
+                raw_data = []
+        elif self.opens_virtually():
+            # Too large to hold in memory: rows are read as they are shown
+            chunks = iter(())
+            try:
+                raw_data = self.data_manager.open_virtual() or []
+            except (ValueError, OSError) as e:
+                print("Unexpected data format:", e)
+                raw_data = []
+        else:
+            # Stream real data from DataManager: the first small chunk
+            # builds the model, the rest is appended from the event loop.
+            chunks = self.data_manager.iter_data_chunks()
+            try:
+                raw_data, _ = next(chunks, ([], 100))
+            except (ValueError, OSError) as e:
+                print("Unexpected data format:", e)
+                raw_data = []
 
         # Dynamically get headers from first item (or fallback)
-        headers = list(raw_data[0].keys()) if raw_data else []
+        if isinstance(raw_data, list):
+            headers = list(raw_data[0].keys()) if raw_data else []
+        else:
+            headers = list(raw_data.headers)
         self.field_selector.clear()
         self.field_selector.addItems(headers)
         self.update_filter_operators()  # Run after headers added
@@ -352,25 +480,68 @@ class MainWindow(QMainWindow):
             proxy_model=self.proxy_model,
             dark_mode=self.config.get("dark_mode", False),
         )
+        self.configure_undo_history()
+        self.field_selector.addItems(self.model.nested_headers())
         self.proxy_model.setSourceModel(self.model)
         self.table_view.setModel(self.proxy_model)
         self.table_view.setSortingEnabled(True)
         # Render HTML in cells — including the fancy
         # substring <span style=...> highlights from search.
-        self.table_view.setItemDelegate(RichTextDelegate())
+        if self.table_delegate is None:
+            self.table_delegate = RichTextDelegate(self.table_view)
+        self.table_delegate.set_dark_mode(self.config.get("dark_mode", False))
+        self.model.modelReset.connect(self.table_delegate.clear_cache)
+        self.table_view.setItemDelegate(self.table_delegate)
         # Start compact: auto-size to content initially
         self.table_view.horizontalHeader().setStretchLastSection(False)
         self.table_view.horizontalHeader().setSectionResizeMode(
             QHeaderView.Interactive
         )
-        # Give Qt a moment to measure based on the new delegate rendering
-        QTimer.singleShot(0, self.table_view.resizeColumnsToContents)
         self.table_view.setWordWrap(False)
         self.table_view.setTextElideMode(Qt.ElideRight)
         self.layout.addWidget(self.table_view)
 
         self.refresh_view_selector()  # make sure the dropdown is populated
 
+        self.loader = StreamingLoader(self.model, chunks, self)
+        self.loader.progress.connect(self.update_load_progress)
+        self.loader.finished.connect(self.on_data_loaded)
+        self.loader.failed.connect(self.on_data_load_failed)
+        self.loader.start()
+
+    def opens_virtually(self):
+        """
+        Whether the JSON data file is big enough to be opened as a virtual
+        table: profile setting "virtual_rows_min_bytes" (0 disables).
+        """
+        threshold = self.config.get(
+            "virtual_rows_min_bytes", VIRTUAL_MIN_BYTES
+        )
+        try:
+            size = os.path.getsize(self.data_manager.file_path)
+        except OSError:
+            return False
+        return bool(threshold) and size >= threshold
+
+    def update_load_progress(self, rows, percent):
+        self.save_label.setText(f"Loading data: {rows} rows ({percent}%)")
+
+    def on_data_load_failed(self, message):
+        print("Loading data failed:", message)
+        self.on_data_loaded(self.model.rowCount())
+
+    def on_data_loaded(self, row_count):
+        """
+        Runs once the whole file has streamed in: size the columns and apply
+        the default view against the complete data set.
+        """
+        self.update_save_label()
+        logger.info(f"Loaded {row_count} rows")
+        self.load_schema()
+
+        # Give Qt a moment to measure based on the new delegate rendering
+        QTimer.singleShot(0, self.table_view.resizeColumnsToContents)
+
         default_view = get_default_view_name()
         if default_view:
             self.load_selected_view(default_view)
@@ -383,6 +554,73 @@ class MainWindow(QMainWindow):
             if index != -1:
                 self.view_selector.setCurrentIndex(index)
 
+    def load_schema(self):
+        """
+        Give the model its column schema: the one saved with the data file
+        if it is still current, else a fresh scan (which is then saved).
+        The scan reads a block of rows per event-loop turn, so the window
+        stays responsive while a large file is inferred.
+        """
+        schema = self.data_manager.load_schema()
+        if schema is not None and list(schema.columns) == self.model._headers:
+            self.model.schema = schema
+            self.update_filter_operators()
+            return
+        self.start_schema_scan()
+
+    def start_schema_scan(self):
+        model = self.model
+        self.schema_scan = (
+            model,
+            model.data_version,
+            model.schema_inference(SCAN_STEP_ROWS),
+        )
+        QTimer.singleShot(0, self.schema_scan_step)
+
+    def schema_scan_step(self):
+        """
+        Scan the next block of rows. A scan of a model that has since been
+        replaced is dropped; one that saw edits meanwhile starts over.
+        """
+        if self.schema_scan is None:
+            return
+        model, version, inference = self.schema_scan
+        if model is not self.model:
+            self.schema_scan = None
+            return
+        if not inference.step():
+            QTimer.singleShot(0, self.schema_scan_step)
+            return
+        if model.data_version != version:
+            self.start_schema_scan()
+            return
+        self.schema_scan = None
+        model.schema = inference.schema
+        self.data_manager.save_schema(inference.schema)
+        self.update_filter_operators()
+
+    def configure_filter_workers(self):
+        """
+        Size the proxy's filter worker pool from the profile: "filter_workers"
+        (0, the default, means one per CPU core; 1 disables the pool) and
+        "parallel_filter_min_rows".
+        """
+        workers = self.config.get("filter_workers", 0) or os.cpu_count() or 1
+        self.proxy_model.set_filter_workers(
+            workers,
+            self.config.get("parallel_filter_min_rows", PARALLEL_MIN_ROWS),
+        )
+
+    def configure_undo_history(self):
+        """
+        Cap the model's undo history from the profile: "undo_max_steps" and
+        "undo_max_cells" (cell changes held, e.g. by large pastes).
+        """
+        self.model.history.set_limits(
+            self.config.get("undo_max_steps", UNDO_MAX_STEPS),
+            self.config.get("undo_max_cells", UNDO_MAX_CELLS),
+        )
+
     def switch_profile(self):
         """
         Handles switching user profiles.
@@ -391,26 +629,27 @@ class MainWindow(QMainWindow):
             return
         self.current_profile = self.profile_selector.currentText()
         self.config = load_config(self.current_profile)
+        self.configure_filter_workers()
+        if self.model:
+            self.configure_undo_history()
         if self.theme_selector:
             self.theme_selector.setCurrentText(
                 "Dark" if self.config.get("dark_mode", False) else "Light"
             )
         self.apply_theme()
-        if self.model:
-            try:
-                data = self.model.get_current_data_as_dicts()
-                self.data_manager.save_data(data)
-                if self.model.undo_stack:
-                    self.model.undo_stack.clear()
-                if self.model.redo_stack:
-                    self.model.redo_stack.clear()
-                if self.model.unsaved_action_stack:
-                    self.model.unsaved_action_stack.clear()
-                if self.model.undo_log_path.exists():
-                    self.model.undo_log_path.unlink()
-                print("Auto-save complete before profile switch.")
-            except Exception as e:
-                print("Auto-save before profile switch failed:", e)
+        if self.model and not self.is_loading():
+            # Full save in the background; the unsaved stack and recovery
+            # log are cleared when it lands (see on_background_write_finished)
+            if self.background_writer.is_busy("save"):
+                self.background_writer.wait()
+            snapshot, version, saved_actions = self.model.snapshot()
+            self.background_writer.submit(
+                "save",
+                self.write_snapshot,
+                (snapshot,),
+                (self.model, version, saved_actions),
+            )
+            self.model.history.clear()
         # Clear history dropdowns
         self.undo_history_combo.clear()
         self.redo_history_combo.clear()
@@ -425,6 +664,7 @@ class MainWindow(QMainWindow):
         save_config(self.config, self.current_profile)
         self.apply_theme()
         if self.model:
+            self.table_delegate.set_dark_mode(self.config["dark_mode"])
             self.model.set_dark_mode(self.config["dark_mode"])
         print(
             f"Theme updated for {self.current_profile}"
@@ -478,6 +718,72 @@ class MainWindow(QMainWindow):
         self.profile_selector.clear()
         self.profile_selector.addItems(get_profiles())
 
+    def fill_column_with_expression(self):
+        """
+        Ask for a column and an expression, and set the column in every
+        row shown to the expression's value for that row, as one undo step.
+        Rows where the expression fails keep their value.
+        """
+        headers = [h for h in self.model._headers if h != "sort result"]
+        header, ok = QInputDialog.getItem(
+            self, "Fill Column", "Column:", headers, 0, False
+        )
+        if not ok:
+            return
+        expr, ok = QInputDialog.getText(
+            self,
+            "Fill Column",
+            f"Expression for the new {header} value (e.g. age + 1):",
+        )
+        if not ok or not expr.strip():
+            return
+
+        rows = self.proxy_model.source_rows()
+        try:
+            values = self.proxy_model.evaluate_expression(expr, rows)
+        except SyntaxError as e:
+            QMessageBox.warning(
+                self, "Fill Column", f"Invalid expression: {e}"
+            )
+            return
+        col = self.model._headers.index(header)
+        changed = self.model.apply_edits(
+            (
+                (row, col, value)
+                for row, value in zip(rows, values)
+                if value is not EVAL_ERROR
+            ),
+            label=f"Filled {header}",
+        )
+        logger.info(f"Filled {changed} cells of {header} with {expr}")
+
+    def paste_cells(self):
+        """
+        Paste tab-separated clipboard text (e.g. copied from a spreadsheet)
+        into the table from the current cell on, as one undo step. Values
+        are converted to the type of the cells they replace.
+        """
+        start = self.table_view.currentIndex()
+        text = QApplication.clipboard().text()
+        if not start.isValid() or not text:
+            return
+        proxy = self.proxy_model
+        edits = []
+        for r, line in enumerate(text.rstrip("\r\n").split("\n")):
+            proxy_row = start.row() + r
+            if proxy_row >= proxy.rowCount():
+                break
+            for c, cell in enumerate(line.rstrip("\r").split("\t")):
+                col = start.column() + c
+                if col >= proxy.columnCount():
+                    break
+                source = proxy.mapToSource(proxy.index(proxy_row, col))
+                current = source.data(DataTableModel.RAW_VALUE_ROLE)
+                edits.append(
+                    (source.row(), col, parse_cell_text(cell, current))
+                )
+        self.model.apply_edits(edits, label="Pasted")
+
     def update_undo_redo_history(self):
         self.undo_history_combo.clear()
         self.redo_history_combo.clear()
@@ -487,8 +793,12 @@ class MainWindow(QMainWindow):
             self.redo_history_combo.addItem(action.description())
 
     def closeEvent(self, event):
-        self.auto_backup_if_needed()
-        self.check_dirty_and_save()
+        # Let in-flight writes land, then flush what is left synchronously
+        self.background_writer.wait()
+        self.auto_backup_if_needed(blocking=True)
+        self.check_dirty_and_save(blocking=True)
+        if self.model:
+            self.model.recovery_log.close()
         event.accept()
 
     def save_current_view(self):
@@ -532,6 +842,7 @@ class MainWindow(QMainWindow):
                 },
                 "custom_filter": self.custom_expr_input.text(),
                 "custom_sort_key": self.custom_sort_input.currentText(),
+                "sort_spec": self.proxy_model.sort_spec_config(),
             }
 
             save_view_config(name, config)
@@ -563,6 +874,7 @@ class MainWindow(QMainWindow):
         )
         self.value_input.setText(filter_config.get("value", ""))
         self.custom_expr_input.setText(config.get("custom_filter", ""))
+        self.filter_scheduler.apply(self.custom_expr_input.text())
 
         sort_expr = config.get("custom_sort_key", "").strip()
         self.custom_sort_input.setCurrentText(sort_expr)
@@ -573,7 +885,7 @@ class MainWindow(QMainWindow):
 
             # ✅ Visually apply saved sort direction (fallback)
             if "ascending" in config:
-                sort_column = self.model.columnCount() - 1
+                sort_column = self.model.sort_result_column()
                 sort_order = (
                     Qt.AscendingOrder
                     if config["ascending"]
@@ -592,6 +904,13 @@ class MainWindow(QMainWindow):
         if not sort_expr:
             self.clear_custom_sort()
 
+        # ✅ Multi-column sort, applied last so it wins over the above
+        sort_spec = config.get("sort_spec")
+        if sort_spec:
+            self.apply_sort_spec(sort_spec)
+
+        logger.debug(f"Result cache: {self.proxy_model.result_cache.stats()}")
+
         # ✅ Mark selection in dropdown
         index = self.view_selector.findText(name)
         if index != -1:
@@ -615,16 +934,8 @@ class MainWindow(QMainWindow):
         self.proxy_model.set_structured_filter(field, op, value)
 
     def update_custom_filter_expr(self):
-        expr = self.custom_expr_input.text()
-        self.proxy_model.set_custom_filter_expression(expr)
-
-        # Set search text ONLY if expression is a simple word
-        if expr and (expr.isdigit() or expr.isalpha()):
-            self.proxy_model.set_search_text(expr)
-            self.proxy_model.set_custom_filter_expression("")
-        else:
-            self.proxy_model.set_search_text("")
-            self.proxy_model.set_custom_filter_expression(expr)
+        # Debounced; a simple word is applied as a search text instead
+        self.filter_scheduler.schedule(self.custom_expr_input.text())
 
     def apply_custom_sort(self):
         expr = self.custom_sort_input.currentText().strip()
@@ -633,8 +944,8 @@ class MainWindow(QMainWindow):
         if not expr or expr.startswith("Enter Custom Sort"):
             return
 
-        # This sets sort column and triggers ascending sort
-        # Which activates proxy's lessThan()
+        # This sets sort column and triggers ascending sort,
+        # which orders rows by the proxy's sort_key_cache
         if self.custom_sort_input.findText(expr) == -1:
             self.custom_sort_input.insertItem(0, expr)
 
@@ -643,22 +954,78 @@ class MainWindow(QMainWindow):
 
         # 🛠 Inject sort result values directly into DataTableModel
         if self.model and self.proxy_model.sort_key_cache:
-            for (
-                proxy_row,
-                sort_value,
-            ) in self.proxy_model.sort_key_cache.items():
-                if 0 <= proxy_row < len(self.model._data):
-                    self.model._data[proxy_row][-1] = str(sort_value)
+            sort_cache = self.proxy_model.sort_key_cache
+            self.model.set_column_values(
+                self.model.sort_result_column(),
+                [str(value) for value in sort_cache],
+            )
 
         sort_order = (
             Qt.AscendingOrder
             if self.sort_order_selector.currentText() == "Ascending"
             else Qt.DescendingOrder
         )
-        sort_column = self.model.columnCount() - 1
+        sort_column = self.model.sort_result_column()
 
         self.table_view.sortByColumn(sort_column, sort_order)
 
+    def refresh_sort_results(self, rows):
+        """
+        Keep the Sort Result column in step with sort keys the proxy
+        re-evaluated after an edit.
+        """
+        if (
+            self.model is None
+            or self.proxy_model.sourceModel() is not self.model
+        ):
+            return
+        sort_cache = self.proxy_model.sort_key_cache
+        self.model.set_cells(
+            self.model.sort_result_column(),
+            rows,
+            [str(sort_cache[row]) for row in rows],
+        )
+
+    def apply_sort_spec(self, spec):
+        """
+        Sort by several keys and point the header's sort indicator at the
+        first one (without re-sorting by that column alone).
+        """
+        self.proxy_model.set_sort_spec(spec)
+        if not self.proxy_model.sort_spec or not self.model:
+            return
+        key, ascending = self.proxy_model.sort_spec[0]
+        header = self.table_view.horizontalHeader()
+        if key in self.model._headers:
+            header.blockSignals(True)
+            header.setSortIndicator(
+                self.model._headers.index(key),
+                Qt.AscendingOrder if ascending else Qt.DescendingOrder,
+            )
+            header.blockSignals(False)
+
+    def on_header_pressed(self, section):
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            self._sort_spec_before_click = list(self.proxy_model.sort_spec)
+
+    def on_header_clicked(self, section):
+        """
+        Shift+click adds the column as a further sort key, or flips its
+        direction if it is one already; the earlier keys are kept.
+        """
+        spec = self._sort_spec_before_click
+        self._sort_spec_before_click = None
+        if not spec or not self.model:
+            return
+        key = self.model.headerData(section, Qt.Horizontal, Qt.DisplayRole)
+        keys = [entry[0] for entry in spec]
+        if key in keys:
+            position = keys.index(key)
+            spec[position] = (key, not spec[position][1])
+        else:
+            spec.append((key, True))
+        self.apply_sort_spec(spec)
+
     def set_default_view(self):
         name = self.view_selector.currentText().replace(" (default)", "")
         if name:
@@ -673,30 +1040,22 @@ class MainWindow(QMainWindow):
         if not self.model:
             return
 
-        field = self.field_selector.currentText()
-
-        sample_value = None
-        headers = self.model._headers
-        if field in headers:
-            col_index = headers.index(field)
-            for row in range(self.model.rowCount()):
-                index = self.model.index(row, col_index)
-                value = self.model.data(index, self.proxy_model.RAW_VALUE_ROLE)
-                if value is not None:
-                    sample_value = value
-                    break
+        column = self.model.column_schema(self.field_selector.currentText())
+        kind = column.type if column is not None else "null"
 
         self.operator_selector.clear()
 
-        if isinstance(sample_value, (int, float)):
+        if kind in ("int", "float"):
             self.operator_selector.addItems(["==", "!=", "<", "<=", ">", ">="])
-        elif isinstance(sample_value, bool):
+        elif kind == "bool":
             self.operator_selector.addItems(["==", "!="])
-        elif isinstance(sample_value, str) or sample_value is None:
+        elif kind in ("str", "null"):
             # Default to string if unknown
             self.operator_selector.addItems(
                 ["contains", "startswith", "endswith", "matches", "not"]
             )
+        elif kind == "list":
+            self.operator_selector.addItems(["contains", "not"])
         else:
             self.operator_selector.addItems(["==", "!="])  # fallback
 
@@ -719,6 +1078,28 @@ class MainWindow(QMainWindow):
         msg.setIcon(QMessageBox.NoIcon)  # <- No chime!
         msg.exec_()
 
+    def show_filter_plan(self):
+        """
+        Explain the filter expression: which parts column indexes answer,
+        the order the others are scanned in, and what each part cost.
+        """
+        expr = self.custom_expr_input.text().strip()
+        if not expr or not self.model:
+            return
+        if expr.isdigit() or expr.isalpha():
+            text = f"'{expr}' is a text search, answered by the search index."
+        else:
+            try:
+                text = self.proxy_model.explain_filter(expr)
+            except SyntaxError as e:
+                text = f"The filter does not parse:\n{e}"
+        msg = QMessageBox(self)
+        msg.setWindowTitle("Filter Plan")
+        msg.setText(text)
+        msg.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        msg.setIcon(QMessageBox.NoIcon)
+        msg.exec_()
+
     def show_sort_expr_help(self):
         msg = QMessageBox(self)
         msg.setWindowTitle("Custom Sort Key Help")
@@ -734,7 +1115,8 @@ class MainWindow(QMainWindow):
             "- len(), str.lower(), str.split(), basic math (+ - * /)\n"
             "- Boolean logic: and, or, not\n"
             "- Access list/dict fields like tags or preferences"
-            "['notifications']"
+            "['notifications']\n\n"
+            "Shift+click column headers to sort by several columns."
         )
         msg.setIcon(QMessageBox.NoIcon)  # <- No chime!
         msg.exec_()
@@ -747,26 +1129,19 @@ class MainWindow(QMainWindow):
         if not field or not op:
             return
 
-        # Auto-quote strings if needed
-        if (
-            op in ["contains", "startswith", "endswith", "matches", "not"]
-            or not value.isnumeric()
-        ):
-            value = f"'{value}'"
-
-        clean_value = value.strip("'")
+        literal = filter_literal(value, self.model.column_schema(field))
         if op == "contains":
-            expr = f"{clean_value} in {field}"
+            expr = f"{literal} in {field}"
         elif op == "not":
-            expr = f"{clean_value} not in {field}"
+            expr = f"{literal} not in {field}"
         elif op == "matches":
-            expr = f"{clean_value} in {field}"  # simple version
+            expr = f"{literal} in {field}"  # simple version
         elif op == "startswith":
-            expr = f"{field}.startswith({value})"
+            expr = f"{field}.startswith({literal})"
         elif op == "endswith":
-            expr = f"{field}.endswith({value})"
+            expr = f"{field}.endswith({literal})"
         else:
-            expr = f"{field} {op} {value}"
+            expr = f"{field} {op} {literal}"
 
         # ➡️ Append to existing custom expression if present
         current_expr = self.custom_expr_input.text().strip()
@@ -802,11 +1177,10 @@ class MainWindow(QMainWindow):
 
         # ✅ Clear values from the Sort Result column
         if self.model:
-            sort_column = self.model.columnCount() - 1
-            for row_index in range(len(self.model._data)):
-                self.model._data[row_index][sort_column] = ""
-                index = self.model.index(row_index, sort_column)
-                self.model.dataChanged.emit(index, index)
+            sort_column = self.model.sort_result_column()
+            self.model.set_column_values(
+                sort_column, [""] * self.model.rowCount()
+            )
 
         self.sort_order_selector.setCurrentText("Ascending")
 
@@ -1,4 +1,5 @@
 # main.py
+import multiprocessing
 import sys
 from PyQt5.QtWidgets import QApplication, QMessageBox
 from gui import MainWindow
@@ -35,12 +36,14 @@ def log_uncaught_exceptions(exctype, value, traceback):
 sys.excepthook = log_uncaught_exceptions
 
 if __name__ == "__main__":
+    # Filter worker processes re-run this module in frozen builds
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
 
     # Force the style to be the same on all OSs:
     app.setStyle("Fusion")
 
-    data_manager = DataManager()
+    data_manager = DataManager(journaled=True)
     main_window = MainWindow(data_manager, __version__)
     main_window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,239 @@
+"""
+Multi-process evaluation of custom filter expressions.
+
+The row range is split into partitions that a pool of worker processes
+evaluates side by side. Workers do not receive rows through pickling: each
+column the expression reads is copied once into a shared-memory segment,
+laid out like a column of a ``.idwc`` file (see columnar_format), and
+workers map it directly. Segments are kept while the column's version is
+unchanged, so re-filtering an unchanged table only ships the expression.
+"""
+
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import get_context, shared_memory
+from columnar_format import ALIGN, TYPECODES, encode_column, map_column
+from filter_engine import compile_expression
+from logger import setup_logger
+
+logger = setup_logger("parallel_filter")
+
+PARALLEL_MIN_ROWS = 500000  # smaller tables are filtered in-process
+PARTITIONS_PER_WORKER = 2  # more partitions than workers, for balance
+
+
+class ParallelFilter:
+    """
+    Process pool evaluating filter masks over row partitions.
+
+    Attributes:
+        workers (int): Number of worker processes.
+        min_rows (int): Smaller tables are filtered in-process.
+    """
+
+    def __init__(self, workers=None, min_rows=PARALLEL_MIN_ROWS):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self._pool = None
+        self._model = None
+        self._segments = {}  # column name → (version, SharedMemory, entry)
+        atexit.register(self.close)
+
+    def applies(self, compiled, count):
+        """
+        Whether filtering ``count`` rows with ``compiled`` is worth the
+        pool. Only expressions that need the per-row asteval fallback are:
+        workers decode their partition from shared memory first, which costs
+        about as much as running a fully vectorized expression in-process.
+        """
+        return (
+            self.workers > 1
+            and count >= self.min_rows
+            and not compiled.vectorized
+        )
+
+    def submit(self, compiled, model, lower=False):
+        """
+        Start evaluating ``compiled`` over every row of ``model``.
+
+        Parameters:
+            lower (bool): Lower-case string values first (case-insensitive
+                filtering, as the proxy does in-process).
+
+        Returns:
+            list: Futures of the partition masks, in row order, or None if
+            the pool or shared memory is unavailable.
+        """
+        count = model.rowCount()
+        try:
+            columns = self._share(model, compiled.names)
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=get_context("spawn")
+                )
+            size = -(-count // (self.workers * PARTITIONS_PER_WORKER))
+            return [
+                self._pool.submit(
+                    _evaluate_partition,
+                    compiled.text,
+                    compiled.symbols,
+                    columns,
+                    lower,
+                    start,
+                    min(start + size, count),
+                )
+                for start in range(0, count, max(size, 1))
+            ]
+        except Exception as e:
+            logger.warning(f"Parallel filter unavailable: {e}")
+            self.close()
+            return None
+
+    def collect(self, futures):
+        """
+        Merge partition results into one mask (waits for them).
+
+        Returns:
+            list: One bool per row, or None if a worker failed.
+        """
+        mask = []
+        try:
+            for future in futures:
+                mask.extend(map(bool, future.result()))
+        except Exception as e:
+            logger.warning(f"Parallel filter failed: {e}")
+            self.close()
+            return None
+        return mask
+
+    def mask(self, compiled, model, lower=False):
+        """Evaluate ``compiled`` over every row; None on failure."""
+        futures = self.submit(compiled, model, lower)
+        if futures is None:
+            return None
+        wait(futures)
+        return self.collect(futures)
+
+    def close(self):
+        """Stop the workers and release the shared column segments."""
+        atexit.unregister(self.close)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        for name in list(self._segments):
+            self._release(name)
+        self._model = None
+
+    def _share(self, model, names):
+        """
+        Put the named columns in shared memory, reusing segments whose
+        column has not changed.
+
+        Returns:
+            dict: Column name → (segment name, directory entry, rows).
+        """
+        if model is not self._model:
+            for name in list(self._segments):
+                self._release(name)
+            self._model = model
+        headers = model._headers
+        rows = model.rowCount()
+        shared = {}
+        for name in names:
+            col = headers.index(name)
+            version = model.column_version(col)
+            cached = self._segments.get(name)
+            if cached is None or cached[0] != version:
+                if cached is not None:
+                    self._release(name)
+                cached = self._segments[name] = (
+                    version,
+                    *_create_segment(
+                        name, model._data.kinds[col], model.column(col)
+                    ),
+                )
+            _, segment, entry = cached
+            shared[name] = (segment.name, entry, rows)
+        return shared
+
+    def _release(self, name):
+        _, segment, _ = self._segments.pop(name)
+        segment.close()
+        segment.unlink()
+
+
+def _create_segment(name, kind, values):
+    """Copy one column into a new shared-memory segment."""
+    buffers = encode_column(kind, values)
+    offsets = []
+    size = 0
+    for buffer in buffers:
+        size += -size % ALIGN
+        offsets.append(size)
+        size += len(buffer)
+    segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for offset, buffer in zip(offsets, buffers):
+        end = offset + len(buffer)
+        segment.buf[offset:end] = buffer
+    entry = {"name": name, "kind": kind}
+    if kind in TYPECODES:
+        entry["offset"], entry["size"] = offsets[0], len(buffers[0])
+    else:
+        entry["offsets"], entry["heap"] = offsets
+        entry["size"] = len(buffers[1])
+    return segment, entry
+
+
+# ----------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------
+
+_attached = {}  # segment name → (SharedMemory, mapped column)
+_compiled = {}  # expression text → CompiledExpression
+
+
+def _attach(segment_name, entry, rows):
+    attached = _attached.get(segment_name)
+    if attached is None:
+        if not _attached:
+            atexit.register(_detach_all)
+        segment = shared_memory.SharedMemory(name=segment_name)
+        column = map_column(segment.buf, entry, rows)
+        attached = _attached[segment_name] = (segment, column)
+    return attached[1]
+
+
+def _detach(segment_name):
+    segment = _attached.pop(segment_name)[0]
+    try:
+        segment.close()
+    except BufferError:
+        pass  # a mapped column is still referenced; freed with it
+
+
+def _detach_all():
+    # Mapped columns must go before their segments can close
+    for segment_name in list(_attached):
+        _detach(segment_name)
+
+
+def _evaluate_partition(text, symbols, columns, lower, start, stop):
+    """Evaluate rows start..stop-1; returns the mask as bytes (0/1)."""
+    live = {segment for segment, _, _ in columns.values()}
+    for stale in set(_attached) - live:
+        _detach(stale)
+
+    values = {}
+    for name, (segment, entry, rows) in columns.items():
+        part = _attach(segment, entry, rows)[start:stop]
+        if lower:
+            part = [v.lower() if isinstance(v, str) else v for v in part]
+        values[name] = part
+
+    compiled = _compiled.get(text)
+    if compiled is None:
+        compiled = _compiled[text] = compile_expression(
+            text, list(columns), symbols
+        )
+    return bytes(compiled.mask(values, stop - start))
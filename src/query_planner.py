@@ -0,0 +1,432 @@
+"""
+Cost-based plans for filter expressions.
+
+A filter's top-level ``and`` (or ``or``) is split into its parts. Each
+part is either answered by a column index (see column_index) or scanned.
+A scanned part gets an estimated cost (seconds per row) and selectivity
+(fraction of rows it lets through) from a run over a small sample of rows,
+blended with what the column statistics suggest. The parts then run
+cheapest and most decisive first, each only on the rows still undecided,
+and record how long they took on how many rows, for ``explain``.
+
+The result is the same as evaluating the whole expression: a row whose
+evaluation fails counts as not matching, and for ``or`` a part that fails
+before (in the written order) the part that matched still rejects the
+row, as it would when evaluated left to right.
+"""
+
+import ast
+from itertools import compress
+from time import perf_counter
+from column_index import (
+    all_rows,
+    bitmap_from_rows,
+    bitmap_rows,
+    bitmap_to_mask,
+)
+from filter_engine import COMPARE_NAMES, FLIPPED, NEVER_RAISING_OPS
+
+SAMPLE_ROWS = 256  # rows each scanned part is timed on while planning
+PRIOR_WEIGHT = 8  # sample rows the statistics-based estimate counts as
+DEFAULT_SELECTIVITY = 0.5
+GATHER_MAX_FRACTION = 0.5  # more candidates than this: scan whole columns
+
+
+def _outcomes(values):
+    """Per row: True, False, or None where evaluation failed."""
+    try:
+        return [bool(value) for value in values]
+    except Exception:
+        result = []
+        for value in values:
+            try:
+                result.append(bool(value))
+            except Exception:
+                result.append(None)
+        return result
+
+
+def sample_rows(count, size=SAMPLE_ROWS):
+    """Up to ``size`` rows spread evenly over the table."""
+    step = max(count // size, 1)
+    return list(range(0, count, step))[:size]
+
+
+def may_fail(node, columns):
+    """
+    False for tests that cannot raise for any row: ``==``, ``!=`` and
+    ``is`` between known columns and constants. Any other name (a typo, or
+    ``none`` from a lower-cased ``None``) fails for every row. Under ``or``
+    a part that may fail has to be evaluated even for rows a later part
+    matches.
+    """
+    return not (
+        isinstance(node, ast.Compare)
+        and all(isinstance(op, NEVER_RAISING_OPS) for op in node.ops)
+        and all(
+            isinstance(operand, ast.Constant)
+            or (isinstance(operand, ast.Name) and operand.id in columns)
+            for operand in [node.left, *node.comparators]
+        )
+    )
+
+
+def prior_selectivity(node, schema):
+    """
+    Selectivity suggested by column statistics for a ``column op value``
+    test: 1 / cardinality for equality, the covered part of [min, max] for
+    numeric ranges. DEFAULT_SELECTIVITY for anything else.
+    """
+    if not (
+        schema is not None
+        and isinstance(node, ast.Compare)
+        and len(node.ops) == 1
+        and type(node.ops[0]) in COMPARE_NAMES
+    ):
+        return DEFAULT_SELECTIVITY
+    op = COMPARE_NAMES[type(node.ops[0])]
+    left, right = node.left, node.comparators[0]
+    if isinstance(right, ast.Name) and isinstance(left, ast.Constant):
+        left, right, op = right, left, FLIPPED[op]
+    if not (isinstance(left, ast.Name) and isinstance(right, ast.Constant)):
+        return DEFAULT_SELECTIVITY
+    column = schema.get(left.id)
+    if column is None:
+        return DEFAULT_SELECTIVITY
+
+    if op in ("==", "!=") and column.cardinality:
+        equal = 1 / column.cardinality
+        return equal if op == "==" else 1 - equal
+    value, low, high = right.value, column.minimum, column.maximum
+    if (
+        column.type in ("int", "float")
+        and type(value) in (int, float)
+        and low is not None
+        and high is not None
+        and high > low
+    ):
+        below = min(max((value - low) / (high - low), 0.0), 1.0)
+        return below if op in ("<", "<=") else 1 - below
+    return DEFAULT_SELECTIVITY
+
+
+class PlanStep:
+    """
+    One part of a filter, as planned and as run.
+
+    Attributes:
+        text (str): The part's source.
+        position (int): Place of the part in the written expression.
+        bits (int): Bitmap of the matching rows if an index answers the
+            part, else None.
+        compiled (CompiledExpression): The part on its own, if scanned.
+        selectivity (float): Estimated fraction of rows it lets through.
+        cost (float): Estimated seconds per row scanned (0 if indexed).
+        rows_in (int): Rows it was run on (None until run).
+        rows_out (int): Rows still matching after it.
+        seconds (float): Time it took.
+        may_fail (bool): False if evaluating the part cannot raise.
+    """
+
+    __slots__ = (
+        "text",
+        "position",
+        "bits",
+        "compiled",
+        "selectivity",
+        "cost",
+        "rows_in",
+        "rows_out",
+        "seconds",
+        "may_fail",
+    )
+
+    def __init__(self, text, position):
+        self.text = text
+        self.position = position
+        self.bits = None
+        self.compiled = None
+        self.selectivity = DEFAULT_SELECTIVITY
+        self.cost = 0.0
+        self.rows_in = None
+        self.rows_out = None
+        self.seconds = 0.0
+        self.may_fail = True
+
+    @property
+    def indexed(self):
+        return self.bits is not None
+
+
+class QueryPlan:
+    """
+    The parts of a filter in the order they will run.
+
+    For ``and``, indexed parts are intersected first, then scanned parts
+    run by rising cost / (1 - selectivity), each on the rows all earlier
+    parts let through. For ``or``, indexed parts run first, then scanned
+    parts by rising cost / selectivity, each on the rows not yet decided.
+
+    Attributes:
+        text (str): The filter expression.
+        mode (str): "and" or "or" (a single part plans as "and").
+        steps (list): PlanSteps in execution order.
+        count (int): Rows in the table.
+        seconds (float): Time the last run took (None until run).
+        index_seconds (float): Time planning spent on index lookups,
+            including building any index the lookup had to build.
+    """
+
+    def __init__(self, text, mode, steps, count, index_seconds=0.0):
+        self.text = text
+        self.mode = mode
+        self.count = count
+        self.seconds = None
+        self.index_seconds = index_seconds
+        if mode == "and":
+            rank = lambda s: s.cost / max(1 - s.selectivity, 1e-9)  # noqa
+        else:
+            rank = lambda s: s.cost / max(s.selectivity, 1e-9)  # noqa
+        self.steps = sorted(steps, key=lambda s: (not s.indexed, rank(s)))
+
+    @property
+    def indexed(self):
+        """True when some part is answered by an index."""
+        return any(step.indexed for step in self.steps)
+
+    @property
+    def useful(self):
+        """
+        True when running the plan beats evaluating the expression as a
+        whole: there is an index to use or parts to reorder.
+        """
+        return self.indexed or len(self.steps) > 1
+
+    def estimated_seconds(self):
+        """
+        Expected time of the plan from the estimates, counting the index
+        lookups (and builds) planning did.
+        """
+        total = self.index_seconds
+        rows = self.count
+        for step in self.steps:
+            total += rows * step.cost
+            if self.mode == "and":
+                rows *= step.selectivity
+            else:
+                rows *= 1 - step.selectivity
+        return total
+
+    def execute(self, evaluate):
+        """
+        Run the plan.
+
+        Parameters:
+            evaluate (callable): (CompiledExpression, rows or None for
+                all rows) → one value per row.
+
+        Returns:
+            list: One bool per row.
+        """
+        start = perf_counter()
+        if self.mode == "and":
+            mask = self._run_and(evaluate)
+        else:
+            mask = self._run_or(evaluate)
+        self.seconds = perf_counter() - start
+        return mask
+
+    def _run_and(self, evaluate):
+        count = self.count
+        bits = None
+        for step in self.steps:
+            if not step.indexed:
+                continue
+            start = perf_counter()
+            step.rows_in = count if bits is None else bits.bit_count()
+            bits = step.bits if bits is None else bits & step.bits
+            step.rows_out = bits.bit_count()
+            step.seconds = perf_counter() - start
+
+        candidates = bitmap_rows(bits) if bits is not None else None
+        for step in self.steps:
+            if step.indexed:
+                continue
+            start = perf_counter()
+            if candidates is None:
+                step.rows_in = count
+                outcomes = _outcomes(evaluate(step.compiled, None))
+                candidates = [row for row, ok in enumerate(outcomes) if ok]
+            elif len(candidates) > count * GATHER_MAX_FRACTION:
+                # Reading whole columns beats gathering most of their rows
+                step.rows_in = len(candidates)
+                outcomes = _outcomes(evaluate(step.compiled, None))
+                candidates = [row for row in candidates if outcomes[row]]
+            else:
+                step.rows_in = len(candidates)
+                outcomes = _outcomes(evaluate(step.compiled, candidates))
+                candidates = [
+                    row for row, ok in zip(candidates, outcomes) if ok
+                ]
+            step.rows_out = len(candidates)
+            step.seconds = perf_counter() - start
+
+        if candidates is None:
+            return bitmap_to_mask(bits if bits is not None else 0, count)
+        mask = [False] * count
+        for row in candidates:
+            mask[row] = True
+        return mask
+
+    def _run_or(self, evaluate):
+        # Bitmaps, per part (by written position), of the rows it was true,
+        # failed and false for. A row's result is that of the first part in
+        # written order not false for it, so the row is done once that part
+        # and every part before it have been run.
+        count = self.count
+        true, failed, false = {}, {}, {}
+        undecided = all_rows(count)
+        matched = 0
+        for step in self.steps:
+            position = step.position
+            # Rows not false for an earlier part are settled by that part
+            settled = 0
+            for earlier in true:
+                if earlier < position:
+                    settled |= true[earlier] | failed[earlier]
+            rows = undecided & ~settled
+            start = perf_counter()
+            step.rows_in = rows.bit_count()
+            if step.indexed:
+                hits, errors = step.bits & rows, 0
+            else:
+                hits, errors = self._scan(step, rows, evaluate)
+            true[position], failed[position] = hits, errors
+            false[position] = rows & ~(hits | errors)
+            decided, matched = self._or_state(true, failed, false)
+            undecided &= ~decided
+            step.rows_out = matched.bit_count()
+            step.seconds = perf_counter() - start
+        return bitmap_to_mask(matched, count)
+
+    def _or_state(self, true, failed, false):
+        """Bitmaps of the rows decided so far, and of those matching."""
+        everything = all_rows(self.count)
+        prefix = everything  # rows false for every part so far
+        clean = everything  # rows no part so far failed (or may fail) for
+        decided = matched = 0
+        for step in sorted(self.steps, key=lambda s: s.position):
+            position = step.position
+            if position in true:
+                hits = clean & true[position]
+                matched |= hits
+                decided |= hits | (prefix & failed[position])
+                prefix &= false[position]
+                if step.may_fail:
+                    clean &= true[position] | false[position]
+            else:
+                prefix = 0
+                if step.may_fail:
+                    clean = 0
+            if not (prefix or clean):
+                break
+        return decided | prefix, matched
+
+    def _scan(self, step, rows, evaluate):
+        """Bitmaps of ``rows`` a scanned part is true and fails for."""
+        count = self.count
+        if rows.bit_count() > count * GATHER_MAX_FRACTION:
+            # Reading whole columns beats gathering most of their rows
+            listed, outcomes = range(count), evaluate(step.compiled, None)
+        else:
+            listed = bitmap_rows(rows)
+            outcomes = evaluate(step.compiled, listed)
+        outcomes = _outcomes(outcomes)
+        hits = bitmap_from_rows(compress(listed, outcomes), count)
+        errors = 0
+        if None in outcomes:
+            errors = bitmap_from_rows(
+                (row for row, ok in zip(listed, outcomes) if ok is None),
+                count,
+            )
+        return hits & rows, errors & rows
+
+    def explain(self):
+        """The plan (and the last run's timings) as readable text."""
+        lines = [f"Filter: {self.text}"]
+        parts = len(self.steps)
+        if parts > 1:
+            lines.append(f"{parts} parts joined by '{self.mode}', run as:")
+        for number, step in enumerate(self.steps, 1):
+            how = "index" if step.indexed else "scan"
+            line = (
+                f"{number}. {step.text}  [{how}]  "
+                f"est. {step.selectivity:.0%} of rows"
+            )
+            if not step.indexed:
+                line += f", {step.cost * 1e6:.1f} µs/row"
+            lines.append(line)
+            if step.rows_in is not None:
+                lines.append(
+                    f"     ran on {step.rows_in} rows → {step.rows_out}"
+                    f" matching, {step.seconds * 1000:.2f} ms"
+                )
+        if self.index_seconds:
+            lines.append(f"Index lookups: {self.index_seconds * 1000:.2f} ms")
+        if self.seconds is not None:
+            matching = self.steps[-1].rows_out if self.steps else 0
+            lines.append(
+                f"Total: {matching} of {self.count} rows in "
+                f"{self.seconds * 1000:.2f} ms"
+            )
+        return "\n".join(lines)
+
+
+def build_plan(compiled, lookup, count, evaluate, schema=None):
+    """
+    Plan a compiled filter.
+
+    Parameters:
+        compiled (CompiledExpression): The filter.
+        lookup (IndexLookup): Index answers for single predicates.
+        count (int): Rows in the table.
+        evaluate (callable): (CompiledExpression, rows or None) → values;
+            used to time parts on a sample.
+        schema (TableSchema, optional): Column statistics.
+
+    Returns:
+        QueryPlan: The plan, not yet run.
+    """
+    body = compiled.tree.body
+    mode = "and"
+    parts = [body]
+    if isinstance(body, ast.BoolOp):
+        mode = "and" if isinstance(body.op, ast.And) else "or"
+        parts = body.values
+
+    everything = all_rows(count)
+    sample = sample_rows(count)
+    steps = []
+    index_seconds = 0.0
+    for position, node in enumerate(parts):
+        step = PlanStep(ast.unparse(node), position)
+        start = perf_counter()
+        bits = compiled.index_bitmap(node, lookup, everything)
+        index_seconds += perf_counter() - start
+        if bits is not None:
+            step.bits = bits
+            step.may_fail = False
+            step.selectivity = bits.bit_count() / count if count else 0.0
+        else:
+            step.compiled = compiled.subexpression([node])
+            step.may_fail = may_fail(node, compiled.names)
+            prior = prior_selectivity(node, schema)
+            start = perf_counter()
+            outcomes = _outcomes(evaluate(step.compiled, sample))
+            step.cost = (perf_counter() - start) / max(len(sample), 1)
+            hits = sum(1 for outcome in outcomes if outcome)
+            step.selectivity = (hits + prior * PRIOR_WEIGHT) / (
+                len(sample) + PRIOR_WEIGHT
+            )
+        steps.append(step)
+    return QueryPlan(compiled.text, mode, steps, count, index_seconds)
@@ -0,0 +1,118 @@
+"""
+Append-only crash-recovery log of unsaved edits.
+
+Every change to the table since the last save is appended as one record:
+
+    payload length (u32) | CRC-32 of payload (u32) | payload
+
+where the payload is the undo step (see undo_redo) as compact JSON.
+Records reach the OS as soon as they are written and are fsynced in
+batches (see ``sync``). Reading stops at the first record that is cut
+short or fails its checksum, which is what a crash mid-append leaves.
+"""
+
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+from atomic_io import atomic_write
+from logger import setup_logger
+from undo_redo import action_from_dict
+
+logger = setup_logger("recovery_log")
+
+MAGIC = b"IDWLOG1\n"
+RECORD_HEADER = struct.Struct("<II")
+SYNC_INTERVAL_MS = 200  # appended records are fsynced together this often
+
+
+def _encode(action):
+    payload = json.dumps(
+        action.to_dict(), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class RecoveryLog:
+    """
+    Write-ahead log of the undo steps to replay after a crash.
+
+    Attributes:
+        path (Path): The log file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+        self._unsynced = False
+
+    def exists(self):
+        return self.path.exists()
+
+    def append(self, actions):
+        """Append one record per step, without waiting for the disk."""
+        if not actions:
+            return
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            if self._file.tell() == 0:
+                self._file.write(MAGIC)
+        self._file.write(b"".join(map(_encode, actions)))
+        self._file.flush()
+        self._unsynced = True
+
+    def sync(self):
+        """Force appended records to disk."""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = False
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def clear(self):
+        """Drop the log, e.g. once everything in it has been saved."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._unsynced = False
+        self.path.unlink(missing_ok=True)
+
+    def rewrite(self, actions):
+        """Atomically replace the log with just ``actions``."""
+        self.clear()
+        if actions:
+            records = b"".join(map(_encode, actions))
+            atomic_write(
+                self.path, lambda f: f.write(MAGIC + records), binary=True
+            )
+
+    def read(self):
+        """
+        Yield the logged steps in order, stopping at a torn or corrupt
+        record.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            if f.read(len(MAGIC)) != MAGIC:
+                logger.warning(f"{self.path} is not a recovery log")
+                return
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if not header:
+                    return
+                if len(header) < RECORD_HEADER.size:
+                    break
+                size, checksum = RECORD_HEADER.unpack(header)
+                payload = f.read(size)
+                if len(payload) < size or zlib.crc32(payload) != checksum:
+                    break
+                yield action_from_dict(json.loads(payload))
+        logger.warning("Ignoring torn record at the end of the recovery log")
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+RESULT_CACHE_SIZE = 32  # filter masks, key columns and orders kept
+
+
+class ResultCache:
+    """
+    Bounded LRU cache for filter and sort results (row masks, sort key
+    values, rank arrays, row orders).
+
+    Keys carry the versions of the columns a result was computed from, so
+    an entry is simply never asked for again once its data has changed; it
+    ages out of the cache instead of being invalidated.
+
+    Attributes:
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to be computed.
+    """
+
+    def __init__(self, capacity=RESULT_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None."""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for ``key``, computing and storing it with
+        ``compute()`` on a miss (None results are not stored).
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size, e.g. for logging."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "capacity": self.capacity,
+        }
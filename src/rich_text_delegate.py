@@ -1,27 +1,87 @@
+from collections import OrderedDict
 from PyQt5.QtWidgets import QStyledItemDelegate
-from PyQt5.QtGui import QTextDocument
+from PyQt5.QtGui import QColor, QTextDocument
 from PyQt5.QtCore import QSize, Qt, QRectF
 
+CACHE_SIZE = 2000  # laid-out documents kept for highlighted cells
+TEXT_MARGIN = 4  # QTextDocument's default document margin
+
 
 class RichTextDelegate(QStyledItemDelegate):
-    def paint(self, painter, option, index):
-        text = index.data(Qt.DisplayRole)
-        doc = QTextDocument()
-        doc.setHtml(text)
-        doc.setTextWidth(option.rect.width())  # constrain width
+    """
+    Paints cells with search highlights.
 
-        # Clip painting to cell bounds
+    Only cells with a search match are rendered through QTextDocument, from
+    the HTML the model provides in HIGHLIGHT_ROLE; the laid-out documents
+    are kept in a bounded LRU cache keyed by (HTML, width, theme). All
+    other cells are drawn from their plain display text, with no HTML
+    parsing at all.
+    """
+
+    SEARCH_MATCH_ROLE = Qt.UserRole + 2
+    HIGHLIGHT_ROLE = Qt.UserRole + 3
+
+    def __init__(self, parent=None, dark_mode=False):
+        super().__init__(parent)
+        self._dark_mode = dark_mode
+        self._documents = OrderedDict()
+
+    def set_dark_mode(self, enabled):
+        self._dark_mode = enabled
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._documents.clear()
+
+    def paint(self, painter, option, index):
+        rect = option.rect
         painter.save()
-        painter.setClipRect(option.rect)
-        painter.translate(option.rect.topLeft())
-        doc.drawContents(
-            painter, QRectF(0, 0, option.rect.width(), option.rect.height())
-        )
+        # Clip painting to cell bounds
+        painter.setClipRect(rect)
+        if not index.data(self.SEARCH_MATCH_ROLE):
+            painter.setFont(option.font)
+            painter.setPen(QColor("white" if self._dark_mode else "black"))
+            painter.drawText(
+                rect.adjusted(TEXT_MARGIN, TEXT_MARGIN, 0, 0),
+                Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap,
+                self._plain_text(index),
+            )
+        else:
+            doc = self._document(index, option, rect.width())
+            painter.translate(rect.topLeft())
+            doc.drawContents(
+                painter, QRectF(0, 0, rect.width(), rect.height())
+            )
         painter.restore()
 
     def sizeHint(self, option, index):
-        text = index.data(Qt.DisplayRole)
+        if not index.data(self.SEARCH_MATCH_ROLE):
+            metrics = option.fontMetrics
+            text = self._plain_text(index)
+            return QSize(
+                metrics.horizontalAdvance(text) + 2 * TEXT_MARGIN,
+                metrics.height() + 2 * TEXT_MARGIN,
+            )
+        doc = self._document(index, option, option.rect.width())
+        return QSize(int(doc.idealWidth()), int(doc.size().height()))
+
+    def _plain_text(self, index):
+        return index.data(Qt.DisplayRole)
+
+    def _document(self, index, option, width):
+        """Return a laid-out document for the cell, from the cache if any."""
+        text = index.data(self.HIGHLIGHT_ROLE)
+        key = (text, width, self._dark_mode)
+        doc = self._documents.get(key)
+        if doc is not None:
+            self._documents.move_to_end(key)
+            return doc
+
         doc = QTextDocument()
+        doc.setDefaultFont(option.font)
         doc.setHtml(text)
-        doc.setTextWidth(option.rect.width())  # ensures wrapping calculation
-        return QSize(int(doc.idealWidth()), int(doc.size().height()))
+        doc.setTextWidth(width)  # constrain width / wrapping calculation
+        self._documents[key] = doc
+        if len(self._documents) > CACHE_SIZE:
+            self._documents.popitem(last=False)
+        return doc
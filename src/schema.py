@@ -0,0 +1,306 @@
+"""
+Per-column type metadata for the table, inferred once when data loads.
+
+A TableSchema records, for every column, how many values of each type it
+holds, how many are missing (None), roughly how many distinct values there
+are, and the smallest and largest value. It is saved next to the data file
+(see DataManager.save_schema) so reopening an unchanged file does not scan
+it again, and kept in step with edits by the model.
+
+Consumers use it to pick a code path per column once instead of checking
+types per row: the filter field's operator list, whether a filter kernel
+can run without its per-row error fallback, and whether a sort needs the
+mixed-type ordering.
+"""
+
+from collections import Counter
+from itertools import islice
+
+SCHEMA_VERSION = 1
+CARDINALITY_CAP = 100_000  # distinct values counted exactly up to this
+INFER_CHUNK_ROWS = 65536  # values looked at per step
+SCAN_STEP_ROWS = 8192  # rows per event-loop turn of a GUI schema scan
+NUMERIC_TYPES = ("int", "float")
+ORDERED_TYPES = ("int", "float", "str")
+
+TYPE_NAMES = {
+    bool: "bool",
+    int: "int",
+    float: "float",
+    str: "str",
+    list: "list",
+    dict: "dict",
+    type(None): "null",
+}
+
+
+def type_name(value):
+    """Schema name of a value's type ("object" for anything unexpected)."""
+    return TYPE_NAMES.get(type(value), "object")
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(map(_hashable, value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+class ColumnSchema:
+    """
+    Type metadata of one column.
+
+    Attributes:
+        name (str): Column header.
+        types (dict): Type name → number of non-null values of that type.
+        nulls (int): Number of None values.
+        cardinality (int): Distinct values, capped at CARDINALITY_CAP.
+        minimum, maximum: Bounds of the dominant type's values if it is
+            ordered (int, float or str), else None. Edits only widen them,
+            so they stay bounds rather than exact extremes.
+    """
+
+    __slots__ = ("name", "types", "nulls", "cardinality", "minimum", "maximum")
+
+    def __init__(
+        self,
+        name,
+        types=None,
+        nulls=0,
+        cardinality=0,
+        minimum=None,
+        maximum=None,
+    ):
+        self.name = name
+        self.types = dict(types or {})
+        self.nulls = nulls
+        self.cardinality = cardinality
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @property
+    def type(self):
+        """The most common non-null type name ("null" if all are None)."""
+        types = {name: n for name, n in self.types.items() if n}
+        if not types:
+            return "null"
+        if set(types) <= set(NUMERIC_TYPES):
+            # ints and floats compare and sort as one numeric column
+            return "float" if "float" in types else "int"
+        return max(types, key=types.get)
+
+    @property
+    def nullable(self):
+        return self.nulls > 0
+
+    @property
+    def mixed(self):
+        """True when non-null values of incomparable types are mixed."""
+        types = {name for name, n in self.types.items() if n}
+        if types <= set(NUMERIC_TYPES):
+            return False
+        return len(types) > 1
+
+    @property
+    def uniform(self):
+        """
+        True when every value has the same (or a numeric) type, so values
+        can be compared and sorted against each other directly.
+        """
+        return not self.mixed and not self.nullable
+
+    def observe(self, old_value, new_value):
+        """Account for one cell changing from old_value to new_value."""
+        self._count(old_value, -1)
+        self._count(new_value, 1)
+        self._widen([new_value])
+
+    def extend(self, values):
+        """Account for appended values."""
+        self.merge(infer_column(self.name, values))
+
+    def merge(self, other):
+        """Fold in the schema of more rows of the same column."""
+        for name, count in other.types.items():
+            self.types[name] = self.types.get(name, 0) + count
+        self.nulls += other.nulls
+        self.cardinality = min(
+            max(self.cardinality, other.cardinality), CARDINALITY_CAP
+        )
+        self._widen((other.minimum, other.maximum))
+
+    def _count(self, value, delta):
+        if value is None:
+            self.nulls = max(self.nulls + delta, 0)
+        else:
+            name = type_name(value)
+            self.types[name] = max(self.types.get(name, 0) + delta, 0)
+
+    def _widen(self, values):
+        kind = self.type
+        if kind not in ORDERED_TYPES:
+            self.minimum = self.maximum = None
+            return
+        numeric = kind in NUMERIC_TYPES
+        for value in values:
+            name = type_name(value)
+            if name != kind and not (numeric and name in NUMERIC_TYPES):
+                continue
+            if self.minimum is None or value < self.minimum:
+                self.minimum = value
+            if self.maximum is None or value > self.maximum:
+                self.maximum = value
+
+    def to_dict(self):
+        return {
+            "types": self.types,
+            "nulls": self.nulls,
+            "cardinality": self.cardinality,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+        }
+
+    @classmethod
+    def from_dict(cls, name, entry):
+        return cls(name, **entry)
+
+
+class _ColumnScan:
+    """The running counts of one column while its values are scanned."""
+
+    __slots__ = ("name", "counts", "distinct", "bounds")
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = Counter()
+        self.distinct = set()
+        self.bounds = {}  # type → (min, max) of its values
+
+    def add(self, chunk):
+        chunk_types = Counter(map(type, chunk))
+        self.counts.update(chunk_types)
+        bounds = self.bounds
+        for kind in chunk_types:
+            if TYPE_NAMES.get(kind) in ORDERED_TYPES:
+                typed = [v for v in chunk if type(v) is kind]
+                low, high = min(typed), max(typed)
+                if kind in bounds:
+                    low = min(low, bounds[kind][0])
+                    high = max(high, bounds[kind][1])
+                bounds[kind] = (low, high)
+        if len(self.distinct) < CARDINALITY_CAP:
+            try:
+                self.distinct.update(chunk)
+            except TypeError:
+                self.distinct.update(map(_hashable, chunk))
+
+    def result(self):
+        types = Counter()
+        for kind, count in self.counts.items():
+            types[TYPE_NAMES.get(kind, "object")] += count
+        nulls = types.pop("null", 0)
+        column = ColumnSchema(
+            self.name,
+            dict(types),
+            nulls,
+            min(len(self.distinct), CARDINALITY_CAP),
+        )
+        kind = column.type
+        bounds = self.bounds
+        if kind in NUMERIC_TYPES:
+            numeric = [bounds[t] for t in (int, float) if t in bounds]
+            column.minimum = min(low for low, _ in numeric)
+            column.maximum = max(high for _, high in numeric)
+        elif kind == "str" and str in bounds:
+            column.minimum, column.maximum = bounds[str]
+        return column
+
+
+def infer_column(name, values):
+    """
+    Scan one column's values (any iterable) in a single pass of chunks.
+
+    Returns:
+        ColumnSchema: The column's metadata.
+    """
+    scan = _ColumnScan(name)
+    iterator = iter(values)
+    while True:
+        chunk = list(islice(iterator, INFER_CHUNK_ROWS))
+        if not chunk:
+            break
+        scan.add(chunk)
+    return scan.result()
+
+
+class SchemaInference:
+    """
+    A TableSchema being inferred a block of rows at a time, every column
+    from the same block, so a table read from a file decodes each block
+    once and the work can be spread over event-loop turns.
+
+    Parameters:
+        headers (list): Column headers.
+        blocks (iterable): Per block of rows, a list with the values of
+            each column for those rows.
+
+    Attributes:
+        schema (TableSchema): The result, once ``step`` returned True.
+    """
+
+    def __init__(self, headers, blocks):
+        self._scans = [_ColumnScan(name) for name in headers]
+        self._blocks = iter(blocks)
+        self.schema = None
+
+    def step(self):
+        """Scan the next block. Returns True when the schema is done."""
+        block = next(self._blocks, None)
+        if block is None:
+            self.schema = TableSchema(scan.result() for scan in self._scans)
+            return True
+        for scan, values in zip(self._scans, block):
+            if values:
+                scan.add(values)
+        return False
+
+    def run(self):
+        """Scan all remaining blocks and return the schema."""
+        while not self.step():
+            pass
+        return self.schema
+
+
+class TableSchema:
+    """
+    Type metadata of every column of a table.
+
+    Attributes:
+        columns (dict): Header → ColumnSchema, in column order.
+    """
+
+    def __init__(self, columns=()):
+        self.columns = {column.name: column for column in columns}
+
+    def get(self, name):
+        """The ColumnSchema of a header, or None if it is unknown."""
+        return self.columns.get(name)
+
+    def to_dict(self):
+        return {
+            "version": SCHEMA_VERSION,
+            "columns": {
+                name: column.to_dict() for name, column in self.columns.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, entry):
+        """Rebuild a schema; None if ``entry`` is from another version."""
+        if entry.get("version") != SCHEMA_VERSION:
+            return None
+        return cls(
+            ColumnSchema.from_dict(name, column)
+            for name, column in entry["columns"].items()
+        )
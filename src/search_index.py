@@ -0,0 +1,161 @@
+from bisect import bisect_right
+
+SEPARATOR = "\x00"
+
+
+class _Vocabulary:
+    """
+    Distinct cell texts of one column, each mapped to the rows holding it.
+
+    Substring queries scan the distinct texts once (joined into a single
+    string so ``str.find`` does the work in C) and union the row sets of
+    the texts that match. Columns with few distinct values (names, tags,
+    themes, dates) are therefore searched in time proportional to their
+    vocabulary, not their row count.
+    """
+
+    __slots__ = ("rows", "_keys", "_blob", "_offsets")
+
+    def __init__(self):
+        self.rows = {}
+        self._keys = None
+        self._blob = ""
+        self._offsets = []
+
+    def add(self, text, row):
+        rows = self.rows.get(text)
+        if rows is None:
+            self.rows[text] = {row}
+            self._keys = None
+        else:
+            rows.add(row)
+
+    def discard(self, text, row):
+        rows = self.rows.get(text)
+        if rows is None:
+            return
+        rows.discard(row)
+        if not rows:
+            del self.rows[text]
+            self._keys = None
+
+    def _prepare(self):
+        if self._keys is not None:
+            return
+        self._keys = list(self.rows)
+        self._blob = SEPARATOR.join(self._keys)
+        offsets = []
+        position = 0
+        for key in self._keys:
+            offsets.append(position)
+            position += len(key) + 1
+        self._offsets = offsets
+
+    def matching_texts(self, term):
+        self._prepare()
+        blob = self._blob
+        offsets = self._offsets
+        keys = self._keys
+        i = blob.find(term)
+        while i != -1:
+            k = bisect_right(offsets, i) - 1
+            # A hit that runs across the separator is not a real match
+            if i + len(term) <= offsets[k] + len(keys[k]):
+                yield keys[k]
+            if k + 1 >= len(offsets):
+                break
+            i = blob.find(term, offsets[k + 1])
+
+
+class SearchIndex:
+    """
+    Text search index over every cell of a ColumnStore.
+
+    For each column it keeps two vocabularies, one of the plain display text
+    (``str(value)``) and one lower-cased, so both case-sensitive and
+    case-insensitive searches are served without touching the table. The
+    index is updated cell by cell through ``update``, which the model calls
+    for edits, undo and redo alike.
+    """
+
+    def __init__(self, store, lazy=False):
+        self._store = store
+        self._exact = []
+        self._folded = []
+        for col in range(len(store.headers)):
+            if lazy:
+                # Indexed on first search, from the store's current values
+                self._exact.append(None)
+                self._folded.append(None)
+            else:
+                self._add_column(store.column(col))
+
+    def _add_column(self, values):
+        self._exact.append(None)
+        self._folded.append(None)
+        self.rebuild_column(len(self._exact) - 1, values)
+
+    def add_column(self, values):
+        """Index a newly appended column."""
+        self._add_column(values)
+
+    def rebuild_column(self, col, values):
+        """Re-index a column whose values were replaced wholesale."""
+        exact = _Vocabulary()
+        groups = {}
+        for row, text in enumerate(map(str, values)):
+            rows = groups.get(text)
+            if rows is None:
+                groups[text] = [row]
+            else:
+                rows.append(row)
+        exact.rows = {text: set(rows) for text, rows in groups.items()}
+
+        # Lower-case only the distinct texts, not every cell
+        folded = _Vocabulary()
+        for text, rows in exact.rows.items():
+            key = text.lower()
+            existing = folded.rows.get(key)
+            if existing is None:
+                folded.rows[key] = set(rows)
+            else:
+                existing |= rows
+        self._exact[col] = exact
+        self._folded[col] = folded
+
+    def extend_column(self, col, values, first_row):
+        """Index rows appended to the end of a column."""
+        if self._exact[col] is None:
+            return
+        exact = self._exact[col]
+        folded = self._folded[col]
+        for row, text in enumerate(map(str, values), first_row):
+            exact.add(text, row)
+            folded.add(text.lower(), row)
+
+    def update(self, row, col, old_value, new_value):
+        """Move one cell from its old text to its new text."""
+        old_text = str(old_value)
+        new_text = str(new_value)
+        if old_text == new_text or self._exact[col] is None:
+            return
+        self._exact[col].discard(old_text, row)
+        self._exact[col].add(new_text, row)
+        self._folded[col].discard(old_text.lower(), row)
+        self._folded[col].add(new_text.lower(), row)
+
+    def search(self, term, case_sensitive=False):
+        """
+        Return the set of rows with at least one cell containing ``term``.
+        """
+        if not case_sensitive:
+            term = term.lower()
+        for col, vocabulary in enumerate(self._exact):
+            if vocabulary is None:
+                self.rebuild_column(col, self._store.column(col))
+        vocabularies = self._exact if case_sensitive else self._folded
+        rows = set()
+        for vocabulary in vocabularies:
+            for text in vocabulary.matching_texts(term):
+                rows |= vocabulary.rows[text]
+        return rows
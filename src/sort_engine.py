@@ -0,0 +1,143 @@
+"""
+Column-wise sorting helpers for the table proxy.
+
+Sorting is done on dense rank arrays: every distinct key of a column gets
+a number that preserves its order, and each row stores the number of its
+key. Rows can then be ordered (and compared, and located by binary search)
+through plain number comparisons, however expensive the original keys are
+to compare.
+"""
+
+from bisect import bisect_left
+
+
+def fallback_key(value):
+    """
+    Total order for columns mixing types that do not compare with each
+    other: numbers first, then strings, then everything else by repr.
+    """
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    if isinstance(value, str):
+        return (1, 0, value)
+    return (2, 0, repr(value))
+
+
+class RankedColumn:
+    """
+    Order-preserving ranks for one sequence of sort keys.
+
+    Ranks start out as consecutive integers. Keys added later (edits,
+    appended rows) that fall between two existing keys get the midpoint of
+    their neighbours' ranks, so existing ranks never have to be renumbered.
+
+    Attributes:
+        ranks (list): Rank of each row's key.
+        typed (bool): True when the keys needed ``fallback_key`` to be
+            comparable.
+    """
+
+    def __init__(self, values, typed=False):
+        self.typed = typed
+        self._distinct = []  # sorted distinct keys
+        self._distinct_ranks = []  # rank of each distinct key
+        self.ranks = self._build(values)
+
+    def __len__(self):
+        return len(self.ranks)
+
+    def _build(self, values):
+        if self.typed:
+            return self._build_by_argsort(values)
+        try:
+            distinct = sorted(set(values))
+        except TypeError:
+            # unhashable (lists) or incomparable keys
+            return self._build_by_argsort(values)
+        rank_of = {key: i for i, key in enumerate(distinct)}
+        self._distinct = distinct
+        self._distinct_ranks = list(range(len(distinct)))
+        return list(map(rank_of.__getitem__, values))
+
+    def _build_by_argsort(self, values):
+        if self.typed:
+            keys = list(map(fallback_key, values))
+        else:
+            keys = list(values)
+        try:
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+        except TypeError:
+            self.typed = True
+            keys = list(map(fallback_key, values))
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+
+        ranks = [0] * len(keys)
+        distinct = self._distinct = []
+        for row in order:
+            key = keys[row]
+            if not distinct or key != distinct[-1]:
+                distinct.append(key)
+            ranks[row] = len(distinct) - 1
+        self._distinct_ranks = list(range(len(distinct)))
+        return ranks
+
+    def rank_for(self, value):
+        """
+        Rank of ``value``, registering it as a new distinct key if needed.
+
+        Returns:
+            The rank, or None if ``value`` cannot be ranked against the
+            existing keys (then the column must be rebuilt).
+        """
+        key = fallback_key(value) if self.typed else value
+        distinct = self._distinct
+        ranks = self._distinct_ranks
+        try:
+            i = bisect_left(distinct, key)
+            if i < len(distinct) and distinct[i] == key:
+                return ranks[i]
+        except TypeError:
+            return None
+
+        if not distinct:
+            rank = 0
+        elif i == len(distinct):
+            rank = ranks[-1] + 1
+        elif i == 0:
+            rank = ranks[0] - 1
+        else:
+            low, high = ranks[i - 1], ranks[i]
+            rank = (low + high) / 2
+            if not low < rank < high:
+                return None  # out of float precision between neighbours
+        distinct.insert(i, key)
+        ranks.insert(i, rank)
+        return rank
+
+    def set(self, row, value):
+        """Update one row's key. Returns False if a rebuild is needed."""
+        rank = self.rank_for(value)
+        if rank is None:
+            return False
+        self.ranks[row] = rank
+        return True
+
+    def extend(self, values):
+        """Rank appended rows. Returns False if a rebuild is needed."""
+        ranks = []
+        for value in values:
+            rank = self.rank_for(value)
+            if rank is None:
+                return False
+            ranks.append(rank)
+        self.ranks.extend(ranks)
+        return True
+
+    def order(self, rows=None, descending=False):
+        """
+        Return ``rows`` (default: all rows) sorted by rank. The sort is
+        stable, so equal keys keep their row order in both directions.
+        """
+        if rows is None:
+            rows = range(len(self.ranks))
+        return sorted(rows, key=self.ranks.__getitem__, reverse=descending)
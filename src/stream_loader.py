@@ -0,0 +1,56 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from logger import setup_logger
+
+logger = setup_logger("stream_loader")
+
+
+class StreamingLoader(QObject):
+    """
+    Feeds streamed record chunks into a DataTableModel from the event loop.
+
+    Each chunk is appended on its own event-loop turn, so the table repaints
+    and stays responsive while a large file is still being read.
+
+    Signals:
+        progress(int, int): Rows loaded so far, percent of the file read.
+        finished(int): Total rows loaded.
+        failed(str): Error message if the stream could not be read.
+    """
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, model, chunks, parent=None):
+        super().__init__(parent)
+        self._model = model
+        self._chunks = chunks
+        self._cancelled = False
+        self.running = False
+
+    def start(self):
+        self.running = True
+        QTimer.singleShot(0, self._load_next_chunk)
+
+    def cancel(self):
+        self._cancelled = True
+        self.running = False
+
+    def _load_next_chunk(self):
+        if self._cancelled:
+            return
+        try:
+            records, percent = next(self._chunks)
+        except StopIteration:
+            self.running = False
+            self.finished.emit(self._model.rowCount())
+            return
+        except (ValueError, OSError) as e:
+            logger.error(f"Streaming load failed: {e}")
+            self.running = False
+            self.failed.emit(str(e))
+            return
+
+        self._model.append_rows(records)
+        self.progress.emit(self._model.rowCount(), percent)
+        QTimer.singleShot(0, self._load_next_chunk)
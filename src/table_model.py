@@ -1,7 +1,21 @@
-import json
+import html
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from PyQt5.QtCore import Qt, QAbstractTableModel, pyqtSignal
-from undo_redo import Action
+from PyQt5.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QModelIndex,
+    QTimer,
+    pyqtSignal,
+)
+from undo_redo import Action, CompoundAction, UndoHistory
+from column_index import ColumnIndexes
+from column_store import ColumnStore, nested_value
+from display_cache import DisplayCache
+from recovery_log import SYNC_INTERVAL_MS, RecoveryLog
+from schema import INFER_CHUNK_ROWS, SchemaInference, infer_column
+from search_index import SearchIndex
 from PyQt5.QtWidgets import QMessageBox
 import os
 
@@ -25,11 +39,12 @@ class DataTableModel(QAbstractTableModel):
     """
 
     stack_changed = pyqtSignal()
-    undo_stack: list[Action] = []
-    redo_stack: list[Action] = []
-    unsaved_action_stack: list[Action] = []
-    undo_log_path = Path(".undo_log.json")
+    undo_log_path = Path(".undo_log.bin")
+    NESTED_SAMPLE_ROWS = 1000  # rows read for the keys of dict columns
+    SCHEMA_SAMPLE_ROWS = 1000  # rows read for a column type before a schema
     RAW_VALUE_ROLE = Qt.UserRole + 1
+    SEARCH_MATCH_ROLE = Qt.UserRole + 2
+    HIGHLIGHT_ROLE = Qt.UserRole + 3
 
     def __init__(
         self,
@@ -41,40 +56,140 @@ class DataTableModel(QAbstractTableModel):
     ):
         super().__init__()
         self.stack_changed.connect(self.write_recovery_log_to_file)
-        self._raw_data = data or []
+        records = data if isinstance(data, list) else []
         self._data_manager = data_manager
         self._proxy_model = proxy_model
         self._dark_mode = dark_mode
         self._dirty = False
         self._backup_dirty = False
-
-        if self.undo_log_path.exists():
-            test_mode = os.environ.get("IDW_TEST_MODE") == "1"
-            if test_mode or self.prompt_user_for_recovery():
-                self.load_undo_stack_from_file()
-                self.replay_undo_stack()
+        # Bumped on every change to the cells; never goes backwards, even
+        # when update_data re-initializes the model.
+        self.data_version = getattr(self, "data_version", -1) + 1
+        # (row, col) → data_version of the last unsaved write to that cell
+        self._dirty_cells = {}
+        # col → data_version of the last write to the column; rows being
+        # added or removed count as a write to every column
+        self._column_versions = {}
+        self._rows_version = self.data_version
+        # Per model: steps of another table's data cannot be undone here
+        self.history = UndoHistory()
+        self._recovery_log = None  # see recovery_log
+        self._logged_actions = 0  # unsaved steps already in the log
+        self._pending_replay = deque()  # recovered steps not applied yet
+        self._log_sync_timer = QTimer(self)
+        self._log_sync_timer.setSingleShot(True)
+        self._log_sync_timer.setInterval(SYNC_INTERVAL_MS)
+        self._log_sync_timer.timeout.connect(self._sync_recovery_log)
+
+        if isinstance(data, ColumnStore):
+            # Already columnar (e.g. a memory-mapped .idwc file)
+            self._data = data
+            self._headers = list(data.headers)
+        else:
+            if headers:
+                # real headers from the loaded data
+                self._headers = headers.copy()
             else:
-                self.undo_log_path.unlink()
+                self._headers = list(records[0].keys()) if records else []
 
-        if headers:
-            self._headers = headers.copy()  # real headers from the loaded data
-        else:
-            self._headers = (
-                list(self._raw_data[0].keys()) if self._raw_data else []
-            )
+            # One typed column per header; the source dicts are not kept
+            self._data = ColumnStore.from_records(records, self._headers)
 
-        self._data = [
-            [item.get(header, "") for header in self._headers]
-            for item in self._raw_data
-        ]
+        self._add_nested_columns()
 
         if "sort result" not in self._headers:
-            # 🛠 Inject sort result virtual header
+            # 🛠 Inject sort result virtual header and blank column
             self._headers.append("sort result")
+            self._data.add_blank_column("sort result")
+
+        # str() of the cells shown, dropped per cell on every write
+        self._display = DisplayCache()
 
-        # 🛠 Inject blank sort result field into each data row
-        for row in self._data:
-            row.append("")
+        # Filter indexes (see column_index), built per column on first use
+        self.indexes = ColumnIndexes(self.column)
+
+        # Plain-text search index, kept in step with every cell write.
+        # Mapped files are indexed on first search so opening stays instant.
+        self._search_index = SearchIndex(self._data, lazy=self._data.lazy)
+
+        # Column types (see schema); set once all rows are in, by
+        # infer_schema or from the copy saved with the data file
+        self.schema = None
+
+        # Recover unsaved edits of a session that crashed, now that there
+        # is data to apply them to
+        if self.recovery_log.exists():
+            test_mode = os.environ.get("IDW_TEST_MODE") == "1"
+            if test_mode or self.prompt_user_for_recovery():
+                self.load_undo_stack_from_file()
+                self.replay_undo_stack()
+            else:
+                self.recovery_log.clear()
+
+    def _add_nested_columns(self):
+        """
+        Show each key of a column of dicts as a column of its own, e.g.
+        "preferences.theme". The keys are taken from the first rows.
+        Nested columns are views: editing one edits the parent dict, and
+        they are left out when the table is saved.
+        """
+        self._nested = {}  # nested col → (parent col, key)
+        self._children = {}  # parent col → nested cols
+        for parent in range(len(self._headers)):
+            header = self._headers[parent]
+            if header in self._data.nested:
+                continue
+            sample = self._data.column_values(
+                parent, range(min(len(self._data), self.NESTED_SAMPLE_ROWS))
+            )
+            keys = {}
+            for value in sample:
+                if isinstance(value, dict):
+                    keys.update(dict.fromkeys(value))
+            for key in keys:
+                name = f"{header}.{key}"
+                if name not in self._headers:
+                    self._data.add_nested_column(name, parent, key)
+                    self._headers.append(name)
+        for col, header in enumerate(self._headers):
+            if header in self._data.nested:
+                parent, key = self._data.nested[header]
+                parent = self._headers.index(parent)
+                self._nested[col] = (parent, key)
+                self._children.setdefault(parent, []).append(col)
+
+    def sort_result_column(self):
+        """
+        Index of the "sort result" column. Not necessarily the last one: a
+        saved file keeps it, and nested columns are added after it.
+        """
+        return self._headers.index("sort result")
+
+    def nested_headers(self):
+        """Headers of the nested-field columns, e.g. "preferences.theme"."""
+        return [self._headers[col] for col in self._nested]
+
+    @property
+    def recovery_log(self):
+        """The RecoveryLog at ``undo_log_path``."""
+        path = Path(self.undo_log_path)
+        if self._recovery_log is None or self._recovery_log.path != path:
+            if self._recovery_log is not None:
+                self._recovery_log.close()
+            self._recovery_log = RecoveryLog(path)
+        return self._recovery_log
+
+    @property
+    def undo_stack(self):
+        return self.history.undo
+
+    @property
+    def redo_stack(self):
+        return self.history.redo
+
+    @property
+    def unsaved_action_stack(self):
+        return self.history.unsaved
 
     def rowCount(self, parent=None):
         return len(self._data)
@@ -91,49 +206,258 @@ class DataTableModel(QAbstractTableModel):
         row = index.row()
         col = index.column()
 
-        # If this is a regular column
+        if role == Qt.DisplayRole:
+            # Plain text only; search highlights are HIGHLIGHT_ROLE
+            return self._display_text(row, col)
 
-        value = self._data[row][col]
+        if role == self.SEARCH_MATCH_ROLE:
+            # Lets the delegate skip HTML rendering for unhighlighted cells
+            return bool(self._highlight(row, col))
 
-        if role == Qt.DisplayRole:
-            display = str(value)
-            if self._proxy_model:
-                search = self._proxy_model.search_text
-                case_sensitive = getattr(
-                    self._proxy_model, "case_sensitive", False
-                )
-                if search:
-                    text_to_search = (
-                        display if case_sensitive else display.lower()
-                    )
-                    search_key = search if case_sensitive else search.lower()
-                    if search_key in text_to_search:
-                        start = text_to_search.index(search_key)
-                        end = start + len(search_key)
-                        # soft blue or yellow
-                        bg_color = "#505b76" if self._dark_mode else "#ffff00"
-                        text_color = "white" if self._dark_mode else "black"
-
-                        # Highlight only the match but apply text color to
-                        # entire span
-                        highlighted = (
-                            f'<span style="color: {text_color}">'
-                            + display[:start]
-                            + f'<span style="background-color: {bg_color}">'
-                            + f"{display[start:end]}</span>"
-                            + display[end:]
-                            + "</span>"
-                        )
-                        return highlighted
-            # Default: wrap full text to apply text color even with no match
-            text_color = "white" if self._dark_mode else "black"
-            return f'<span style="color: {text_color}">{display}</span>'
+        if role == self.HIGHLIGHT_ROLE:
+            return self._highlight(row, col) or None
 
         if role == self.RAW_VALUE_ROLE:
-            return value  # Actual raw value used for comparisons
+            return self._data.get(row, col)  # raw value for comparisons
 
         return None
 
+    def _display_text(self, row, col):
+        key = (row, col)
+        text = self._display.text(key)
+        if text is None:
+            text = self._display.put_text(key, str(self._data.get(row, col)))
+        return text
+
+    def _highlight(self, row, col):
+        """
+        HTML of a cell with the search match highlighted, or "" when there
+        is no active search or no match.
+        """
+        proxy = self._proxy_model
+        if not proxy or not proxy.search_text:
+            return ""
+        settings = (
+            proxy.search_text,
+            getattr(proxy, "case_sensitive", False),
+            self._dark_mode,
+        )
+        key = (row, col)
+        highlighted = self._display.highlight(key, settings)
+        if highlighted is not None:
+            return highlighted
+
+        display = self._display_text(row, col)
+        match = self._search_match(display)
+        if not match:
+            return self._display.put_highlight(key, "")
+        start, end = match
+        # soft blue or yellow
+        bg_color = "#505b76" if self._dark_mode else "#ffff00"
+        text_color = "white" if self._dark_mode else "black"
+
+        # Highlight only the match but apply text color to entire span
+        highlighted = (
+            f'<span style="color: {text_color}">'
+            + html.escape(display[:start])
+            + f'<span style="background-color: {bg_color}">'
+            + html.escape(display[start:end])
+            + "</span>"
+            + html.escape(display[end:])
+            + "</span>"
+        )
+        return self._display.put_highlight(key, highlighted)
+
+    def _search_match(self, display):
+        """
+        Return the (start, end) of the search text in ``display``, or None
+        when there is no active search or no match.
+        """
+        if not self._proxy_model:
+            return None
+        search = self._proxy_model.search_text
+        if not search:
+            return None
+        case_sensitive = getattr(self._proxy_model, "case_sensitive", False)
+        text_to_search = display if case_sensitive else display.lower()
+        search_key = search if case_sensitive else search.lower()
+        start = text_to_search.find(search_key)
+        if start < 0:
+            return None
+        return start, start + len(search_key)
+
+    def column_values(self, col, rows=None):
+        """
+        Return the raw values of one column as a list.
+
+        Parameters:
+            col (int): Column index.
+            rows (iterable, optional): Source rows to read; all rows if None.
+        """
+        return self._data.column_values(col, rows)
+
+    def column(self, col):
+        """
+        Read-only backing sequence for one column, without copying. Use
+        this for whole-column scans.
+        """
+        return self._data.column(col)
+
+    def row_blocks(self, rows=INFER_CHUNK_ROWS):
+        """
+        Yield the table a block of about ``rows`` rows at a time, as one
+        list of values per column. Each block of the store is read once
+        for all columns, so a file-backed table is decoded once.
+        """
+        data = self._data
+        for start in range(0, len(data), rows):
+            stop = min(start + rows, len(data))
+            block = [[] for _ in self._headers]
+            for part in range(start, stop, data.block_rows):
+                for col, values in enumerate(block):
+                    values.extend(data.block_values(col, part))
+            yield block
+
+    def schema_inference(self, rows=INFER_CHUNK_ROWS):
+        """
+        A SchemaInference of the current rows, to run step by step.
+
+        Parameters:
+            rows (int): Rows scanned per step.
+        """
+        return SchemaInference(self._headers, self.row_blocks(rows))
+
+    def infer_schema(self):
+        """Scan every column for its type metadata and keep the result."""
+        self.schema = self.schema_inference().run()
+        return self.schema
+
+    def column_schema(self, name):
+        """
+        Type metadata of a column: from the schema, or from the first
+        SCHEMA_SAMPLE_ROWS rows while there is none yet (the file is still
+        streaming in, or being scanned). None for an unknown column.
+        """
+        if self.schema is not None:
+            column = self.schema.get(name)
+            if column is not None:
+                return column
+        if name not in self._headers:
+            return None
+        values = self.column(self._headers.index(name))
+        return infer_column(name, islice(values, self.SCHEMA_SAMPLE_ROWS))
+
+    def _observe(self, col, old_value, value):
+        if self.schema is not None:
+            column = self.schema.get(self._headers[col])
+            if column is not None:
+                column.observe(old_value, value)
+
+    def set_column_values(self, col, values):
+        """
+        Replace every value in a column (e.g. the "sort result" column) and
+        notify views once for the whole column.
+        """
+        values = list(values)
+        self._data.set_column_values(col, values)
+        self.indexes.drop(col)
+        self._display.invalidate_column(col)
+        self._search_index.rebuild_column(col, values)
+        if self.schema is not None:
+            header = self._headers[col]
+            self.schema.columns[header] = infer_column(header, values)
+        self._bump_version(col)
+        if self._data:
+            self.dataChanged.emit(
+                self.index(0, col), self.index(len(self._data) - 1, col)
+            )
+
+    def set_cells(self, col, rows, values):
+        """
+        Write derived values (e.g. re-evaluated sort results) into some cells
+        of one column. Nothing is recorded for undo; views are notified once
+        for the covered rows.
+
+        Parameters:
+            col (int): Column index.
+            rows (iterable): Source rows to write.
+            values (iterable): One value per row.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        self.indexes.drop(col)
+        for row, value in zip(rows, values):
+            old_value = self._data.get(row, col)
+            self._data.set(row, col, value)
+            self._display.invalidate(row, col)
+            self._search_index.update(row, col, old_value, value)
+            self._observe(col, old_value, value)
+        self._bump_version(col)
+        self.dataChanged.emit(
+            self.index(min(rows), col), self.index(max(rows), col)
+        )
+
+    def row_values(self, row):
+        """Return the raw values of one row as a list."""
+        return list(self._data[row])
+
+    def search_rows(self, text, case_sensitive=False):
+        """Return the set of source rows with a cell containing ``text``."""
+        return self._search_index.search(text, case_sensitive)
+
+    def _set_cell(self, row, col, value):
+        """
+        Single write path for cell values, keeping the indexes in step. A
+        nested column writes through to its parent dict, and a dict column
+        refreshes its nested columns.
+
+        Returns:
+            list: The columns written.
+        """
+        written = [col]
+        self._write_cell(row, col, value)
+        if col in self._nested:
+            parent, key = self._nested[col]
+            old_parent = self._data.get(row, parent)
+            new_parent = (
+                dict(old_parent) if isinstance(old_parent, dict) else {}
+            )
+            new_parent[key] = value
+            self._write_cell(row, parent, new_parent)
+            written.append(parent)
+        elif col in self._children:
+            for child in self._children[col]:
+                key = self._nested[child][1]
+                child_value = nested_value(value, key)
+                if self._data.get(row, child) != child_value:
+                    self._write_cell(row, child, child_value)
+                    written.append(child)
+        return written
+
+    def _write_cell(self, row, col, value):
+        old_value = self._data.get(row, col)
+        self._data.set(row, col, value)
+        self._display.invalidate(row, col)
+        self._search_index.update(row, col, old_value, value)
+        self._observe(col, old_value, value)
+        self.indexes.update(row, col, old_value, value)
+        self._bump_version(col)
+        if col not in self._nested:
+            # Nested cells are saved through their parent
+            self._dirty_cells[(row, col)] = self.data_version
+
+    def _bump_version(self, col):
+        self.data_version += 1
+        self._column_versions[col] = self.data_version
+
+    def column_version(self, col):
+        """
+        The data_version as of the last change to a column. Results computed
+        from some columns stay valid while those columns' versions do.
+        """
+        return max(self._column_versions.get(col, 0), self._rows_version)
+
     def set_dark_mode(self, enabled):
         self._dark_mode = enabled
         self.layoutChanged.emit()
@@ -161,98 +485,236 @@ class DataTableModel(QAbstractTableModel):
     def mark_backup_clean(self):
         self._backup_dirty = False
 
+    def snapshot(self):
+        """
+        Point-in-time copy of the table for saving off the GUI thread.
+
+        Returns:
+            tuple: (ColumnStore copy, data_version it reflects,
+                number of unsaved actions it includes)
+        """
+        self.history.checkpoint()
+        store = self._data.snapshot()
+        store.drop_columns(self.nested_headers())
+        return (
+            store,
+            self.data_version,
+            len(self.unsaved_action_stack),
+        )
+
+    def journal_snapshot(self):
+        """
+        The cells changed since the last save, for an append-only journal
+        save. Costs O(changed cells), not O(rows).
+
+        Returns:
+            tuple: (list of {"row", "column", "value"} dicts, data_version,
+                number of unsaved actions covered)
+        """
+        entries = [
+            {
+                "row": row,
+                "column": self._headers[col],
+                "value": self._data.get(row, col),
+            }
+            for row, col in sorted(self._dirty_cells)
+        ]
+        self.history.checkpoint()
+        return entries, self.data_version, len(self.unsaved_action_stack)
+
+    def mark_saved(self, version, saved_actions):
+        """
+        Record that a snapshot taken at ``version`` reached disk. Edits made
+        while it was being written keep the model dirty and stay in the
+        recovery log.
+        """
+        self._dirty_cells = {
+            cell: changed
+            for cell, changed in self._dirty_cells.items()
+            if changed > version
+        }
+        if version == self.data_version:
+            self._dirty = False
+            self.unsaved_action_stack.clear()
+            self.recovery_log.clear()
+        else:
+            # Rare: keep only the steps the save did not include
+            del self.unsaved_action_stack[:saved_actions]
+            self.recovery_log.rewrite(self.unsaved_action_stack)
+        self._logged_actions = len(self.unsaved_action_stack)
+
+    def mark_backup_saved(self, version):
+        if version == self.data_version:
+            self._backup_dirty = False
+
     def setData(self, index, value, role=Qt.EditRole):
         if role == Qt.EditRole:
             row = index.row()
             col = index.column()
-            current_value = self._data[row][col]
+            current_value = self._data.get(row, col)
 
             if current_value == value:
                 return False  # No change → no dirty flag
 
             # Inside setData (after verifying data has changed):
-            action = Action(index.row(), index.column(), current_value, value)
-            self.undo_stack.append(action)
-            self.redo_stack.clear()
-            # After pushing action
-            self.unsaved_action_stack.append(action)
+            self.history.record(Action(row, col, current_value, value))
             self.stack_changed.emit()
 
-            self._data[row][col] = value
+            written = self._set_cell(row, col, value)
             self._dirty = True
             self._backup_dirty = True
-            self.dataChanged.emit(index, index)
+            self.dataChanged.emit(
+                self.index(row, min(written)), self.index(row, max(written))
+            )
             # Let auto-save handle the actual save
             return True
         return False
 
+    def apply_edits(self, edits, label="Edited"):
+        """
+        Apply many cell edits (a paste, a column fill) as one undo step,
+        with a single change notification for views and the proxy.
+
+        Parameters:
+            edits (iterable): (row, col, value) triples; for a cell listed
+                more than once, the last value wins.
+            label (str): Undo history description, e.g. "Pasted".
+
+        Returns:
+            int: The number of cells that actually changed.
+        """
+        values = {(row, col): value for row, col, value in edits}
+        rows, cols, old_values, new_values = [], [], [], []
+        for (row, col), value in values.items():
+            current_value = self._data.get(row, col)
+            if current_value != value:
+                rows.append(row)
+                cols.append(col)
+                old_values.append(current_value)
+                new_values.append(value)
+        if not rows:
+            return 0
+
+        action = CompoundAction(rows, cols, old_values, new_values, label)
+        self.history.record(action)
+        self.stack_changed.emit()
+        self._dirty = True
+        self._backup_dirty = True
+        self._apply_action(action, undo=False)
+        return len(rows)
+
     def update_data(self, new_data):
         self.beginResetModel()
         self.__init__(new_data, headers=self._headers)
         self.endResetModel()
 
+    def append_rows(self, records):
+        """
+        Append records (dicts) to the end of the table, e.g. while a file is
+        still streaming in. Views are notified with a single row insertion.
+        """
+        if not records:
+            return
+        first = len(self._data)
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        self._data.append_records(records)
+        for col in range(len(self._headers)):
+            values = self._data.column_values(
+                col, range(first, len(self._data))
+            )
+            self._search_index.extend_column(col, values, first)
+            self.indexes.extend(col, values)
+            if self.schema is not None:
+                column = self.schema.get(self._headers[col])
+                if column is not None:
+                    column.extend(values)
+        self.data_version += 1
+        self._rows_version = self.data_version
+        self.endInsertRows()
+        if self._pending_replay:
+            self.replay_undo_stack()
+
     def get_current_data_as_dicts(self):
-        return [
-            {self._headers[i]: row[i] for i in range(len(self._headers))}
-            for row in self._data
-        ]
+        store = self._data.snapshot()
+        store.drop_columns(self.nested_headers())
+        return store.to_records()
 
     def undo(self):
         if self.undo_stack:
-            action = self.undo_stack.pop()
-            if self.unsaved_action_stack:
-                self.unsaved_action_stack.pop()
+            action = self.history.pop_undo()
             self._apply_action(action, undo=True)
-            self.redo_stack.append(action)
             self.stack_changed.emit()
 
     def redo(self):
         if self.redo_stack:
-            action = self.redo_stack.pop()
+            action = self.history.pop_redo()
             self._apply_action(action, undo=False)
-            self.undo_stack.append(action)
-            self.unsaved_action_stack.append(action)
             self.stack_changed.emit()
 
     def _apply_action(self, action, undo=True):
-        value = action.old_value if undo else action.new_value
-        self._data[action.row][
-            action.column
-        ] = value  # Update the data directly
-
-        # Notify the view
-        index = self.index(action.row, action.column)
-        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+        rows = []
+        cols = []
+        for row, col, old_value, new_value in action.cells():
+            written = self._set_cell(
+                row, col, old_value if undo else new_value
+            )
+            rows.append(row)
+            cols.extend(written)
+
+        # Notify the view, once for all of the step's cells
+        self.dataChanged.emit(
+            self.index(min(rows), min(cols)),
+            self.index(max(rows), max(cols)),
+            [Qt.DisplayRole],
+        )
 
     def write_recovery_log_to_file(self):
-        with open(self.undo_log_path, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "version": 1,
-                    "unsaved_action_stack": [
-                        a.__dict__ for a in self.unsaved_action_stack
-                    ],
-                    "undo_stack": [a.__dict__ for a in self.undo_stack],
-                    "redo_stack": [a.__dict__ for a in self.redo_stack],
-                },
-                f,
-                indent=2,
-            )
+        """
+        Append the unsaved steps not logged yet. They are fsynced shortly
+        after, together with any that follow.
+        """
+        unsaved = self.unsaved_action_stack
+        start = self._logged_actions
+        if start > len(unsaved):
+            start = 0  # the stack was replaced
+        self.recovery_log.append(unsaved[start:])
+        self._logged_actions = len(unsaved)
+        if not self._log_sync_timer.isActive():
+            self._log_sync_timer.start()
+
+    def _sync_recovery_log(self):
+        self.recovery_log.sync()
 
     def load_undo_stack_from_file(self):
-        with open(self.undo_log_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            self.unsaved_action_stack = [
-                Action(**entry)
-                for entry in data.get("unsaved_action_stack", [])
-            ]
+        """
+        Read the steps of the recovery log into the unsaved stack, ready for
+        replay_undo_stack. A torn final record is dropped from the log.
+        """
+        self.history.unsaved = list(self.recovery_log.read())
+        self.recovery_log.rewrite(self.history.unsaved)
+        self._logged_actions = len(self.history.unsaved)
+        self._pending_replay = deque(self.history.unsaved)
 
     def replay_undo_stack(self):
+        """
+        Apply the recovered steps in order. While the file is still
+        streaming in, replay stops at the first step touching a row that has
+        not arrived yet and resumes from append_rows.
+        """
+        pending = self._pending_replay
         try:
-            for action in self.unsaved_action_stack:
+            while pending:
+                action = pending[0]
+                last_row = max(row for row, _, _, _ in action.cells())
+                if last_row >= self.rowCount():
+                    return
                 self._apply_action(action, undo=False)
+                pending.popleft()
+                self._dirty = True
+                self._backup_dirty = True
         except Exception as e:
             print("Corrupted log: ", e)
+            pending.clear()
 
     def prompt_user_for_recovery(self):
         msg = QMessageBox()
@@ -1,16 +1,194 @@
-from dataclasses import dataclass
+import time
+from array import array
+from collections import deque
+from dataclasses import asdict, dataclass
 from typing import Any
 
+UNDO_MAX_STEPS = 1000  # undo steps kept per model
+UNDO_MAX_CELLS = 1_000_000  # cell changes kept across undo and redo
+COALESCE_SECONDS = 2.0  # repeated edits of one cell this close merge
 
-@dataclass
+
+@dataclass(slots=True)
 class Action:
     row: int
     column: int
     old_value: Any
     new_value: Any
 
+    @property
+    def cell_count(self) -> int:
+        return 1
+
+    def cells(self):
+        """Yield (row, column, old value, new value) for the changed cell."""
+        yield self.row, self.column, self.old_value, self.new_value
+
+    def inverse(self) -> "Action":
+        return Action(self.row, self.column, self.new_value, self.old_value)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
     def description(self) -> str:
         return (
             f"Edited ({self.row}, {self.column}): '{self.old_value}' →"
             + f"'{self.new_value}'"
         )
+
+
+class CompoundAction:
+    """
+    Several cell changes that are undone and redone as one step, e.g. a
+    paste or a column fill. The cells are kept in parallel arrays instead
+    of one Action object each.
+    """
+
+    __slots__ = ("rows", "columns", "old_values", "new_values", "label")
+
+    def __init__(self, rows, columns, old_values, new_values, label="Edited"):
+        self.rows = array("q", rows)
+        self.columns = array("q", columns)
+        self.old_values = list(old_values)
+        self.new_values = list(new_values)
+        self.label = label
+
+    @property
+    def cell_count(self):
+        return len(self.rows)
+
+    def cells(self):
+        """Yield (row, column, old value, new value) for each cell."""
+        return zip(self.rows, self.columns, self.old_values, self.new_values)
+
+    def inverse(self):
+        return CompoundAction(
+            self.rows,
+            self.columns,
+            self.new_values,
+            self.old_values,
+            self.label,
+        )
+
+    def to_dict(self):
+        return {
+            "rows": self.rows.tolist(),
+            "columns": self.columns.tolist(),
+            "old_values": self.old_values,
+            "new_values": self.new_values,
+            "label": self.label,
+        }
+
+    def description(self):
+        return f"{self.label} ({self.cell_count} cells)"
+
+
+def action_from_dict(entry):
+    """Rebuild an Action or CompoundAction from its ``to_dict`` form."""
+    if "rows" in entry:
+        return CompoundAction(**entry)
+    return Action(**entry)
+
+
+class UndoHistory:
+    """
+    Undo/redo history of one table model.
+
+    Consecutive edits of the same cell within COALESCE_SECONDS merge into
+    one step. The history is capped both in steps and in cell changes held
+    (a rough measure of its memory); the oldest undo steps are dropped
+    first. The step just recorded is always kept, however large.
+
+    Attributes:
+        undo (deque): Undo steps, oldest first.
+        redo (list): Undone steps, most recently undone last.
+        unsaved (list): Changes since the last save as steps to replay,
+            oldest first; append-only, like the recovery log it mirrors.
+            Undoing a step adds its inverse here, and a merged edit adds
+            the change from the merged step's value.
+        max_steps (int): Undo steps kept.
+        max_cells (int): Cell changes kept across undo and redo.
+    """
+
+    def __init__(self, max_steps=UNDO_MAX_STEPS, max_cells=UNDO_MAX_CELLS):
+        self.undo = deque()
+        self.redo = []
+        self.unsaved = []
+        self.max_steps = max_steps
+        self.max_cells = max_cells
+        self._cells = 0  # cell changes held in undo and redo
+        self._last_edit = None  # time of the last single-cell edit
+
+    def set_limits(self, max_steps, max_cells):
+        self.max_steps = max_steps
+        self.max_cells = max_cells
+        self._evict()
+
+    def record(self, action):
+        """
+        Add a new step (Action or CompoundAction); clears the redo steps.
+
+        Returns:
+            The step that now holds the change: ``action``, or the earlier
+            Action it was merged into.
+        """
+        for undone in self.redo:
+            self._cells -= undone.cell_count
+        self.redo.clear()
+
+        now = time.monotonic()
+        last = self.undo[-1] if self.undo else None
+        if (
+            isinstance(action, Action)
+            and isinstance(last, Action)
+            and (last.row, last.column) == (action.row, action.column)
+            and self._last_edit is not None
+            and now - self._last_edit <= COALESCE_SECONDS
+        ):
+            self.unsaved.append(
+                Action(
+                    action.row, action.column, last.new_value, action.new_value
+                )
+            )
+            last.new_value = action.new_value
+            action = last
+        else:
+            self.undo.append(action)
+            self.unsaved.append(action)
+            self._cells += action.cell_count
+            self._evict()
+        self._last_edit = now if isinstance(action, Action) else None
+        return action
+
+    def checkpoint(self):
+        """Start a new step with the next edit (e.g. after a save)."""
+        self._last_edit = None
+
+    def pop_undo(self):
+        """Move the newest step to the redo stack and return it."""
+        action = self.undo.pop()
+        self.unsaved.append(action.inverse())
+        self.redo.append(action)
+        self._last_edit = None
+        return action
+
+    def pop_redo(self):
+        """Move the most recently undone step back and return it."""
+        action = self.redo.pop()
+        self.undo.append(action)
+        self.unsaved.append(action)
+        self._last_edit = None
+        return action
+
+    def clear(self):
+        """Forget the undo and redo steps (unsaved steps are kept)."""
+        self.undo.clear()
+        self.redo.clear()
+        self._cells = 0
+        self._last_edit = None
+
+    def _evict(self):
+        while len(self.undo) > 1 and (
+            len(self.undo) > self.max_steps or self._cells > self.max_cells
+        ):
+            self._cells -= self.undo.popleft().cell_count
@@ -1,3 +1,4 @@
+import json
 from typing import Optional
 from datetime import datetime
 from PyQt5.QtCore import QDateTime
@@ -51,6 +52,55 @@ def remove_duplicates(data_list):
     return [x for x in data_list if not (x in seen or seen.add(x))]
 
 
+def parse_cell_text(text, like=None):
+    """
+    Converts text (e.g. pasted from the clipboard) to the type of the value
+    it replaces: numbers and booleans are parsed, lists and dicts are read
+    as JSON. Text that does not parse is kept as it is.
+
+    :param text: The text to convert
+    :param like: The cell's current value
+    :return: The converted value, or the text itself
+    """
+    try:
+        if isinstance(like, bool):
+            if text.strip().lower() in ("true", "false"):
+                return text.strip().lower() == "true"
+        elif isinstance(like, int):
+            return int(text)
+        elif isinstance(like, float):
+            return float(text)
+        elif isinstance(like, (list, dict)):
+            value = json.loads(text)
+            if isinstance(value, type(like)):
+                return value
+    except ValueError:
+        pass
+    return text
+
+
+def filter_literal(text, column=None):
+    """
+    Writes filter-input text as a Python literal of the column's type, so
+    the filter compares like with like: numbers for numeric columns,
+    True/False for boolean ones and a quoted string otherwise.
+
+    :param text: The value typed into the filter
+    :param column: The column's ColumnSchema (see schema), if known
+    :return: Expression source for the value
+    """
+    kind = column.type if column is not None else None
+    if kind in ("int", "float"):
+        for parse in (int, float):
+            try:
+                return repr(parse(text))
+            except ValueError:
+                pass
+    elif kind == "bool" and text.strip().lower() in ("true", "false"):
+        return str(text.strip().lower() == "true")
+    return repr(text)
+
+
 def get_current_timestamp():
     """
     Returns the current timestamp in YYYY-MM-DD HH:MM:SS format.
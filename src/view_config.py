@@ -1,5 +1,6 @@
 import json
 from pathlib import Path
+from atomic_io import atomic_write_json
 
 VIEWS_FILE = Path("saved_views.json")
 
@@ -14,8 +15,7 @@ def load_all_views():
 def save_view_config(name, config):
     views = load_all_views()
     views[name] = config
-    with open(VIEWS_FILE, "w", encoding="utf-8") as f:
-        json.dump(views, f, indent=2)
+    atomic_write_json(VIEWS_FILE, views, indent=2)
 
 
 def get_view_config(name):
@@ -38,5 +38,4 @@ def set_default_view(name):
     views = load_all_views()
     for vname in views:
         views[vname]["default"] = views[vname]["default"] = vname == name
-    with open(VIEWS_FILE, "w", encoding="utf-8") as f:
-        json.dump(views, f, indent=2)
+    atomic_write_json(VIEWS_FILE, views, indent=2)
@@ -0,0 +1,401 @@
+"""
+Table rows read on demand from a large JSON data file.
+
+Opening a file only builds a row-offset index: the byte position where
+each record of the top-level array starts (8 bytes per row). Records are
+decoded a block at a time when something reads them, e.g. the table view
+scrolling, and only the most recently used blocks are kept. Edited cells
+live in an overlay on top of the file, so memory stays proportional to the
+visible rows plus the edits, not to the file.
+"""
+
+import json
+import mmap
+from array import array
+from collections import OrderedDict
+from column_store import OBJECT, ColumnStore, nested_value
+from logger import setup_logger
+
+logger = setup_logger("virtual_store")
+
+VIRTUAL_MIN_BYTES = 256 * 1024 * 1024  # larger JSON files open virtually
+BLOCK_ROWS = 1024  # records decoded per block
+CACHE_BLOCKS = 64  # decoded blocks kept in memory
+STREAM_READ_SIZE = 1 << 20  # characters read from disk per step
+RECORD_SEPARATOR = b",\n  "  # between records, as json.dump(indent=2)
+
+
+def iter_json_array(f):
+    """
+    Decode a top-level JSON array from an open text file one element at a
+    time, from a rolling read buffer.
+
+    Yields:
+        tuple: (element, start, end) character positions of the element's
+        text in the file. For a file opened as latin-1 these are byte
+        offsets.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(STREAM_READ_SIZE)
+    consumed = 0  # characters dropped from the front of buffer
+    eof = not buffer
+    pos = _skip_whitespace(buffer, 0)
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("Unexpected data format")
+    pos += 1
+
+    while True:
+        pos = _skip_whitespace(buffer, pos, skip_commas=True)
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            if pos >= len(buffer):
+                raise json.JSONDecodeError("need more", buffer, pos)
+            element, end = decoder.raw_decode(buffer, pos)
+            # A number or literal cut at the buffer edge may look
+            # complete; make sure it really ended.
+            if end == len(buffer) and not eof:
+                raise json.JSONDecodeError("need more", buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(STREAM_READ_SIZE)
+            eof = not more
+            consumed += pos
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+
+        yield element, consumed + pos, consumed + end
+        pos = end
+
+
+def _skip_whitespace(text, pos, skip_commas=False):
+    length = len(text)
+    while pos < length and (
+        text[pos].isspace() or (skip_commas and text[pos] == ",")
+    ):
+        pos += 1
+    return pos
+
+
+def build_row_index(path):
+    """
+    Scan a JSON data file once for the byte offset of every record.
+
+    The file is read as latin-1, which maps bytes to characters one to one:
+    JSON syntax is ASCII, so record boundaries come out right even though
+    non-ASCII text is not decoded properly (it is not kept).
+
+    Returns:
+        array: Start offset of each record, followed by the end offset of
+        the last one (so record ``i`` spans offsets ``i`` to ``i + 1``).
+    """
+    offsets = array("q")
+    end = None
+    with open(path, "r", encoding="latin-1") as f:
+        for record, start, end in iter_json_array(f):
+            if not isinstance(record, dict):
+                raise ValueError("Unexpected data format")
+            offsets.append(start)
+    if end is not None:
+        offsets.append(end)
+    return offsets
+
+
+class VirtualColumn:
+    """Read-only column of a VirtualStore, decoded block by block."""
+
+    __slots__ = ("_store", "_col")
+
+    def __init__(self, store, col):
+        self._store = store
+        self._col = col
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            rows = range(*row.indices(len(self)))
+            return self._store.column_values(self._col, rows)
+        if row < 0:
+            row += len(self)
+        return self._store.get(row, self._col)
+
+    def __iter__(self):
+        store = self._store
+        for start in range(0, len(store), store.block_rows):
+            yield from store.block_values(self._col, start)
+
+
+class VirtualStore(ColumnStore):
+    """
+    ColumnStore over a JSON data file that is read on demand.
+
+    The file is memory-mapped and must not be modified in place while the
+    store is open (saves replace it, which leaves the mapping on the old
+    contents). Every value of an edited cell, appended row, or replaced
+    column is held in memory; everything else is decoded from the file
+    when read.
+
+    Attributes:
+        path (str): The data file.
+        block_rows (int): Records decoded per block.
+        cache_blocks (int): Decoded blocks kept in memory.
+    """
+
+    def __init__(
+        self,
+        path,
+        view,
+        offsets,
+        headers,
+        block_rows=BLOCK_ROWS,
+        cache_blocks=CACHE_BLOCKS,
+    ):
+        self.path = path
+        self.block_rows = block_rows
+        self.cache_blocks = cache_blocks
+        self.headers = list(headers)
+        self.kinds = [OBJECT] * len(self.headers)
+        self._view = view
+        self._offsets = offsets
+        self._file_rows = max(len(offsets) - 1, 0)
+        self._row_count = self._file_rows
+        self._file_headers = list(self.headers)
+        self.nested = {}
+        # Per column: file key it is read from (None: not in the file; a
+        # (key, nested key) pair for a nested-field column),
+        # value where the file has none, whole column replaced in memory
+        # (or None), and edited cells (row → value)
+        self._sources = list(self.headers)
+        self._defaults = [""] * len(self.headers)
+        self._columns = [None] * len(self.headers)
+        self._edits = [{} for _ in self.headers]
+        self._blocks = OrderedDict()  # block number → list of records
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        """
+        Index and map a JSON data file.
+
+        Returns:
+            VirtualStore: The table, or None if the file holds no records.
+        """
+        offsets = build_row_index(path)
+        if not offsets:
+            return None
+        with open(path, "rb") as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start, end = offsets[0], offsets[1]
+        first = json.loads(view[start:end].rstrip(b", \t\r\n"))
+        store = cls(path, view, offsets, list(first.keys()), **kwargs)
+        logger.info(f"Indexed {store._file_rows} rows of {path}")
+        return store
+
+    @property
+    def lazy(self):
+        return True
+
+    def _block(self, block):
+        """Decoded records of one block, through the block cache."""
+        records = self._blocks.get(block)
+        if records is not None:
+            self._blocks.move_to_end(block)
+            return records
+        records = self._read_block(block)
+        self._blocks[block] = records
+        if len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        return records
+
+    def _block_bytes(self, block):
+        """The file text of one block's records, without separators."""
+        start = block * self.block_rows
+        stop = min(start + self.block_rows, self._file_rows)
+        first, end = self._offsets[start], self._offsets[stop]
+        return self._view[first:end].rstrip(b" \t\r\n").rstrip(b",")
+
+    def _read_block(self, block):
+        return json.loads(b"[" + self._block_bytes(block) + b"]")
+
+    def get(self, row, col):
+        edits = self._edits[col]
+        if row in edits:
+            return edits[row]
+        column = self._columns[col]
+        if column is not None:
+            return column[row]
+        source = self._sources[col]
+        if source is None or row >= self._file_rows:
+            return self._defaults[col]
+        record = self._block(row // self.block_rows)[row % self.block_rows]
+        if isinstance(source, tuple):
+            return nested_value(record.get(source[0]), source[1])
+        return record.get(source, self._defaults[col])
+
+    def set(self, row, col, value):
+        column = self._columns[col]
+        if column is not None:
+            column[row] = value
+        else:
+            self._edits[col][row] = value
+
+    def block_values(self, col, start):
+        """Values of one column for the block starting at row ``start``."""
+        stop = min(start + self.block_rows, self._row_count)
+        column = self._columns[col]
+        if column is not None:
+            return column[start:stop]
+        source = self._sources[col]
+        default = self._defaults[col]
+        file_stop = min(stop, self._file_rows)
+        if source is None or start >= file_stop:
+            values = []
+        elif isinstance(source, tuple):
+            parent, key = source
+            records = self._block(start // self.block_rows)
+            values = [nested_value(r.get(parent), key) for r in records]
+        else:
+            records = self._block(start // self.block_rows)
+            values = [record.get(source, default) for record in records]
+        values.extend([default] * (stop - start - len(values)))
+        edits = self._edits[col]
+        if edits:
+            for offset, row in enumerate(range(start, stop)):
+                if row in edits:
+                    values[offset] = edits[row]
+        return values
+
+    def add_column(self, header, values):
+        self.add_blank_column(header)
+        self.set_column_values(len(self.headers) - 1, values)
+
+    def add_blank_column(self, header, value=""):
+        self.headers.append(header)
+        self.kinds.append(OBJECT)
+        self._sources.append(None)
+        self._defaults.append(value)
+        self._columns.append(None)
+        self._edits.append({})
+
+    def add_nested_column(self, header, parent_col, key):
+        """Add a column of one key of a column of dicts, read on demand."""
+        self.add_blank_column(header)
+        source = self._sources[parent_col]
+        self._sources[-1] = (source, key) if source is not None else None
+        self.nested[header] = (self.headers[parent_col], key)
+        if self._columns[parent_col] is not None:
+            parent = self._columns[parent_col]
+            self._columns[-1] = [nested_value(v, key) for v in parent]
+        for row, value in self._edits[parent_col].items():
+            self._edits[-1][row] = nested_value(value, key)
+
+    def drop_columns(self, headers):
+        keep = [
+            col
+            for col, header in enumerate(self.headers)
+            if header not in headers
+        ]
+        for name in ("headers", "kinds", "_sources", "_defaults"):
+            values = getattr(self, name)
+            setattr(self, name, [values[col] for col in keep])
+        self._columns = [self._columns[col] for col in keep]
+        self._edits = [self._edits[col] for col in keep]
+        for header in headers:
+            self.nested.pop(header, None)
+
+    def append_records(self, records):
+        """Append rows from a list of dicts; they are kept in memory."""
+        first = self._row_count
+        self._row_count += len(records)
+        rows = range(first, self._row_count)
+        for col, header in enumerate(self.headers):
+            values = [self.record_value(item, header) for item in records]
+            if self._columns[col] is not None:
+                self._columns[col].extend(values)
+            else:
+                self._edits[col].update(zip(rows, values))
+
+    def column(self, col):
+        return VirtualColumn(self, col)
+
+    def column_values(self, col, rows=None):
+        if rows is None:
+            return list(self.column(col))
+        get = self.get
+        return [get(row, col) for row in rows]
+
+    def set_column_values(self, col, values):
+        """Replace a whole column; it is held in memory from then on."""
+        self._columns[col] = list(values)
+        self._edits[col] = {}
+
+    def snapshot(self):
+        """
+        Copy for background readers. The file mapping and row index are
+        shared; edits and in-memory columns are copied.
+        """
+        copy = VirtualStore(
+            self.path,
+            self._view,
+            self._offsets,
+            self._file_headers,
+            self.block_rows,
+            self.cache_blocks,
+        )
+        copy.headers = list(self.headers)
+        copy.kinds = list(self.kinds)
+        copy.nested = dict(self.nested)
+        copy._row_count = self._row_count
+        copy._sources = list(self._sources)
+        copy._defaults = list(self._defaults)
+        copy._columns = [
+            list(column) if column is not None else None
+            for column in self._columns
+        ]
+        copy._edits = [dict(edits) for edits in self._edits]
+        return copy
+
+    def iter_records(self):
+        for start in range(0, self._row_count, self.block_rows):
+            yield from self._block_records(start)
+
+    def write_json(self, f):
+        """
+        Write the table to binary file ``f`` as data.json is written
+        (``indent=2``). Blocks without changes are copied from the file
+        verbatim instead of being decoded and encoded again.
+        """
+        same_columns = self.headers == self._sources and not any(
+            column is not None for column in self._columns
+        )
+        rewritten = {
+            row // self.block_rows for edits in self._edits for row in edits
+        }
+        f.write(b"[")
+        separator = b"\n  "
+        for start in range(0, self._row_count, self.block_rows):
+            stop = min(start + self.block_rows, self._row_count)
+            if (
+                same_columns
+                and stop <= self._file_rows
+                and start // self.block_rows not in rewritten
+            ):
+                block = self._block_bytes(start // self.block_rows)
+                f.write(separator + block)
+            else:
+                for record in self._block_records(start):
+                    text = json.dumps(record, ensure_ascii=False, indent=2)
+                    f.write(separator + text.replace("\n", "\n  ").encode())
+                    separator = RECORD_SEPARATOR
+            separator = RECORD_SEPARATOR
+        f.write(b"\n]" if self._row_count else b"]")
+
+    def _block_records(self, start):
+        headers = self.headers
+        columns = [
+            self.block_values(col, start) for col in range(len(headers))
+        ]
+        return [dict(zip(headers, row)) for row in zip(*columns)]
@@ -25,3 +25,11 @@ def ensure_qapp():
     if not app:
         app = QApplication([])
     yield app
+
+
+@pytest.fixture(autouse=True)
+def isolated_recovery_log(tmp_path, monkeypatch):
+    # Models replay a recovery log left in the working directory on open
+    from src.table_model import DataTableModel
+
+    monkeypatch.setattr(DataTableModel, "undo_log_path", tmp_path / "undo")
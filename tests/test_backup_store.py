@@ -0,0 +1,57 @@
+import json
+import os
+from src.backup_store import BackupStore
+
+
+def make_records(count, changed_row=None):
+    records = [
+        {"id": i, "name": f"user {i}", "notes": "x" * (i % 97)}
+        for i in range(count)
+    ]
+    if changed_row is not None:
+        records[changed_row]["name"] = "changed"
+    return records
+
+
+def chunk_files(store):
+    return {name for _, _, files in os.walk(store.chunk_dir) for name in files}
+
+
+def test_unchanged_chunks_are_stored_once(tmp_path):
+    store = BackupStore(str(tmp_path))
+    first = store.save(make_records(5000), "data.json")
+    chunks_before = chunk_files(store)
+
+    second = store.save(make_records(5000, changed_row=2500), "data.json")
+    new_chunks = chunk_files(store) - chunks_before
+
+    assert len(chunks_before) > 4
+    assert len(new_chunks) == 1
+    assert store.list_backups("data.json") == [first, second]
+
+
+def test_restore_streams_backup_back_to_json(tmp_path):
+    store = BackupStore(str(tmp_path / "backups"))
+    records = make_records(300)
+    backup_id = store.save(records, "data.json")
+    target = tmp_path / "restored.json"
+
+    store.restore(backup_id, str(target))
+
+    assert target.read_text(encoding="utf-8") == json.dumps(
+        records, ensure_ascii=False, indent=2
+    )
+
+
+def test_prune_collects_unreferenced_chunks(tmp_path):
+    store = BackupStore(str(tmp_path))
+    for i in range(3):
+        store.save(make_records(50, changed_row=0) if i else [{"a": i}], "d")
+
+    store.prune("d", keep=1)
+
+    (remaining,) = store.list_backups("d")
+    assert chunk_files(store) == set(store.read_manifest(remaining)["chunks"])
+    assert list(store.iter_records(remaining)) == make_records(
+        50, changed_row=0
+    )
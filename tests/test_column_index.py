@@ -0,0 +1,182 @@
+from src.column_index import MembershipIndex, SortedIndex, bitmap_to_mask
+from src.filter_proxy import TableFilterProxyModel
+from src.table_model import DataTableModel
+
+DATA = [
+    {"name": "Ann", "tags": ["admin"], "preferences": {"theme": "dark"}},
+    {"name": "Bo", "tags": ["admin", "mod"], "preferences": {"theme": "x"}},
+    {"name": "Cy", "tags": [], "preferences": {"theme": "dark"}},
+]
+
+
+def test_membership_index_tracks_edits_and_appends():
+    index = MembershipIndex.build([["a"], ["a", "b"], []])
+    assert bitmap_to_mask(index.rows_with("a"), 3) == [True, True, False]
+    assert index.rows_with("missing") == 0
+
+    assert index.update(0, ["a"], ["b"])
+    assert index.extend([["a"]])
+    assert bitmap_to_mask(index.rows_with("a"), 4) == [
+        False,
+        True,
+        False,
+        True,
+    ]
+    assert bitmap_to_mask(index.rows_with("b"), 4)[:2] == [True, True]
+    assert MembershipIndex.build([["a"], "not a list"]) is None
+
+
+def test_tag_filters_are_answered_from_the_index():
+    model = DataTableModel(DATA)
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+
+    compiled = proxy.compile_filter("'admin' in tags and not 'mod' in tags")
+    assert proxy.planned_filter_mask(compiled) == [True, False, False]
+    compiled = proxy.compile_filter("'mod' in tags or 'x' not in tags")
+    assert proxy.planned_filter_mask(compiled) == [True, True, True]
+    assert proxy.planned_filter_mask(proxy.compile_filter("len(tags)")) is None
+
+    proxy.set_custom_filter_expression("'admin' in tags and 'mod' in tags")
+    assert proxy.rowCount() == 1
+    model.setData(model.index(2, 1), ["mod", "admin"])
+    assert proxy.rowCount() == 2
+    compiled = proxy.compile_filter("'admin' in tags")
+    assert proxy.planned_filter_mask(compiled) == [True, True, True]
+
+
+def test_nested_fields_are_columns_that_write_through():
+    model = DataTableModel(DATA)
+    col = model._headers.index("preferences.theme")
+    parent = model._headers.index("preferences")
+    assert model.nested_headers() == ["preferences.theme"]
+    assert model.index(0, col).data() == "dark"
+
+    model.setData(model.index(0, col), "light")
+    assert model._data.get(0, parent) == {"theme": "light"}
+    assert DATA[0]["preferences"] == {"theme": "dark"}  # not mutated
+    model.setData(model.index(1, parent), {"theme": "blue"})
+    assert model.index(1, col).data() == "blue"
+    model.undo()
+    assert model.index(1, col).data() == "x"
+
+    store, _, _ = model.snapshot()
+    assert "preferences.theme" not in store.headers
+    assert store.to_records()[0]["preferences"] == {"theme": "light"}
+
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_custom_filter_expression("preferences.theme == 'dark'")
+    assert proxy.rowCount() == 1
+
+
+def test_sorted_index_answers_ranges_and_prefixes():
+    index = SortedIndex.build(["bo", "Al", "alan", "Cy"], fold=True)
+    assert sorted(index.rows_in(index.prefix_range("al"))) == [1, 2]
+    assert list(index.rows_in(index.ranges(">=", "bo"))) == [0, 3]
+    assert index.update(3, "Cy", "Alma")
+    assert sorted(index.rows_in(index.prefix_range("al"))) == [1, 2, 3]
+    assert index.ranges("<", 5) is None  # does not compare: scan instead
+    assert SortedIndex.build([1, None]) is None
+
+
+def test_conjunctions_use_indexes_and_scan_only_the_candidates():
+    rows = [
+        {
+            "id": i,
+            "name": f"n{i % 7}",
+            "age": i % 90,
+            "status": "s%d" % (i % 3),
+        }
+        for i in range(400)
+    ]
+    model = DataTableModel(rows)
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+
+    def expected(test):
+        return [bool(test(r)) for r in rows]
+
+    compiled = proxy.compile_filter("age >= 85 and status == 's1'")
+    assert all(step.indexed for step in proxy.plan_filter(compiled).steps)
+    assert proxy.planned_filter_mask(compiled) == expected(
+        lambda r: r["age"] >= 85 and r["status"] == "s1"
+    )
+
+    compiled = proxy.compile_filter("name.startswith('N3') and len(name) == 2")
+    steps = proxy.plan_filter(compiled).steps
+    assert [step.indexed for step in steps] == [True, False]  # len() scans
+    assert proxy.planned_filter_mask(compiled) == expected(
+        lambda r: r["name"] == "n3"
+    )
+
+    # Indexes follow edits
+    model.setData(model.index(0, 2), 88)
+    model.setData(model.index(1, 3), "s1")
+    compiled = proxy.compile_filter("age > 84 and status == 's1'")
+    assert proxy.planned_filter_mask(compiled)[:2] == [False, False]
+    model.setData(model.index(1, 2), 89)
+    assert proxy.planned_filter_mask(compiled)[:2] == [False, True]
+
+
+def test_sort_result_column_is_found_by_name_in_saved_files():
+    # A saved file already has "sort result"; nested columns come after it
+    saved = [dict(record, **{"sort result": ""}) for record in DATA]
+    model = DataTableModel(saved)
+    assert model._headers[-1] == "preferences.theme"
+    assert model._headers[model.sort_result_column()] == "sort result"
+
+
+def test_unbuilt_indexes_are_queued_and_built_in_chunks():
+    rows = [{"name": f"n{i % 7}", "age": (i * 37) % 101} for i in range(50)]
+    model = DataTableModel(rows)
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    expected = [r["age"] > 90 for r in rows]
+
+    compiled = proxy.compile_filter("age > 90")
+    # Inline planning uses built indexes only, and builds nothing
+    assert proxy.planned_filter_mask(compiled, build=False) is None
+    assert model.indexes.building
+    steps = 0
+    while model.indexes.build_step(8):
+        steps += 1
+    assert steps > 2  # several chunks, not one pass
+    sorted_index = model.indexes.get("sorted", 1, True, build=False)
+    assert list(sorted_index.rows) == list(
+        SortedIndex.build(model.column(1), True).rows
+    )
+    assert proxy.planned_filter_mask(compiled, build=False) == expected
+
+    # An edit during a build restarts it
+    proxy.planned_filter_mask(
+        proxy.compile_filter("name == 'n3'"), build=False
+    )
+    model.indexes.build_step(8)
+    model.setData(model.index(0, 0), "n3")
+    while model.indexes.build_step(8):
+        pass
+    mask = proxy.planned_filter_mask(
+        proxy.compile_filter("name == 'n3'"), build=False
+    )
+    assert mask == [i == 0 or i % 7 == 3 for i in range(50)]
+
+
+def test_full_filter_passes_queue_indexes_instead_of_building(qtbot):
+    rows = [{"name": f"n{i}", "age": i % 3 or None} for i in range(40)]
+    model = DataTableModel(rows)
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+
+    proxy.set_custom_filter_expression("name == 'n4'")
+    assert proxy.rowCount() == 1
+    assert not model.indexes.known("equality", 0, True)
+    qtbot.waitUntil(lambda: not model.indexes.building)
+    assert model.indexes.known("equality", 0, True)
+
+    # A column that cannot be indexed stays marked so across edits
+    model.indexes.get("sorted", 1)
+    assert model.indexes.known("sorted", 1)
+    model.setData(model.index(1, 1), 5)
+    assert model.indexes.known("sorted", 1)
+    assert not model.indexes.building
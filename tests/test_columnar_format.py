@@ -0,0 +1,69 @@
+import json
+from src.column_store import ColumnStore
+from src.columnar_format import (
+    columnar_to_json,
+    is_columnar_file,
+    json_to_columnar,
+    open_columnar,
+)
+from src.data_manager import DataManager
+
+RECORDS = [
+    {
+        "id": 1,
+        "name": "Alice",
+        "score": 9.5,
+        "active": True,
+        "tags": ["admin", "verified"],
+    },
+    {
+        "id": 2,
+        "name": "Bób",
+        "score": 7.25,
+        "active": False,
+        "tags": [],
+    },
+]
+
+
+def test_json_columnar_roundtrip(tmp_path):
+    source = tmp_path / "data.json"
+    source.write_text(json.dumps(RECORDS))
+    columnar = tmp_path / "data.idwc"
+    back = tmp_path / "back.json"
+
+    json_to_columnar(str(source), str(columnar))
+    columnar_to_json(str(columnar), str(back))
+
+    assert json.loads(back.read_text(encoding="utf-8")) == RECORDS
+
+
+def test_mapped_columns_are_lazy_until_written(tmp_path):
+    path = tmp_path / "table.bin"
+    store = ColumnStore.from_records(RECORDS, list(RECORDS[0].keys()))
+    manager = DataManager(str(path))
+    manager.columnar = True
+    manager.save_store(store)
+
+    # Detected by magic bytes even without the .idwc extension
+    assert is_columnar_file(str(path))
+    mapped = open_columnar(str(path))
+    assert mapped.lazy
+    assert isinstance(mapped.column(0), memoryview)
+    assert mapped[1][1] == "Bób"
+
+    mapped.set(0, 0, 10)
+    assert not isinstance(mapped.column(0), memoryview)
+    assert mapped.to_records()[0]["id"] == 10
+    assert open_columnar(str(path))[0][0] == 1
+
+
+def test_columnar_data_manager_replays_journal(tmp_path):
+    manager = DataManager(str(tmp_path / "data.idwc"), journaled=True)
+    manager.save_data(RECORDS)
+    manager.append_journal([{"row": 1, "column": "score", "value": 8.0}])
+
+    store = DataManager(str(tmp_path / "data.idwc")).load_columns()
+
+    assert store.get(1, store.headers.index("score")) == 8.0
+    assert manager.load_data()[1]["score"] == 8.0
@@ -172,3 +172,53 @@ def test_backup_file_is_created_and_old_backups_trimmed():
         manager = TestableDataManager(data_file)
         files_after = manager.save_backup([{"name": "Test"}])
         assert len(files_after) <= 10
+
+
+def test_iter_data_chunks_streams_all_records(test_data_manager):
+    chunks = list(
+        test_data_manager.iter_data_chunks(chunk_size=2, first_chunk=1)
+    )
+    assert [len(records) for records, _ in chunks] == [1, 2]
+    assert 0 < chunks[0][1] <= chunks[-1][1] <= 100
+    records = [record for chunk, _ in chunks for record in chunk]
+    assert records == test_data_manager.load_data()
+
+
+def test_journal_is_replayed_on_load(tmp_path):
+    path = str(tmp_path / "data.json")
+    manager = DataManager(path, journaled=True)
+    manager.save_data(
+        [{"name": "Alice", "age": 30}, {"name": "Bob", "age": 25}]
+    )
+
+    manager.append_journal([{"row": 1, "column": "age", "value": 26}])
+    manager.append_journal([{"row": 1, "column": "age", "value": 27}])
+    # A crash mid-append leaves a torn last line behind
+    with open(manager.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"row": 0, "col')
+
+    assert not manager.needs_compaction()
+    assert manager.load_data()[1]["age"] == 27
+    streamed = [r for chunk, _ in manager.iter_data_chunks() for r in chunk]
+    assert streamed[1]["age"] == 27
+
+    # A full save compacts the journal away
+    manager.save_data(manager.load_data())
+    assert not os.path.exists(manager.journal_path)
+    assert manager.load_data()[1]["age"] == 27
+
+
+def test_failed_save_keeps_previous_file(tmp_path):
+    path = tmp_path / "data.json"
+    manager = DataManager(str(path))
+    manager.save_data([{"name": "Alice"}])
+
+    class Unserializable:
+        pass
+
+    with pytest.raises(TypeError):
+        manager.save_data([{"name": Unserializable()}])
+
+    # The old contents survive and no temp files are left behind
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"name": "Alice"}]
+    assert os.listdir(tmp_path) == ["data.json"]
@@ -0,0 +1,157 @@
+from PyQt5.QtCore import Qt
+from src.filter_engine import compile_expression, EVAL_ERROR
+from src.filter_proxy import TableFilterProxyModel
+from src.table_model import DataTableModel
+
+SYMBOLS = {"len": len, "str": str}
+COLUMNS = {
+    "age": [30, 55, None],
+    "tags": [["admin"], ["admin", "moderator"], []],
+    "email": ["a@x.com", "b@y.org", "c"],
+}
+
+
+def test_compiled_expression_is_vectorized():
+    compiled = compile_expression(
+        "'admin' in tags and age >= 50", COLUMNS.keys(), SYMBOLS
+    )
+    assert compiled.vectorized
+    assert compiled.names == {"tags", "age"}
+    assert compiled.mask(COLUMNS, 3) == [False, True, False]
+
+
+def test_failing_rows_are_rejected():
+    compiled = compile_expression("age > 40", COLUMNS.keys(), SYMBOLS)
+    assert compiled.evaluate(COLUMNS, 3)[2] is EVAL_ERROR
+    assert compiled.mask(COLUMNS, 3) == [False, True, False]
+
+
+def test_unsupported_nodes_fall_back_to_asteval():
+    compiled = compile_expression(
+        "len([t for t in tags]) == 1 and len(email) > 1",
+        COLUMNS.keys(),
+        SYMBOLS,
+    )
+    assert not compiled.vectorized
+    assert compiled.mask(COLUMNS, 3) == [True, False, False]
+
+
+def test_proxy_filters_with_compiled_expression():
+    data = [
+        {"name": "Alice", "age": 30},
+        {"name": "Bob", "age": 55},
+        {"name": "Carol", "age": 61},
+    ]
+    model = DataTableModel(data, ["name", "age"])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+
+    proxy.set_custom_filter_expression("age >= 50")
+    assert proxy.rowCount() == 2
+
+    # Edits update the cached mask for the changed row only
+    model.setData(model.index(0, 1), 70)
+    assert proxy.rowCount() == 3
+
+
+def test_scheduler_debounces_and_skips_invalid_input(qtbot):
+    from src.filter_proxy import TableFilterProxyModel
+    from src.filter_scheduler import FilterScheduler
+    from src.table_model import DataTableModel
+
+    data = [{"name": f"user{i}", "age": i} for i in range(25)]
+    model = DataTableModel(data, ["name", "age"])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    scheduler = FilterScheduler(proxy, delay=10, chunk_rows=4)
+    layouts = []
+    proxy.layoutChanged.connect(lambda: layouts.append(proxy.rowCount()))
+
+    for text in ["a", "ag", "age >", "age > 2", "age > 20"]:
+        scheduler.schedule(text)
+    with qtbot.waitSignal(scheduler.applied, timeout=1000):
+        pass
+
+    # Only the last input was scanned, and applied in one relayout
+    assert layouts == [4]
+    assert proxy.custom_expr == "age > 20"
+
+    with qtbot.waitSignal(scheduler.invalid, timeout=1000):
+        scheduler.schedule("age >")
+    assert proxy.custom_expr == "age > 20"
+    assert layouts == [4]
+
+
+def test_proxy_reuses_results_until_their_columns_change():
+    from src.filter_proxy import TableFilterProxyModel
+    from src.table_model import DataTableModel
+
+    data = [{"name": f"u{i}", "age": i % 60} for i in range(30)]
+    model = DataTableModel(data, ["name", "age"])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    cache = proxy.result_cache
+
+    proxy.set_filter_state("", "age >= 50")
+    mask = proxy._filter_mask
+    proxy.set_filter_state("", "name == 'u3'")
+    # Same expression up to spacing, other columns edited: cache hit
+    model.setData(model.index(0, 0), "renamed")
+    proxy.set_filter_state("", "(age>=50)")
+    assert proxy._filter_mask is mask
+    assert cache.stats()["hits"] == 1
+
+    model.setData(model.index(1, 1), 55)
+    proxy.set_filter_state("", "age >= 50")
+    assert proxy._filter_mask is not mask
+    assert proxy.rowCount() == 1
+    assert cache.stats()["misses"] == 3
+
+
+def test_parallel_filter_matches_in_process_mask():
+    from src.filter_proxy import TableFilterProxyModel
+    from src.table_model import DataTableModel
+
+    data = [
+        {
+            "email": f"User{i}@Example.com",
+            "tags": ["admin"] if i % 3 == 0 else ["user"],
+            "age": i % 70,
+        }
+        for i in range(500)
+    ]
+    model = DataTableModel(data, ["email", "tags", "age"])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    # The comprehension needs the per-row fallback, which is what the pool
+    # is for; vectorized expressions stay in-process
+    proxy.set_custom_filter_expression(
+        "len([t for t in tags if t.startswith('adm')]) and 'user1' in email"
+    )
+    expected = proxy._evaluate_filter_mask()
+
+    proxy.set_filter_workers(2, min_rows=100)
+    try:
+        assert proxy.parallel_filter_applies(proxy._compiled_filter)
+        assert proxy._evaluate_filter_mask() == expected
+        assert any(expected)
+        # Columns were shipped through shared memory, not a fallback
+        assert set(proxy.parallel_filter._segments) == {"email", "tags"}
+    finally:
+        proxy.set_filter_workers(1)
+
+
+def test_headers_survive_an_empty_filter_result():
+    model = DataTableModel([{"name": "a", "age": 1}, {"name": "b", "age": 2}])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_custom_filter_expression("age > 5")
+    assert proxy.rowCount() == 0
+    headers = [
+        proxy.headerData(col, Qt.Horizontal, Qt.DisplayRole)
+        for col in range(proxy.columnCount())
+    ]
+    assert headers == ["name", "age", "sort result"]
+
+    proxy.set_custom_filter_expression("age > 1")
+    assert proxy.headerData(0, Qt.Vertical, Qt.DisplayRole) == "1"
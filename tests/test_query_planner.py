@@ -0,0 +1,78 @@
+import random
+from src.filter_proxy import TableFilterProxyModel
+from src.table_model import DataTableModel
+
+
+def _proxy(rows):
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(DataTableModel(rows))
+    return proxy
+
+
+def test_planned_masks_match_plain_evaluation():
+    rng = random.Random(7)
+    rows = [
+        {
+            "name": rng.choice(["ann", "bo", "cy", None]),
+            "age": rng.choice([None, "?"] + list(range(20, 80))),
+            "tags": rng.sample(["admin", "mod", "x"], rng.randint(0, 2)),
+        }
+        for _ in range(300)
+    ]
+    proxy = _proxy(rows)
+    expressions = [
+        "age > 50 and len(name) == 2",
+        "len(name) == 2 and age > 50 and 'admin' in tags",
+        # Failing rows in an earlier part reject the row even if a later
+        # part (which the plan may run first) matches
+        "age > 50 or 'mod' in tags",
+        "name.startswith('a') or age < 30 or len(tags) == 2",
+        "'x' in tags or name == 'bo'",
+        "name == 'bo' or age < 30 or 'x' in tags",
+    ]
+    for expr in expressions:
+        compiled = proxy.compile_filter(expr)
+        expected = compiled.mask(
+            proxy._expression_columns(compiled, lower=True), 300
+        )
+        plan = proxy.plan_filter(compiled)
+        assert proxy.run_plan(plan) == expected, expr
+        assert proxy.last_plan is plan
+
+
+def test_selective_cheap_parts_run_first_and_explain():
+    rows = [{"name": f"n{i}", "age": i % 100} for i in range(2000)]
+    proxy = _proxy(rows)
+    compiled = proxy.compile_filter(
+        "len(str(name) * 20) > 3 and age == 5 and name.startswith('n')"
+    )
+    plan = proxy.plan_filter(compiled)
+    assert plan.mode == "and"
+    assert plan.steps[0].text == "age == 5"  # answered by an index
+
+    proxy.run_plan(plan)
+    assert plan.steps[0].rows_out == 20
+    assert all(step.rows_in == 20 for step in plan.steps[1:])
+
+    text = proxy.explain_filter("age == 5 or len(name) == 2")
+    assert "joined by 'or'" in text
+    assert "[index]" in text and "[scan]" in text
+    assert "Total: 29 of 2000 rows" in text
+
+
+def test_unknown_names_fail_before_later_or_parts():
+    rows = [
+        {"status": "ab"[i % 5 < 2], "age": i if i % 3 else None}
+        for i in range(100)
+    ]
+    proxy = _proxy(rows)
+    for expr in (
+        "stauts == 'b' or status == 'a'",
+        "age is None or status == 'a'",  # lower-cased to ``none``
+    ):
+        compiled = proxy.compile_filter(expr)
+        expected = compiled.mask(
+            proxy._expression_columns(compiled, lower=True), 100
+        )
+        assert not any(expected)
+        assert proxy.planned_filter_mask(compiled) == expected, expr
@@ -1,4 +1,4 @@
-import json
+from src.recovery_log import RecoveryLog
 from src.table_model import DataTableModel
 from src.undo_redo import Action
 
@@ -7,26 +7,30 @@ def test_unsaved_stack_written_correctly(tmp_path):
     headers = ["name"]
     data = [{"name": "Alice"}]
     model = DataTableModel(data.copy(), headers)
-    model.undo_log_path = tmp_path / "test_log.json"
+    model.undo_log_path = tmp_path / "test_log.bin"
 
     index = model.index(0, 0)
     model.setData(index, "Alicia")
+    model.undo()
+    size = model.undo_log_path.stat().st_size
 
-    with open(model.undo_log_path, "r", encoding="utf-8") as f:
-        content = json.load(f)
+    # One record is appended per change; nothing is rewritten
+    model.redo()
+    assert model.undo_log_path.stat().st_size > size
+    actions = list(RecoveryLog(model.undo_log_path).read())
+    assert [a.new_value for a in actions] == ["Alicia", "Alice", "Alicia"]
 
-    assert content["version"] == 1
-    assert "unsaved_action_stack" in content
-    assert content["unsaved_action_stack"][0]["new_value"] == "Alicia"
-    assert content["undo_stack"][0]["new_value"] == "Alicia"
-    assert content["redo_stack"] == []
+    # A record torn by a crash mid-append is ignored
+    with open(model.undo_log_path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00garbage")
+    assert len(list(RecoveryLog(model.undo_log_path).read())) == 3
 
 
 def test_replay_unsaved_stack_restores_data(tmp_path):
     headers = ["name", "role"]
     data = [{"name": "Alice", "role": "Engineer"}]
     model = DataTableModel(data.copy(), headers)
-    model.undo_log_path = tmp_path / "test_log.json"
+    model.undo_log_path = tmp_path / "test_log.bin"
 
     # Simulate multiple actions
     model.unsaved_action_stack.append(Action(0, 0, "Alice", "Alicia"))
@@ -40,3 +44,21 @@ def test_replay_unsaved_stack_restores_data(tmp_path):
 
     assert new_model._data[0][0] == "Alicia"
     assert new_model._data[0][1] == "Manager"
+
+
+def test_recovery_on_open_waits_for_streamed_rows():
+    RecoveryLog(DataTableModel.undo_log_path).append(
+        [Action(0, 0, "a", "A"), Action(2, 0, "c", "C")]
+    )
+
+    # Only the first chunk of the file has been loaded yet
+    model = DataTableModel([{"name": "a"}, {"name": "b"}], ["name"])
+    assert model.column_values(0) == ["A", "b"]
+    assert model.is_dirty()
+
+    model.append_rows([{"name": "c"}])
+    assert model.column_values(0) == ["A", "b", "C"]
+
+    snapshot, version, saved_actions = model.snapshot()
+    model.mark_saved(version, saved_actions)
+    assert not DataTableModel.undo_log_path.exists()
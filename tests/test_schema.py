@@ -0,0 +1,75 @@
+import json
+from src.data_manager import DataManager
+from src.filter_engine import compile_expression
+from src.schema import TableSchema, infer_column
+from src.table_model import DataTableModel
+
+RECORDS = [
+    {"age": 30, "active": True, "tags": ["a"], "score": 1.5, "code": "x"},
+    {"age": None, "active": False, "tags": [], "score": 2, "code": 7},
+    {"age": 55, "active": True, "tags": ["a"], "score": 0.5, "code": "y"},
+]
+
+
+def test_infer_column_records_types_nulls_and_bounds():
+    active = infer_column("active", [r["active"] for r in RECORDS])
+    assert active.type == "bool" and not active.nullable
+    assert active.minimum is None and active.cardinality == 2
+
+    age = infer_column("age", [r["age"] for r in RECORDS])
+    assert age.type == "int" and age.nullable and not age.mixed
+    assert (age.minimum, age.maximum) == (30, 55)
+
+    score = infer_column("score", [r["score"] for r in RECORDS])
+    assert score.type == "float" and score.uniform
+    assert (score.minimum, score.maximum) == (0.5, 2)
+
+    assert infer_column("code", [r["code"] for r in RECORDS]).mixed
+    assert infer_column("tags", [r["tags"] for r in RECORDS]).cardinality == 2
+
+
+def test_model_keeps_schema_in_step_and_manager_saves_it(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(RECORDS))
+    manager = DataManager(str(path))
+    model = DataTableModel(manager.load_data())
+    schema = model.infer_schema()
+
+    model.setData(model.index(1, 0), 40)
+    assert not schema.get("age").nullable
+    assert model.column_schema("age").uniform
+
+    manager.save_schema(schema)
+    loaded = manager.load_schema()
+    assert loaded.get("age").to_dict() == schema.get("age").to_dict()
+
+    path.write_text(json.dumps(RECORDS[:1]))  # file changed: schema stale
+    assert manager.load_schema() is None
+
+
+def test_kernels_on_columns_with_none_skip_the_whole_column_attempt():
+    columns = {"age": [r["age"] for r in RECORDS]}
+    schema = TableSchema([infer_column("age", columns["age"])])
+    plain = compile_expression("age > 40", columns.keys())
+    checked = compile_expression("age > 40", columns.keys(), schema=schema)
+    assert checked.checked_names == {"age"} and not plain.checked_names
+    assert checked.mask(columns, 3) == plain.mask(columns, 3)
+    assert checked.mask(columns, 3) == [False, False, True]
+    equality = compile_expression("age == 30", columns.keys(), schema=schema)
+    assert equality.mask(columns, 3) == [True, False, False]
+
+
+def test_schema_inference_decodes_each_virtual_block_once(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(RECORDS * 20))
+    store = DataManager(str(path)).open_virtual(block_rows=8, cache_blocks=1)
+    model = DataTableModel(store, store.headers)
+    reads = []
+    read_block = store._read_block
+    store._read_block = lambda block: reads.append(block) or read_block(block)
+
+    schema = model.infer_schema()
+    assert sorted(reads) == list(range(8))  # 60 rows in blocks of 8
+    for name in RECORDS[0]:
+        expected = infer_column(name, [r[name] for r in RECORDS * 20])
+        assert schema.get(name).to_dict() == expected.to_dict()
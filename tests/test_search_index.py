@@ -0,0 +1,42 @@
+from src.column_store import ColumnStore
+from src.search_index import SearchIndex
+from src.filter_proxy import TableFilterProxyModel
+from src.table_model import DataTableModel
+
+
+def _store():
+    records = [
+        {"name": "Alice", "tags": ["admin"]},
+        {"name": "Bob", "tags": []},
+        {"name": "alicia", "tags": ["user"]},
+    ]
+    return ColumnStore.from_records(records, ["name", "tags"])
+
+
+def test_search_is_case_insensitive_by_default():
+    index = SearchIndex(_store())
+    assert index.search("ALI") == {0, 2}
+    assert index.search("Ali", case_sensitive=True) == {0}
+    assert index.search("admin") == {0}
+
+
+def test_hits_do_not_span_cells():
+    index = SearchIndex(_store())
+    # "Bob" and "alicia" are adjacent in the vocabulary
+    assert index.search("boba") == set()
+
+
+def test_index_follows_edits_and_undo():
+    model = DataTableModel([{"name": "Alice"}, {"name": "Bob"}], ["name"])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_search_text("bob")
+    assert proxy.rowCount() == 1
+
+    model.setData(model.index(0, 0), "Bobby")
+    assert model.search_rows("bob") == {0, 1}
+    assert proxy.rowCount() == 2
+
+    model.undo()
+    assert model.search_rows("bob") == {1}
+    assert proxy.rowCount() == 1
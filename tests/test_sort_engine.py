@@ -0,0 +1,117 @@
+from PyQt5.QtCore import Qt
+from src.filter_proxy import TableFilterProxyModel
+from src.sort_engine import RankedColumn
+from src.table_model import DataTableModel
+
+
+def test_ranks_preserve_order_and_ties():
+    ranks = RankedColumn(["b", "a", "c", "a"])
+
+    assert ranks.order() == [1, 3, 0, 2]
+    assert ranks.order(descending=True) == [2, 0, 1, 3]
+
+
+def test_mixed_types_and_new_keys_get_midpoint_ranks():
+    ranks = RankedColumn([3, "x", 1, [2]])
+    assert ranks.typed
+    assert ranks.order() == [2, 0, 1, 3]
+
+    ranks = RankedColumn([10, 30])
+    assert ranks.set(1, 20)
+    assert ranks.ranks[1] == 0.5
+    assert ranks.extend([5, 40])
+    assert ranks.order() == [2, 0, 1, 3]
+
+
+def test_proxy_sorts_by_custom_key_in_one_pass():
+    data = [
+        {"email": "zed@b.org", "age": 30},
+        {"email": "amy@c.net", "age": 20},
+        {"email": "bob@a.com", "age": 40},
+        {"email": "cat@b.org", "age": 35},
+    ]
+    model = DataTableModel(data, ["email", "age"])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+
+    proxy.set_custom_sort_key("email.split('@')[-1]")
+    proxy.rebuild_sort_key_cache()
+    proxy.sort(2, Qt.DescendingOrder)
+    emails = [proxy.index(r, 0).data(proxy.RAW_VALUE_ROLE) for r in range(4)]
+    assert emails == ["amy@c.net", "zed@b.org", "cat@b.org", "bob@a.com"]
+
+    proxy.set_custom_filter_expression("age > 25")
+    assert proxy.rowCount() == 3
+    assert proxy.mapToSource(proxy.index(0, 0)).row() == 0
+    assert not proxy.mapFromSource(model.index(1, 0)).isValid()
+
+
+def source_rows(proxy):
+    return [
+        proxy.mapToSource(proxy.index(r, 0)).row()
+        for r in range(proxy.rowCount())
+    ]
+
+
+def test_multi_key_sort_spec_survives_edits():
+    data = [
+        {"dept": "b", "age": 30},
+        {"dept": "a", "age": 20},
+        {"dept": "b", "age": 25},
+        {"dept": "a", "age": 40},
+    ]
+    model = DataTableModel(data, ["dept", "age"])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+
+    proxy.set_sort_spec([{"key": "dept", "ascending": True}, ("age", False)])
+    assert source_rows(proxy) == [3, 1, 0, 2]
+    ranked = proxy._ranked["age"]
+
+    model.setData(model.index(2, 1), 35)
+
+    # Rank arrays were updated in place, not rebuilt
+    assert proxy._ranked["age"] is ranked
+    assert source_rows(proxy) == [3, 1, 2, 0]
+    assert proxy.sort_spec_config() == [
+        {"key": "dept", "ascending": True},
+        {"key": "age", "ascending": False},
+    ]
+
+
+def test_single_edit_moves_row_without_relayout():
+    data = [{"name": f"n{i}", "age": (i * 7) % 50} for i in range(40)]
+    model = DataTableModel(data, ["name", "age"])
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_custom_filter_expression("age >= 10")
+    proxy.set_custom_sort_key("age * -1")
+    proxy.rebuild_sort_key_cache()
+    proxy.sort(0, Qt.AscendingOrder)
+
+    events = []
+    proxy.layoutChanged.connect(lambda: events.append("layout"))
+    proxy.rowsMoved.connect(lambda *args: events.append("move"))
+    proxy.rowsRemoved.connect(lambda *args: events.append("remove"))
+    proxy.rowsInserted.connect(lambda *args: events.append("insert"))
+    keys = []
+    proxy.sort_keys_changed.connect(lambda rows: keys.append(list(rows)))
+
+    model.setData(model.index(3, 1), 49)  # moves to the top
+    model.setData(model.index(5, 1), 1)  # filtered out
+    model.setData(model.index(0, 1), 30)  # filtered in
+
+    assert events == ["move", "remove", "insert"]
+    assert keys == [[3], [5], [0]]
+    assert proxy.sort_key_cache[3] == -49
+
+    fresh = TableFilterProxyModel()
+    fresh.setSourceModel(model)
+    fresh.set_custom_filter_expression("age >= 10")
+    fresh.set_custom_sort_key("age * -1")
+    fresh.sort(0, Qt.AscendingOrder)
+    assert source_rows(proxy) == source_rows(fresh)
+    assert all(
+        proxy.mapFromSource(model.index(row, 0)).row() == proxy_row
+        for proxy_row, row in enumerate(source_rows(proxy))
+    )
@@ -36,3 +36,183 @@ def test_dirty_flag_on_data_change():
     # Reset dirty flag manually
     model.mark_clean()
     assert not model.is_dirty(), "Dirty flag should reset with mark_clean"
+
+
+def test_columns_use_typed_storage():
+    headers = ["name", "age", "tags"]
+    data = [
+        {"name": "Alice", "age": 30, "tags": ["admin"]},
+        {"name": "Bob", "age": 25, "tags": []},
+    ]
+    model = DataTableModel(data, headers)
+
+    assert model._data.kinds == ["str", "int", "object", "str"]
+    assert model.column(1).typecode == "q"
+
+    # Writing a value of another type demotes the column, losslessly
+    model._data.set(0, 1, "thirty")
+    assert model._data.kinds[1] == "object"
+    assert model.get_current_data_as_dicts()[0] == {
+        "name": "Alice",
+        "age": "thirty",
+        "tags": ["admin"],
+        "sort result": "",
+    }
+
+
+def test_streaming_loader_appends_chunks(qtbot):
+    from src.stream_loader import StreamingLoader
+
+    model = DataTableModel([{"name": "Alice", "age": 30}], ["name", "age"])
+    chunks = iter([([{"name": "Bob", "age": 25}], 50), ([], 100)])
+    loader = StreamingLoader(model, chunks)
+
+    with qtbot.waitSignal(loader.finished, timeout=1000) as blocker:
+        loader.start()
+
+    assert blocker.args == [2]
+    assert model.get_current_data_as_dicts()[1]["name"] == "Bob"
+    assert model.column(1).typecode == "q"
+    assert model.search_rows("bob") == {1}
+
+
+def test_snapshot_is_isolated_from_later_edits():
+    model = DataTableModel([{"name": "Alice", "age": 30}], ["name", "age"])
+    model.setData(model.index(0, 1), 31)
+    snapshot, version, saved_actions = model.snapshot()
+
+    # An edit lands while the snapshot is being written
+    model.setData(model.index(0, 0), "Alicia")
+    assert snapshot.to_records()[0]["name"] == "Alice"
+    assert snapshot.to_records()[0]["age"] == 31
+
+    model.mark_saved(version, saved_actions)
+    assert model.is_dirty()
+    assert len(model.unsaved_action_stack) == 1
+
+    _, version, saved_actions = model.snapshot()
+    model.mark_saved(version, saved_actions)
+    assert not model.is_dirty()
+    assert model.unsaved_action_stack == []
+
+
+def test_background_writer_reports_completion(qtbot):
+    from src.background_io import BackgroundWriter
+
+    written = []
+    writer = BackgroundWriter()
+    with qtbot.waitSignal(writer.finished, timeout=2000) as blocker:
+        assert writer.submit("save", written.append, ([1],), "ctx")
+    assert blocker.args == ["save", "ctx", None]
+    assert written == [[1]]
+    assert not writer.is_busy("save")
+
+
+def test_journal_snapshot_lists_changed_cells():
+    model = DataTableModel([{"name": "Alice"}, {"name": "Bob"}], ["name"])
+    model.setData(model.index(1, 0), "Bobby")
+    model.setData(model.index(1, 0), "Robert")
+
+    entries, version, saved_actions = model.journal_snapshot()
+    assert entries == [{"row": 1, "column": "name", "value": "Robert"}]
+
+    model.mark_saved(version, saved_actions)
+    assert model.journal_snapshot()[0] == []
+
+
+def test_delegate_only_lays_out_highlighted_cells():
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtWidgets import QStyleOptionViewItem
+    from src.filter_proxy import TableFilterProxyModel
+    from src.rich_text_delegate import RichTextDelegate
+
+    proxy = TableFilterProxyModel()
+    data = [{"name": "Alice"}, {"name": "Bob"}]
+    model = DataTableModel(data, ["name"], proxy_model=proxy)
+    proxy.setSourceModel(model)
+    proxy.search_text = "ali"
+    delegate = RichTextDelegate()
+    option = QStyleOptionViewItem()
+    option.rect.setRect(0, 0, 100, 30)
+    image = QImage(100, 30, QImage.Format_ARGB32)
+    painter = QPainter(image)
+
+    for _ in range(3):
+        delegate.paint(painter, option, model.index(0, 0))
+        delegate.paint(painter, option, model.index(1, 0))
+    painter.end()
+
+    assert model.index(0, 0).data(model.SEARCH_MATCH_ROLE) is True
+    assert model.index(1, 0).data(model.SEARCH_MATCH_ROLE) is False
+    assert len(delegate._documents) == 1
+    delegate.set_dark_mode(True)
+    assert not delegate._documents
+
+
+def test_apply_edits_is_one_step_and_one_notification():
+    from src.filter_proxy import TableFilterProxyModel
+
+    model = DataTableModel(
+        [{"name": n, "age": 20 + i} for i, n in enumerate("abcdef")],
+        ["name", "age"],
+    )
+    proxy = TableFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_custom_filter_expression("age >= 30")
+    changes = []
+    model.dataChanged.connect(lambda *args: changes.append(args))
+
+    rows = range(6)
+    values = proxy.evaluate_expression("age * 2", list(rows))
+    assert (
+        model.apply_edits(
+            [(row, 1, value) for row, value in zip(rows, values)]
+            + [(0, 0, "zed"), (0, 0, "Zed")],
+            label="Filled age",
+        )
+        == 7
+    )
+    assert len(changes) == 1
+    assert len(model.undo_stack) == 1
+    assert model.undo_stack[0].description() == "Filled age (7 cells)"
+    assert model.column_values(1) == [40, 42, 44, 46, 48, 50]
+    assert model.search_rows("zed") == {0}
+    assert proxy.rowCount() == 6
+
+    model.undo()
+    assert model.column_values(0)[0] == "a"
+    assert model.column_values(1) == [20, 21, 22, 23, 24, 25]
+    assert proxy.rowCount() == 0
+
+
+def test_display_text_is_plain_and_cached_per_cell():
+    from src.filter_proxy import TableFilterProxyModel
+
+    proxy = TableFilterProxyModel()
+    model = DataTableModel([{"name": "<Ali>"}, {"name": "Bob"}], ["name"])
+    model._proxy_model = proxy
+    proxy.setSourceModel(model)
+
+    assert model.index(0, 0).data() == "<Ali>"
+    assert model.index(0, 0).data(model.HIGHLIGHT_ROLE) is None
+    proxy.search_text = "ali"
+    assert model.index(0, 0).data() == "<Ali>"
+    assert model.index(0, 0).data(model.HIGHLIGHT_ROLE) == (
+        '<span style="color: black">&lt;<span style="background-color:'
+        ' #ffff00">Ali</span>&gt;</span>'
+    )
+    assert model.index(1, 0).data(model.HIGHLIGHT_ROLE) is None
+
+    model.setData(model.index(0, 0), "Alf")
+    assert model.index(0, 0).data() == "Alf"
+    assert model.index(0, 0).data(model.HIGHLIGHT_ROLE) is None
+
+
+def test_appending_a_too_large_int_demotes_without_duplicates():
+    from src.column_store import ColumnStore
+
+    store = ColumnStore.from_records([{"a": 1}], ["a"])
+    store.append_records([{"a": 2}, {"a": 3}, {"a": 2**70}])
+    assert len(store) == 4
+    assert store.column_values(0) == [1, 2, 3, 2**70]
+    assert store.kinds[0] == "object"
@@ -34,3 +34,32 @@ def test_undo_stack_clears_on_new_edit():
 
     model.setData(index, "Ally")  # new edit after undo
     assert len(model.redo_stack) == 0  # redo stack should be cleared
+
+
+def test_history_coalesces_groups_and_caps():
+    from src.undo_redo import CompoundAction
+
+    model = DataTableModel([{"n": i} for i in range(10)], ["n"])
+    other = DataTableModel([{"n": 0}], ["n"])
+
+    # Repeated edits of one cell are one step
+    model.setData(model.index(0, 0), 100)
+    model.setData(model.index(0, 0), 101)
+    assert len(model.undo_stack) == 1 and model.undo_stack[0].new_value == 101
+    assert not other.undo_stack  # history is per model
+
+    # A compound step undoes all of its cells at once
+    model.history.record(
+        CompoundAction(range(1, 10), [0] * 9, range(1, 10), [0] * 9)
+    )
+    for row in range(1, 10):
+        model._set_cell(row, 0, 0)
+    model.undo()
+    assert model.column_values(0) == [101, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+    model.redo()
+    assert model.column_values(0) == [101] + [0] * 9
+
+    # Oldest steps are dropped first once a cap is exceeded
+    model.history.set_limits(max_steps=10, max_cells=5)
+    assert len(model.undo_stack) == 1
+    assert model.undo_stack[0].cell_count == 9  # newest step is kept
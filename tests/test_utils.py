@@ -11,3 +11,24 @@ def test_multi_sort():
     data = [{"name": "Alice", "age": 30}, {"name": "Bob", "age": 25}]
     sorted_data = multi_sort(data, ["age"])
     assert sorted_data[0]["name"] == "Bob"  # Youngest should be first
+
+
+def test_parse_cell_text_follows_the_replaced_value():
+    from src.utils import parse_cell_text
+
+    assert parse_cell_text("42", 7) == 42
+    assert parse_cell_text("2.5", 1.0) == 2.5
+    assert parse_cell_text("True", False) is True
+    assert parse_cell_text('["a", "b"]', []) == ["a", "b"]
+    assert parse_cell_text("n/a", 7) == "n/a"
+    assert parse_cell_text("42", "x") == "42"
+
+
+def test_filter_literal_follows_the_column_type():
+    from src.schema import infer_column
+    from src.utils import filter_literal
+
+    assert filter_literal("-2.5", infer_column("n", [1, 2])) == "-2.5"
+    assert filter_literal("true", infer_column("b", [False])) == "True"
+    assert filter_literal("42", infer_column("s", ["a"])) == "'42'"
+    assert filter_literal("it's") == '"it\'s"'
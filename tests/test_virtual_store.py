@@ -0,0 +1,51 @@
+import json
+from src.atomic_io import atomic_write_json
+from src.data_manager import DataManager
+from src.table_model import DataTableModel
+
+RECORDS = [
+    {"id": i, "name": f"Bób {i}", "tags": ["x"] * (i % 3)} for i in range(50)
+]
+
+
+def test_virtual_store_reads_blocks_on_demand(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_write_json(path, RECORDS, ensure_ascii=False, indent=2)
+    manager = DataManager(str(path))
+
+    store = manager.open_virtual(block_rows=8, cache_blocks=2)
+    assert len(store) == 50 and store.headers == ["id", "name", "tags"]
+    assert not store._blocks  # nothing decoded yet
+    assert store.get(17, 1) == "Bób 17"
+    assert store.get(49, 2) == ["x"]
+    assert store.get(0, 0) == 0
+    assert len(store._blocks) == 2  # block cache stays bounded
+    assert list(store.column(0)) == list(range(50))
+    assert store.column(1)[8:10] == ["Bób 8", "Bób 9"]
+
+
+def test_virtual_store_edits_and_saves(tmp_path):
+    path = tmp_path / "data.json"
+    atomic_write_json(path, RECORDS, ensure_ascii=False, indent=2)
+    manager = DataManager(str(path))
+    store = manager.open_virtual(block_rows=8)
+    model = DataTableModel(store)
+
+    model.setData(model.index(3, 1), "Zoë")
+    model.append_rows([{"id": 50, "name": "new", "tags": []}])
+    snapshot, _, _ = model.snapshot()
+    model.setData(model.index(4, 1), "after snapshot")
+    manager.save_store(snapshot)
+
+    expected = [dict(r, **{"sort result": ""}) for r in RECORDS]
+    expected[3]["name"] = "Zoë"
+    expected.append({"id": 50, "name": "new", "tags": [], "sort result": ""})
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved == expected
+    assert model.index(4, 1).data(model.RAW_VALUE_ROLE) == "after snapshot"
+
+    # Unchanged blocks are copied verbatim; the result reads as json.dump
+    reopened = manager.open_virtual(block_rows=8)
+    manager.save_store(reopened.snapshot())
+    text = path.read_text(encoding="utf-8")
+    assert text == json.dumps(expected, ensure_ascii=False, indent=2)